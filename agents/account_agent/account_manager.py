@@ -1,3 +1,9 @@
+import asyncio
+import inspect
+from typing import Dict, Union
+
+from shared.tableau_cache import AsyncCachingTableauBackend
+from shared.tableau_cloud import TableauCloudBackend
 from shared.tableau_service import TableauBackend
 
 try:
@@ -6,13 +12,49 @@ except ImportError:
     from intent import AccountIntent
 
 
+PROVISION_OUTCOMES = {
+    "created": "account created",
+    "reactivated": "account reactivated",
+    "moved": "moved from another department",
+    "unchanged": "already active",
+}
+
+
+def _summary(outcomes: Dict[str, str]) -> str:
+    return "\n".join(f"- {email}: {outcome}" for email, outcome in outcomes.items())
+
+
+async def _result(value):
+    # A (cached) TableauCloudBackend call is a coroutine; a SimulatedTableauBackend one has
+    # already returned.
+    return await value if inspect.isawaitable(value) else value
+
+
 class AccountManager:
-    def __init__(self, backend: TableauBackend):
+    def __init__(self, backend: Union[TableauBackend, TableauCloudBackend, AsyncCachingTableauBackend]):
         self.backend = backend
 
     def build_response(self, intent: AccountIntent, department: str) -> str:
+        """`respond`, from synchronous code."""
+        return asyncio.run(self.respond(intent, department))
+
+    async def respond(self, intent: AccountIntent, department: str) -> str:
+        if intent.action == "add_users" and intent.target_emails:
+            # The users are named: provision them all now, as one batch that either
+            # fits the department's capacity or isn't applied at all.
+            result = await _result(self.backend.provision_users(intent.target_emails, department))
+            if result.success:
+                outcomes = {email: PROVISION_OUTCOMES[outcome] for email, outcome in result.outcomes.items()}
+                return f"✅ **Users Provisioned**\n\n{len(outcomes)} user(s) now have {result.license_type} licenses in {department}:\n\n{_summary(outcomes)}"
+            if result.requires_approval:
+                return f"⚠️ **Manager Approval Required**\n\n{result.reason}\n\nI've escalated this request to your department manager for additional license approval."
+            return f"❌ **Request Error**\n\n{result.reason}"
+
         if intent.action == "add_users":
-            capacity_check = self.backend.check_capacity(department, intent.user_count)
+            # Only a check, not a reservation: nothing here would ever commit or
+            # release a hold, and the follow-up naming the users goes through
+            # provision_users, which re-checks capacity under the department's lock.
+            capacity_check = await _result(self.backend.check_capacity(department, intent.user_count))
 
             if capacity_check.success:
                 return f"✅ **Access Request Approved**\n\nI can provision {intent.user_count} new {capacity_check.license_type} license(s) for {department}.\n\n**Next Steps:**\n1. Please provide the new user email addresses\n2. Specify required dashboard access\n3. Accounts will be created within 2 business hours"
@@ -22,14 +64,16 @@ class AccountManager:
 
         if intent.action == "remove_user":
             if intent.target_emails:
-                email = intent.target_emails[0]
-                if self.backend.deactivate_user(email):
-                    return f"✅ **User Removed**\n\n{email} has been deactivated and their license freed for {department}."
-                return f"❌ **Request Error**\n\nNo active user found with email {email}."
+                removed = await _result(self.backend.deactivate_users(intent.target_emails))
+                if not any(removed.values()):
+                    return f"❌ **Request Error**\n\nNo active user found with email {', '.join(removed)}."
+                title = "User Removed" if len(removed) == 1 else "Users Removed"
+                outcomes = {email: "deactivated" if ok else "no active user found" for email, ok in removed.items()}
+                return f"✅ **{title}**\n\n{sum(removed.values())} user(s) deactivated and their licenses freed for {department}:\n\n{_summary(outcomes)}"
             return f"✅ **User Removal Request**\n\nI can process the user removal for {department}.\n\n**Please confirm:**\n1. User email address to remove\n2. Data retention requirements\n3. Effective date for access termination"
 
         if intent.action == "review_permissions":
-            dept_info = self.backend.get_department(department)
+            dept_info = await _result(self.backend.get_department(department))
             if dept_info is None:
                 return "❌ **Request Error**\n\nDepartment not found"
             return f"🔑 **Permission Review**\n\nI'll review the current access permissions for {department}.\n\n**Current Setup:**\n- License Type: {dept_info.license_type}\n- Active Users: {dept_info.current_users}\n\nPlease specify what permission changes are needed."
@@ -1,14 +1,62 @@
 import re
-from typing import List, Literal, Optional, Tuple
+from typing import Dict, List, Literal, Optional, Tuple
 
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from shared.config import CLASSIFIER_MODEL
 from shared.llm_client import complete_json
+from shared.memo import Memo, normalize
 
 EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+')
 
+# Whole-word keywords for each rule action, in priority order: a ticket mentioning
+# both adding and removing users is treated as an add. Whole words, so "address"
+# isn't "add" and "accessory" isn't "access".
+ACTION_KEYWORDS = {
+    "add_users": ["add", "adding", "additional", "onboard", "onboarding"],
+    "remove_user": ["remove", "removed", "removing", "removal", "disable", "disabled", "deactivate", "offboard"],
+    "review_permissions": ["permission", "permissions", "access", "accessing"],
+}
+ACTION_PHRASES = {("new", "user"): "add_users", ("new", "users"): "add_users"}
+ACTION_PRIORITY = list(ACTION_KEYWORDS)
+
+# What an add or remove keyword must be about for the rules to act on it: "add the
+# Q3 report", "remove the duplicate rows" and "disable the email subscription" go on
+# to the LLM. An email address in the text counts as one of these.
+ACCOUNT_NOUNS = [
+    "user", "users", "account", "accounts", "seat", "seats", "licence", "licences",
+    "license", "licenses", "people", "person", "member", "members",
+]
+# Words an account keyword may be from its noun, either side ("add six people",
+# "the account for ... should be disabled"); a count must come at most this many
+# words before its noun ("seven additional Explorer seats").
+ACCOUNT_NOUN_WINDOW = 4
+COUNT_WINDOW = 3
+_NOUN_ACTIONS = {"add_users", "remove_user"}
+
+NUMBER_WORDS = {
+    word: value for value, word in enumerate(
+        "one two three four five six seven eight nine ten eleven twelve thirteen fourteen "
+        "fifteen sixteen seventeen eighteen nineteen".split(), start=1
+    )
+}
+TENS_WORDS = {word: 10 * value for value, word in enumerate(
+    "twenty thirty forty fifty sixty seventy eighty ninety".split(), start=2
+)}
+
+# Every word the rules care about -> (kind, value), so each word costs one lookup.
+_EMAIL_MARK = "\0"  # what an email address is replaced with before the words are read
+_VOCABULARY: Dict[str, Tuple[str, object]] = {
+    **{word: ("number", value) for word, value in NUMBER_WORDS.items()},
+    **{word: ("tens", value) for word, value in TENS_WORDS.items()},
+    **{keyword: ("action", action) for action, keywords in ACTION_KEYWORDS.items() for keyword in keywords},
+    **{first: ("phrase_start", None) for first, _ in ACTION_PHRASES},
+    **{noun: ("noun", None) for noun in [*ACCOUNT_NOUNS, _EMAIL_MARK]},
+}
+_UNKNOWN = (None, None)
+_WORD_PATTERN = re.compile(r"\w+|\0")
+
 ACCOUNT_INTENT_SYSTEM_PROMPT = """You extract the intent behind a Tableau account-access \
 support ticket for a financial company. Classify what the user is asking for.
 
@@ -30,6 +78,67 @@ class AccountIntent(BaseModel):
     reasoning: str = ""
 
 
+def match_rules(ticket_text: str) -> Tuple[Optional[str], int, List[str]]:
+    """The rule engine: (action or None if no rule applies, requested user count,
+    emails) from one pass over the words of `ticket_text`, each looked up once in a
+    precomputed vocabulary.
+
+    An add or remove keyword only counts within ACCOUNT_NOUN_WINDOW words of an
+    account noun (or an email); "new user(s)" is an add by itself. The count is the
+    first number, in digits or words ("five", "twenty-one"), that sits up to
+    COUNT_WINDOW words before an account noun — so a year or a ticket number is
+    never a count, and neither is 0; failing that, how many emails the text names,
+    or 1. Emails are taken out before the words are read, so the digits and words
+    inside an address are never a count or a keyword.
+    """
+    emails = []
+    text = ticket_text.lower()
+    if "@" in ticket_text:
+        emails = EMAIL_PATTERN.findall(ticket_text)
+        text = EMAIL_PATTERN.sub(f" {_EMAIL_MARK} ", text)
+
+    actions = set()
+    keywords = []  # (position, action) for the keywords that need an account noun
+    nouns = []
+    numbers = []  # [value, position of its last word]
+    count = None
+    previous = None  # the previous word, if the rules knew it: its kind and the word
+    for position, word in enumerate(_WORD_PATTERN.findall(text)):
+        kind, value = _VOCABULARY.get(word, _UNKNOWN)
+        if kind is None:  # most words: checked first, and cheaply
+            if word.isdecimal():
+                numbers.append([int(word), position])
+            previous = None
+            continue
+        if kind == "action":
+            if value in _NOUN_ACTIONS:
+                keywords.append((position, value))
+            else:
+                actions.add(value)
+        elif kind == "noun":
+            nouns.append(position)
+            phrase = previous is not None and previous[0] == "phrase_start" and ACTION_PHRASES.get((previous[1], word))
+            if phrase:
+                actions.add(phrase)
+            if count is None:
+                count = next((n for n, last in numbers if n > 0 and position - last <= COUNT_WINDOW), None)
+            numbers.clear()
+        elif kind == "number" and previous is not None and previous[0] == "tens" and 0 < value < 10:
+            numbers[-1] = [numbers[-1][0] + value, position]  # "twenty-five", "thirty two"
+        elif kind == "number" or kind == "tens":
+            numbers.append([value, position])
+        previous = (kind, word)
+
+    for position, action in keywords:
+        if any(abs(position - noun) <= ACCOUNT_NOUN_WINDOW for noun in nouns):
+            actions.add(action)
+    action = next((action for action in ACTION_PRIORITY if action in actions), None)
+    return action, max(len(emails), 1) if count is None else count, emails
+
+
+_memo = Memo("extract_intent")
+
+
 def extract_intent(ticket_text: str, db: Optional[Session] = None) -> Tuple[AccountIntent, str]:
     """Rules first; falls through to the LLM only when no rule keyword matched.
 
@@ -37,42 +146,49 @@ def extract_intent(ticket_text: str, db: Optional[Session] = None) -> Tuple[Acco
     email in the text is unambiguous either way, so there's nothing for the model to
     add there. Returns (intent, method) where method is "llm" or "rules".
 
+    Memoized by ticket text (see shared/memo.py), LLM answers included, so a
+    duplicate ticket never asks the model twice. The "LLM unavailable" fallback
+    isn't memoized: the next duplicate gets another try.
+
     `db`, if given, is passed through to `complete_json` for LLM-availability
     logging (see shared/llm_client.py) — optional, purely for observability.
     """
-    text = ticket_text.lower()
-    emails = EMAIL_PATTERN.findall(ticket_text)
-    numbers = re.findall(r'\d+', text)
-    requested_users = int(numbers[0]) if numbers else 1
-
-    if "add" in text or "new user" in text:
-        action = "add_users"
-    elif "remove" in text or "disable" in text:
-        action = "remove_user"
-    elif "permission" in text or "access" in text:
-        action = "review_permissions"
-    else:
-        action = None
+    return _memo.get_or_compute(
+        normalize(ticket_text),
+        lambda: _extract_intent(ticket_text, db),
+        dump=lambda result: {"intent": result[0].model_dump(), "method": result[1]},
+        load=lambda stored: (AccountIntent.model_validate(stored["intent"]), stored["method"]),
+    )
+
 
+def _extract_intent(ticket_text: str, db: Optional[Session]) -> Tuple[Tuple[AccountIntent, str], bool]:
+    action, requested_users, emails = match_rules(ticket_text)
     if action is not None:
-        return (
-            AccountIntent(
-                action=action, user_count=requested_users, target_emails=emails,
-                reasoning=f"rule: matched '{action}' keyword",
-            ),
-            "rules",
+        intent = AccountIntent(
+            action=action, user_count=requested_users, target_emails=emails,
+            reasoning=f"rule: matched '{action}' keyword",
         )
+        return (intent, "rules"), True
 
     llm_result = complete_json(CLASSIFIER_MODEL, ACCOUNT_INTENT_SYSTEM_PROMPT, ticket_text, AccountIntent, db=db)
     if llm_result is not None:
         if not llm_result.target_emails:
             llm_result.target_emails = emails
-        return llm_result, "llm"
-
-    return (
-        AccountIntent(
-            action="unclear", user_count=requested_users, target_emails=emails,
-            reasoning="no rule matched and LLM unavailable",
-        ),
-        "rules",
+        return (llm_result, "llm"), True
+
+    intent = AccountIntent(
+        action="unclear", user_count=requested_users, target_emails=emails,
+        reasoning="no rule matched and LLM unavailable",
     )
+    return (intent, "rules"), False
+
+
+def extract_intents_batch(ticket_texts: List[str], db: Optional[Session] = None) -> List[Tuple[AccountIntent, str]]:
+    """`extract_intent` over many tickets, in order. Identical texts — a bulk
+    import repeats the same request wording a lot — are looked up once, and share
+    one result object."""
+    results: Dict[str, Tuple[AccountIntent, str]] = {}
+    for text in ticket_texts:
+        if text not in results:
+            results[text] = extract_intent(text, db=db)
+    return [results[text] for text in ticket_texts]
@@ -1,18 +1,26 @@
 import logging
 import os
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
 
 import uvicorn
 from fastapi import Depends, FastAPI
 from sqlalchemy.orm import Session
 
+from shared import config
 from shared.auth import verify_internal_token
 from shared.db.repository import get_or_create_ticket, record_escalation, record_event, record_resolution
-from shared.db.session import get_db, init_db, is_db_healthy
-from shared.logging_config import configure_logging, set_ticket_id
+from shared.db.session import SessionLocal, get_db, init_db, is_db_healthy
+from shared.instrumentation import DECISION_DURATION, ESCALATIONS, instrument
+from shared.logging_config import bind_log_context, configure_logging, set_ticket_id
 from shared.message_queue import MessageQueue, MessageQueueError
 from shared.models import AgentMessage, SupportTicket
+from shared.tableau_cache import AsyncCachingTableauBackend
+from shared.tableau_cloud import TableauCloudBackend, department_capacities
 from shared.tableau_service import SimulatedTableauBackend
+from shared.stage_timing import CLASSIFICATION, DB_WRITE, collect_stage_timings, stage, stage_timings
+from shared.tracing import configure_tracing, span, trace_requests
 
 try:
     from .account_manager import AccountManager
@@ -21,12 +29,33 @@ except ImportError:
     from account_manager import AccountManager
     from intent import extract_intent
 
-configure_logging()
+configure_logging(agent="account_agent")
+configure_tracing("account_agent")
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Account Management Agent")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    if tableau_cloud is not None:
+        await tableau_cloud.aclose()
+
+
+app = FastAPI(title="Account Management Agent", lifespan=lifespan)
 mq = MessageQueue()
 init_db()
+trace_requests(app)
+collect_stage_timings(app)
+instrument(app, "account_agent", mq, queues=["manager_approval_queue"])
+
+# With TABLEAU_BACKEND=cloud, one REST client (its connection pool and sign-in) for
+# the life of the process, behind a read cache so reviews and capacity checks don't
+# page through a group's members on every ticket; seat limits are read from the
+# database once, here.
+tableau_cloud = None
+if config.TABLEAU_BACKEND == "cloud":
+    with SessionLocal() as session:
+        tableau_cloud = AsyncCachingTableauBackend(TableauCloudBackend.from_config(department_capacities(session)))
 
 
 @app.get("/health")
@@ -44,17 +73,20 @@ async def health():
 async def handle_ticket(ticket_data: dict, db: Session = Depends(get_db)):
     ticket = SupportTicket(**ticket_data["ticket"])
     set_ticket_id(ticket.ticket_id)
-    get_or_create_ticket(db, ticket, assigned_agent="account_agent")
+    started = time.perf_counter()
+    db_ticket = get_or_create_ticket(db, ticket, assigned_agent="account_agent")
 
     # Extract intent — rules first, LLM only for genuinely ambiguous text (see intent.py).
     ticket_text = f"{ticket.subject} {ticket.description}"
-    intent, method = extract_intent(ticket_text, db=db)
+    with stage(CLASSIFICATION):
+        intent, method = extract_intent(ticket_text, db=db)
+    bind_log_context(method=method)
 
     # Execution is always deterministic — the model never decides whether licenses
     # exist, it only helped parse what the user asked for.
-    backend = SimulatedTableauBackend(db)
+    backend = tableau_cloud or SimulatedTableauBackend(db)
     account_manager = AccountManager(backend)
-    response_content = account_manager.build_response(intent, ticket.department)
+    response_content = await account_manager.respond(intent, ticket.department)
 
     # Check if escalation is needed
     needs_escalation = "Manager Approval Required" in response_content
@@ -62,6 +94,7 @@ async def handle_ticket(ticket_data: dict, db: Session = Depends(get_db)):
     if needs_escalation:
         reason = "Manager approval required for additional licenses"
         record_escalation(db, ticket.ticket_id, "account_agent", reason, "manager_approval_queue")
+        ESCALATIONS.labels("account_agent", "manager_approval_queue").inc()
 
         escalation_msg = {
             "ticket": ticket.model_dump(mode="json"),
@@ -74,18 +107,22 @@ async def handle_ticket(ticket_data: dict, db: Session = Depends(get_db)):
             mq.send_message("manager_approval_queue", escalation_msg)
         except MessageQueueError as e:
             logger.error("Failed to queue manager approval for ticket %s: %s", ticket.ticket_id, e)
-        logger.info("Escalated ticket via %s (intent=%s)", method, intent.action)
-    else:
-        logger.info("Resolved ticket via %s (intent=%s)", method, intent.action)
 
     record_event(db, ticket.ticket_id, "account_agent", "response", {
         "content": response_content,
         "escalated": needs_escalation,
         "method": method,
         "intent": intent.action,
+        "timings": stage_timings(),
     })
-    record_resolution(db, ticket.ticket_id, response_content, needs_escalation)
-    db.commit()
+    record_resolution(db, db_ticket, response_content, needs_escalation)
+    with span("db.commit"), stage(DB_WRITE):
+        db.commit()
+    elapsed = time.perf_counter() - started
+    DECISION_DURATION.labels("account_agent", method).observe(elapsed)
+    bind_log_context(latency_ms=round(elapsed * 1000, 1))
+    outcome = "Escalated" if needs_escalation else "Resolved"
+    logger.info("%s ticket via %s (intent=%s)", outcome, method, intent.action)
 
     # Create response message
     response_message = AgentMessage(
@@ -99,7 +136,9 @@ async def handle_ticket(ticket_data: dict, db: Session = Depends(get_db)):
     return {
         "status": "handled",
         "response": response_message.model_dump(mode="json"),
-        "escalated": needs_escalation
+        "escalated": needs_escalation,
+        "method": method,
+        "timings": stage_timings(),
     }
 
 
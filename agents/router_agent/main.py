@@ -1,5 +1,6 @@
 import logging
 import os
+import time
 from datetime import datetime
 
 import uvicorn
@@ -9,22 +10,29 @@ from sqlalchemy.orm import Session
 from shared.auth import verify_internal_token
 from shared.db.repository import get_or_create_ticket, record_event
 from shared.db.session import get_db, init_db, is_db_healthy
-from shared.logging_config import configure_logging, set_ticket_id
+from shared.instrumentation import DECISION_DURATION, instrument
+from shared.logging_config import bind_log_context, configure_logging, set_ticket_id
 from shared.message_queue import MessageQueue, MessageQueueError
 from shared.models import AgentMessage, SupportTicket, TicketCategory
+from shared.stage_timing import CLASSIFICATION, DB_WRITE, collect_stage_timings, stage, stage_timings
+from shared.tracing import configure_tracing, span, trace_requests
 
 try:
     from .router_logic import RouterLogic
 except ImportError:
     from router_logic import RouterLogic
 
-configure_logging()
+configure_logging(agent="router_agent")
+configure_tracing("router_agent")
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Router Agent")
 mq = MessageQueue()
 router_logic = RouterLogic()
 init_db()
+trace_requests(app)
+collect_stage_timings(app)
+instrument(app, "router_agent", mq, queues=["technical_agent_queue", "account_agent_queue"])
 
 
 @app.get("/health")
@@ -41,10 +49,13 @@ async def health():
 @app.post("/route_ticket", dependencies=[Depends(verify_internal_token)])
 async def route_ticket(ticket: SupportTicket, db: Session = Depends(get_db)):
     set_ticket_id(ticket.ticket_id)
+    started = time.perf_counter()
 
     # Classify the ticket — rules first, falling through to the LLM only when the
     # rule signal is weak (see RouterLogic.classify).
-    decision = router_logic.classify(ticket, db=db)
+    with stage(CLASSIFICATION):
+        decision = router_logic.classify(ticket, db=db)
+    bind_log_context(method=decision.method)
     category, priority = decision.category, decision.priority
     ticket.category = category
     ticket.priority = priority
@@ -66,8 +77,13 @@ async def route_ticket(ticket: SupportTicket, db: Session = Depends(get_db)):
         "assigned_agent": target_agent,
         "method": decision.method,
         "confidence": decision.confidence,
+        "timings": stage_timings(),
     })
-    db.commit()
+    with span("db.commit"), stage(DB_WRITE):
+        db.commit()
+    elapsed = time.perf_counter() - started
+    DECISION_DURATION.labels("router_agent", decision.method).observe(elapsed)
+    bind_log_context(latency_ms=round(elapsed * 1000, 1))
     logger.info("Routed ticket to %s via %s (priority=%s)", target_agent, decision.method, priority.value)
 
     # Record the routing decision. Nothing currently consumes this queue — the
@@ -99,7 +115,9 @@ async def route_ticket(ticket: SupportTicket, db: Session = Depends(get_db)):
         "category": category,
         "priority": priority,
         "assigned_agent": target_agent,
-        "routing_message": routing_message.model_dump(mode="json")
+        "routing_message": routing_message.model_dump(mode="json"),
+        "method": decision.method,
+        "timings": stage_timings(),
     }
 
 
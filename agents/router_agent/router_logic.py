@@ -1,3 +1,4 @@
+import json
 from dataclasses import dataclass
 from typing import Literal, Optional
 
@@ -6,7 +7,9 @@ from sqlalchemy.orm import Session
 
 from shared.config import CLASSIFIER_MODEL
 from shared.llm_client import complete_json
+from shared.memo import Memo, normalize
 from shared.models import Priority, SupportTicket, TicketCategory
+from shared.tracing import traced
 
 CONFIDENCE_THRESHOLD = 0.6
 
@@ -56,6 +59,7 @@ class RouterLogic:
         ]
         self.critical_departments = ['Trading', 'Risk Management', 'Executive']
         self.critical_keywords = ['trading', 'p&l', 'risk', 'down', 'critical', 'urgent']
+        self.memo = Memo("router_classify")
 
     def classify_ticket(self, ticket: SupportTicket) -> tuple[TicketCategory, Priority, float]:
         """Pure rule-based classification — deterministic, no network calls."""
@@ -77,6 +81,7 @@ class RouterLogic:
 
         return category, priority, confidence
 
+    @traced("RouterLogic.classify")
     def classify(self, ticket: SupportTicket, db: Optional[Session] = None) -> RoutingDecision:
         """Rules first; falls through to the LLM only when the rule signal is weak.
 
@@ -84,9 +89,23 @@ class RouterLogic:
         policy, not inference — they apply to an LLM-suggested priority exactly as they
         do to the rules' own default, via the shared `_apply_priority_policy`.
 
+        Memoized by department, subject and description (see shared/memo.py), so a
+        duplicate ticket never asks the model twice. A weak rule result that
+        the LLM couldn't improve on isn't memoized: the next duplicate gets another try.
+
         `db`, if given, is passed through to `complete_json` for LLM-availability
         logging (see shared/llm_client.py) — optional, purely for observability.
         """
+        return self.memo.get_or_compute(
+            json.dumps([ticket.department, normalize(ticket.subject), normalize(ticket.description)]),
+            lambda: self._classify(ticket, db),
+            dump=lambda d: [d.category.value, d.priority.value, d.confidence, d.method],
+            load=lambda stored: RoutingDecision(
+                TicketCategory(stored[0]), Priority(stored[1]), stored[2], stored[3]
+            ),
+        )
+
+    def _classify(self, ticket: SupportTicket, db: Optional[Session]) -> tuple[RoutingDecision, bool]:
         category, priority, confidence = self.classify_ticket(ticket)
 
         if confidence < CONFIDENCE_THRESHOLD:
@@ -100,9 +119,10 @@ class RouterLogic:
             if llm_result is not None:
                 category = TicketCategory(llm_result.category)
                 priority = self._apply_priority_policy(ticket, Priority(llm_result.priority))
-                return RoutingDecision(category, priority, llm_result.confidence, "llm")
+                return RoutingDecision(category, priority, llm_result.confidence, "llm"), True
+            return RoutingDecision(category, priority, confidence, "rules"), False
 
-        return RoutingDecision(category, priority, confidence, "rules")
+        return RoutingDecision(category, priority, confidence, "rules"), True
 
     def _apply_priority_policy(self, ticket: SupportTicket, base_priority: Priority) -> Priority:
         text = f"{ticket.subject} {ticket.description}".lower()
@@ -1,5 +1,6 @@
 import logging
 import os
+import time
 from datetime import datetime
 
 import uvicorn
@@ -9,9 +10,12 @@ from sqlalchemy.orm import Session
 from shared.auth import verify_internal_token
 from shared.db.repository import get_or_create_ticket, record_escalation, record_event, record_resolution
 from shared.db.session import get_db, init_db, is_db_healthy
-from shared.logging_config import configure_logging, set_ticket_id
+from shared.instrumentation import DECISION_DURATION, ESCALATIONS, RESOLUTION_CACHE_LOOKUPS, instrument
+from shared.logging_config import bind_log_context, configure_logging, set_ticket_id
 from shared.message_queue import MessageQueue, MessageQueueError
 from shared.models import AgentMessage, SupportTicket
+from shared.stage_timing import DB_WRITE, RETRIEVAL, collect_stage_timings, stage, stage_timings
+from shared.tracing import configure_tracing, span, trace_requests
 
 try:
     from .rag import generate_response
@@ -22,12 +26,16 @@ except ImportError:
     from resolution_cache import find_cached_resolution
     from technical_kb import TechnicalKnowledgeBase
 
-configure_logging()
+configure_logging(agent="technical_agent")
+configure_tracing("technical_agent")
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Technical Support Agent")
 mq = MessageQueue()
 init_db()
+trace_requests(app)
+collect_stage_timings(app)
+instrument(app, "technical_agent", mq, queues=["escalation_queue"])
 
 
 @app.get("/health")
@@ -59,36 +67,48 @@ def _notify_escalation(ticket: SupportTicket, reason: str) -> None:
 async def handle_ticket(ticket_data: dict, db: Session = Depends(get_db)):
     ticket = SupportTicket(**ticket_data["ticket"])
     set_ticket_id(ticket.ticket_id)
-    get_or_create_ticket(db, ticket, assigned_agent="technical_agent")
+    started = time.perf_counter()
+    db_ticket = get_or_create_ticket(db, ticket, assigned_agent="technical_agent")
 
     # A prior ticket with this exact subject already resolved (or escalated) skips
     # both KB retrieval and the LLM call entirely — see resolution_cache.py.
-    cached = find_cached_resolution(db, ticket.subject)
+    with stage(RETRIEVAL):
+        cached = find_cached_resolution(db, ticket.subject)
+    RESOLUTION_CACHE_LOOKUPS.labels("hit" if cached is not None else "miss").inc()
     if cached is not None:
         result, method = cached, "cache"
     else:
         # Retrieve candidate KB articles, then generate a grounded response (RAG).
         ticket_text = f"{ticket.subject} {ticket.description}"
         kb = TechnicalKnowledgeBase(db)
-        articles = kb.retrieve(ticket_text)
+        with stage(RETRIEVAL):
+            articles = kb.retrieve(ticket_text)
         result, method = generate_response(ticket_text, articles, db=db)
+    bind_log_context(method=method)
 
     if result.escalate:
         reason = result.escalation_reason or "Escalated by technical agent"
         record_escalation(db, ticket.ticket_id, "technical_agent", reason, "escalation_queue")
         _notify_escalation(ticket, reason)
-        logger.info("Escalated ticket via %s: %s", method, reason)
-    else:
-        logger.info("Resolved ticket via %s", method)
+        ESCALATIONS.labels("technical_agent", "escalation_queue").inc()
 
     record_event(db, ticket.ticket_id, "technical_agent", "response", {
         "content": result.response,
         "escalated": result.escalate,
         "method": method,
         "kb_articles_used": result.kb_articles_used,
+        "timings": stage_timings(),
     })
-    record_resolution(db, ticket.ticket_id, result.response, result.escalate)
-    db.commit()
+    record_resolution(db, db_ticket, result.response, result.escalate)
+    with span("db.commit"), stage(DB_WRITE):
+        db.commit()
+    elapsed = time.perf_counter() - started
+    DECISION_DURATION.labels("technical_agent", method).observe(elapsed)
+    bind_log_context(latency_ms=round(elapsed * 1000, 1))
+    if result.escalate:
+        logger.info("Escalated ticket via %s: %s", method, reason)
+    else:
+        logger.info("Resolved ticket via %s", method)
 
     # Create response message
     response_message = AgentMessage(
@@ -102,7 +122,9 @@ async def handle_ticket(ticket_data: dict, db: Session = Depends(get_db)):
     return {
         "status": "handled",
         "response": response_message.model_dump(mode="json"),
-        "escalated": result.escalate
+        "escalated": result.escalate,
+        "method": method,
+        "timings": stage_timings(),
     }
 
 
@@ -3,6 +3,7 @@ from typing import Optional
 from sqlalchemy.orm import Session
 
 from shared.db.models import Ticket
+from shared.tracing import traced
 
 try:
     from .rag import AgentResponse
@@ -10,6 +11,7 @@ except ImportError:
     from rag import AgentResponse
 
 
+@traced("find_cached_resolution")
 def find_cached_resolution(db: Session, subject: str) -> Optional[AgentResponse]:
     """The most recent already-processed ticket with the exact same subject, if
     one exists — reused verbatim to skip both KB retrieval and the LLM call for
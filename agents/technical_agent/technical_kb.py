@@ -3,12 +3,14 @@ from typing import List
 from sqlalchemy.orm import Session
 
 from shared.db.models import KBArticle
+from shared.tracing import traced
 
 
 class TechnicalKnowledgeBase:
     def __init__(self, db: Session):
         self.db = db
 
+    @traced("TechnicalKnowledgeBase.retrieve")
     def retrieve(self, ticket_text: str, top_n: int = 3) -> List[KBArticle]:
         """Score every article by symptom-keyword overlap with the ticket text and
         return the top `top_n` with at least one match, best match first.
@@ -0,0 +1,148 @@
+"""Throughput and accuracy of the account agent's intent rules (agents/account_agent/intent.py).
+
+    python -m benchmarks.intents                    # 100k tickets
+    python -m benchmarks.intents --tickets 10000 --output intents.json
+
+Accuracy is measured against two labeled sets (true action and user count per
+ticket, "unclear" where none of the rule actions applies): the share of tickets whose
+rule-engine action — and action plus count — matches the label.
+data/account_intents_labeled.json is the set the rules were written against, so its
+score is self-graded; data/account_intents_holdout.json was written separately and
+never used to change the rules, and its score is the one to quote. A ticket the rules can't place counts as "unclear", which in
+production goes on to the LLM, so rule misses on a genuinely ambiguous ticket are
+expected; rule *wrong answers* are the ones that cost escalations.
+
+Throughput is measured over --tickets tickets generated from that set, with
+greetings, sign-offs and sender names varied so the texts aren't all identical, for
+`match_rules` alone, `extract_intent` per ticket, and `extract_intents_batch`.
+`legacy` is the substring-and-regex implementation the rule engine replaced, kept
+here as the comparison point. No LLM is configured, so nothing leaves the process.
+Not part of the pytest suite.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+LABELED_PATH = Path(__file__).resolve().parent.parent / "data" / "account_intents_labeled.json"
+HOLDOUT_PATH = LABELED_PATH.with_name("account_intents_holdout.json")
+
+# No keywords and no numbers, so they never change a ticket's label.
+GREETINGS = ["", "Hi team, ", "Hello, ", "Good morning. ", "Quick request: "]
+SIGN_OFFS = ["", " Thanks.", " Much appreciated!", " Let me know if anything else is needed.", " Cheers"]
+NAMES = ["alex", "priya", "tom", "mei", "jordan", "fatima", "lucas", "nina", "omar", "grace"]
+
+
+def legacy_match(ticket_text: str) -> Tuple[Optional[str], int]:
+    """The rules as they were before the compiled engine: substring checks on the
+    lowercased text, first run of digits anywhere (emails included) as the count."""
+    text = ticket_text.lower()
+    numbers = re.findall(r'\d+', text)
+    count = int(numbers[0]) if numbers else 1
+    if "add" in text or "new user" in text:
+        return "add_users", count
+    if "remove" in text or "disable" in text:
+        return "remove_user", count
+    if "permission" in text or "access" in text:
+        return "review_permissions", count
+    return None, count
+
+
+def generate_tickets(labeled: List[dict], count: int, seed: int = 0) -> List[dict]:
+    rng = random.Random(seed)
+    tickets = []
+    for _ in range(count):
+        row = rng.choice(labeled)
+        text = f"{rng.choice(GREETINGS)}{row['text']}{rng.choice(SIGN_OFFS)} -- {rng.choice(NAMES).title()}"
+        tickets.append({**row, "text": text})
+    return tickets
+
+
+def accuracy(labeled: List[dict], match: Callable[[str], Tuple[Optional[str], int]]) -> dict:
+    action_hits = full_hits = 0
+    wrong = Counter()  # (label, predicted) for a confident wrong action
+    for row in labeled:
+        action, count = match(row["text"])
+        action = action or "unclear"
+        if action == row["action"]:
+            action_hits += 1
+            full_hits += count == row["user_count"]
+        elif action != "unclear":
+            wrong[f"{row['action']} -> {action}"] += 1
+    return {
+        "action": round(action_hits / len(labeled), 4),
+        "action_and_count": round(full_hits / len(labeled), 4),
+        "wrong_action": dict(wrong.most_common()),
+    }
+
+
+def _time(fn: Callable[[], object], tickets: int) -> dict:
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    return {
+        "seconds": round(elapsed, 3),
+        "tickets_per_second": round(tickets / elapsed),
+        "us_per_ticket": round(elapsed / tickets * 1e6, 2),
+    }
+
+
+def run(tickets: int, seed: int = 0) -> dict:
+    # shared.config reads the environment at import time: no key, no LLM calls.
+    os.environ["OPENROUTER_API_KEY"] = ""
+    from agents.account_agent.intent import extract_intent, extract_intents_batch, match_rules
+
+    labeled = json.loads(LABELED_PATH.read_text())
+    holdout = json.loads(HOLDOUT_PATH.read_text())
+    corpus = generate_tickets(labeled, tickets, seed)
+    texts = [ticket["text"] for ticket in corpus]
+
+    def rules(text):
+        action, count, _ = match_rules(text)
+        return action, count
+
+    return {
+        "benchmark": "intents",
+        "tickets": tickets,
+        "unique_texts": len(set(texts)),
+        "labeled_set": {"path": str(LABELED_PATH.relative_to(LABELED_PATH.parent.parent)), "size": len(labeled)},
+        "holdout_set": {"path": str(HOLDOUT_PATH.relative_to(HOLDOUT_PATH.parent.parent)), "size": len(holdout)},
+        "accuracy": {
+            "legacy": accuracy(labeled, legacy_match),
+            "rules": accuracy(labeled, rules),
+            # The same labels over the generated corpus: the variations mustn't matter.
+            "rules_on_corpus": accuracy(corpus, rules),
+        },
+        "holdout_accuracy": {
+            "legacy": accuracy(holdout, legacy_match),
+            "rules": accuracy(holdout, rules),
+        },
+        "throughput": {
+            "legacy": _time(lambda: [legacy_match(text) for text in texts], tickets),
+            "match_rules": _time(lambda: [match_rules(text) for text in texts], tickets),
+            "extract_intent": _time(lambda: [extract_intent(text) for text in texts], tickets),
+            "extract_intents_batch": _time(lambda: extract_intents_batch(texts), tickets),
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    results = run(args.tickets, args.seed)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
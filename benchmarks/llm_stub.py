@@ -0,0 +1,206 @@
+"""A local OpenAI-compatible stand-in for OpenRouter, for performance testing without
+a key, the network, or free-tier rate limits deciding the results.
+
+    python -m benchmarks.llm_stub --port 8090 --latency-ms 800 --rate-limit-rate 0.05
+    OPENROUTER_BASE_URL=http://localhost:8090 OPENROUTER_API_KEY=stub python -m agents.router_agent.main
+
+Serves `POST /chat/completions` — plain or streamed (`"stream": true`, as SSE
+chunks) — answering each agent's system prompt with a canned, schema-valid
+LLMClassification / AccountIntent / AgentResponse (anything else gets
+`{"ok": true}`, which is what scripts/llm_smoke_test.py asks for). Each response
+waits a latency drawn from the configured distribution first, and a configurable
+fraction are replaced by a 429 or by truncated, unparseable JSON — the failure modes
+shared/llm_client.py has to degrade through. Every random draw comes from one seeded
+generator, so a run's sequence of delays and failures is reproducible.
+
+`GET /stub/stats` counts what was served; `PUT /stub/config` changes any setting
+(e.g. `{"rate_limit_rate": 0.5}`) while the server runs. The shared/llm_client.py
+side is just OPENROUTER_BASE_URL; OPENROUTER_API_KEY must be set (to anything) for
+the agents to make LLM calls at all.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Literal, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from agents.account_agent.intent import ACCOUNT_INTENT_SYSTEM_PROMPT
+from agents.router_agent.router_logic import CLASSIFIER_SYSTEM_PROMPT
+from agents.technical_agent.rag import TECH_AGENT_SYSTEM_PROMPT
+
+CANNED_RESPONSES = {
+    CLASSIFIER_SYSTEM_PROMPT: {
+        "category": "technical",
+        "priority": "medium",
+        "reasoning": "The ticket describes a dashboard problem rather than an access request.",
+        "confidence": 0.8,
+    },
+    ACCOUNT_INTENT_SYSTEM_PROMPT: {
+        "action": "review_permissions",
+        "user_count": 1,
+        "reasoning": "The user is asking about their existing access.",
+    },
+    TECH_AGENT_SYSTEM_PROMPT: {
+        "response": "**Suggested fix:**\n\n1. Check Tableau Server status\n2. Clear your browser cache\n"
+                    "3. Reload the dashboard",
+        "escalate": False,
+        "escalation_reason": None,
+        "kb_articles_used": ["Dashboard Loading Issues"],
+    },
+}
+DEFAULT_RESPONSE = {"ok": True}
+STREAM_CHUNK_CHARS = 16
+
+
+class StubConfig(BaseModel):
+    latency_ms: float = Field(200.0, ge=0, description="Median delay before the response starts.")
+    latency_distribution: Literal["fixed", "uniform", "lognormal", "exponential"] = "lognormal"
+    # lognormal: sigma of the underlying normal; uniform: ± this fraction of latency_ms.
+    latency_spread: float = Field(0.5, ge=0)
+    rate_limit_rate: float = Field(0.0, ge=0, le=1)
+    malformed_rate: float = Field(0.0, ge=0, le=1)
+    stream_chunk_delay_ms: float = Field(0.0, ge=0)
+    seed: int = 0
+
+
+def _latency_seconds(config: StubConfig, rng: random.Random) -> float:
+    median = config.latency_ms / 1000
+    if config.latency_distribution == "fixed":
+        return median
+    if config.latency_distribution == "uniform":
+        return max(median * (1 + rng.uniform(-config.latency_spread, config.latency_spread)), 0)
+    if config.latency_distribution == "lognormal":
+        return median * math.exp(rng.gauss(0, config.latency_spread))
+    # An exponential with this median, not this mean.
+    return rng.expovariate(math.log(2) / median) if median > 0 else 0
+
+
+def _error(status: int, message: str, error_type: str) -> JSONResponse:
+    return JSONResponse({"error": {"message": message, "type": error_type, "code": status}}, status_code=status)
+
+
+def _completion(model: str, content: str, prompt_chars: int) -> dict:
+    prompt_tokens, completion_tokens = prompt_chars // 4, len(content) // 4
+    return {
+        "id": f"chatcmpl-stub-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason: Optional[str] = None) -> str:
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(chunk)}\n\n"
+
+
+def create_app(config: Optional[StubConfig] = None) -> FastAPI:
+    app = FastAPI(title="Stub OpenRouter")
+    app.state.config = config or StubConfig()
+    app.state.rng = random.Random(app.state.config.seed)
+    app.state.stats = Counter()
+
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages")
+        if not messages:
+            return _error(400, "messages is required", "invalid_request_error")
+        config, rng, stats = app.state.config, app.state.rng, app.state.stats
+        model = body.get("model", "stub")
+        stream = bool(body.get("stream"))
+
+        # All the draws for this request up front, so a request's fate doesn't
+        # depend on how other requests' awaits interleave with it.
+        delay = _latency_seconds(config, rng)
+        rate_limited = rng.random() < config.rate_limit_rate
+        malformed = rng.random() < config.malformed_rate
+        stats["requests"] += 1
+
+        await asyncio.sleep(delay)
+        if rate_limited:
+            stats["rate_limited"] += 1
+            return _error(429, "Rate limit exceeded (stub)", "rate_limit_exceeded")
+
+        system = next((m.get("content") for m in messages if m.get("role") == "system"), "")
+        content = json.dumps(CANNED_RESPONSES.get(system, DEFAULT_RESPONSE))
+        if malformed:
+            stats["malformed"] += 1
+            content = content[: len(content) // 2]
+        prompt_chars = sum(len(m.get("content") or "") for m in messages)
+
+        if not stream:
+            stats["completed"] += 1
+            return _completion(model, content, prompt_chars)
+
+        stats["streamed"] += 1
+        completion_id = f"chatcmpl-stub-{uuid.uuid4().hex[:12]}"
+
+        async def events():
+            yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+            for start in range(0, len(content), STREAM_CHUNK_CHARS):
+                if config.stream_chunk_delay_ms:
+                    await asyncio.sleep(config.stream_chunk_delay_ms / 1000)
+                yield _chunk(completion_id, model, {"content": content[start:start + STREAM_CHUNK_CHARS]})
+            yield _chunk(completion_id, model, {}, finish_reason="stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stub/stats")
+    async def stats():
+        return dict(app.state.stats)
+
+    @app.put("/stub/config")
+    async def update_config(changes: dict):
+        try:
+            updated = StubConfig.model_validate({**app.state.config.model_dump(), **changes})
+        except ValueError as e:
+            return _error(422, str(e), "invalid_request_error")
+        if updated.seed != app.state.config.seed:
+            app.state.rng = random.Random(updated.seed)
+        app.state.config = updated
+        return updated.model_dump()
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    for name, field in StubConfig.model_fields.items():
+        option = f"--{name.replace('_', '-')}"
+        if name == "latency_distribution":
+            parser.add_argument(option, default=field.default, choices=["fixed", "uniform", "lognormal", "exponential"])
+        else:
+            parser.add_argument(option, type=type(field.default), default=field.default, help=field.description)
+    args = parser.parse_args()
+
+    config = StubConfig(**{name: getattr(args, name) for name in StubConfig.model_fields})
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""Microbenchmarks for the hot functions, with a stored baseline and a regression gate.
+
+    python -m benchmarks.micro                      # run everything, print JSON
+    python -m benchmarks.micro --save               # ...and store it as the baseline
+    python -m benchmarks.micro --check              # exit 1 if anything regressed
+    python -m benchmarks.micro --check --only retrieve --threshold 0.1
+    python -m benchmarks.micro --scale 0.01 --baseline /tmp/quick.json --save
+
+Seeds a temp-file SQLite database at realistic sizes — 10k users, 10k KB articles,
+1M tickets (the pending-escalation queue is the last two days' escalations) — then
+times each function the way pytest-benchmark does: a warmup call, the iteration
+count calibrated so one round takes at least --min-round-seconds, and --rounds
+rounds, reporting per-call min/median/mean/stddev in microseconds.
+
+`--check` compares against the baseline (benchmarks/baselines/micro.json unless
+--baseline says otherwise) and fails when any function's per-call min — the
+statistic least disturbed by a noisy machine — is more than --threshold slower,
+and stays that way when re-measured (--retries times).
+Timings only compare on the same hardware: after a deliberate performance change,
+or on a new machine, re-record the baseline with --save. Not part of the pytest
+suite; seeding and a full run take a few minutes.
+
+The memo in front of extract_intent and RouterLogic.classify (shared/memo.py) is off
+for their entries, which cycle a handful of texts and would otherwise time nothing
+but LRU hits; the "(memo hit)" entries time that path separately. Run it without
+OPENROUTER_API_KEY: a weak rule result then falls back without a network call (and,
+as in production, isn't memoized).
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine, insert, literal, select
+from sqlalchemy.orm import sessionmaker
+
+from agents.account_agent.intent import extract_intent
+from agents.router_agent.router_logic import RouterLogic
+from agents.technical_agent.resolution_cache import find_cached_resolution
+from agents.technical_agent.technical_kb import TechnicalKnowledgeBase
+from benchmarks.metrics import DEPARTMENTS, seed_tickets
+from shared import config
+from shared.db.base import Base
+from shared.db.metrics import compute_ticket_metrics
+from shared.db.models import Department, Escalation, KBArticle, License, Ticket, User, utcnow
+from shared.db.rollups import rebuild_rollups
+from shared.escalation_review import list_pending_escalations
+from shared.logging_config import JSONFormatter
+from shared.models import SupportTicket
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines" / "micro.json"
+TEMPLATES_PATH = Path(__file__).resolve().parent.parent / "data" / "mock_tickets.json"
+KB_ARTICLES_PATH = Path(__file__).resolve().parent.parent / "data" / "kb_articles.json"
+
+SIZES = {"users": 10_000, "kb_articles": 10_000, "tickets": 1_000_000}
+PENDING_ESCALATION_AGE = timedelta(days=2)
+
+INTENT_TEXTS = [
+    "Need to add 5 new users for the derivatives desk",
+    "Please remove john.doe@fintechanalytics.com, he left the firm",
+    "Can you check my permission on the risk workbooks?",
+    "Requesting access to the CCAR reporting templates",
+]
+
+
+def seed(engine, sizes: Dict[str, int], seed: int = 0) -> None:
+    rng = random.Random(seed)
+    with engine.begin() as conn:
+        for name in ("Viewer", "Explorer", "Creator"):
+            conn.execute(insert(License), {"name": name})
+        conn.execute(insert(Department), [
+            {"name": name, "max_users": sizes["users"], "license_id": 1 + i % 3} for i, name in enumerate(DEPARTMENTS)
+        ])
+        conn.execute(insert(User), [
+            {
+                "email": f"user{i}@fintechanalytics.com",
+                "department_id": 1 + i % len(DEPARTMENTS),
+                "license_id": 1 + i % 3,
+                "status": "removed" if i % 20 == 0 else "active",
+            }
+            for i in range(sizes["users"])
+        ])
+
+        # The real articles' symptom words plus a long tail of rarer terms, so a
+        # ticket matches a realistic handful of the 10k articles rather than all.
+        real = json.loads(KB_ARTICLES_PATH.read_text())
+        vocabulary = sorted({s for article in real for s in article["symptoms"]})
+        vocabulary += [f"term{i}" for i in range(2_000)]
+        conn.execute(insert(KBArticle), [
+            {
+                "title": f"KB article {i}",
+                "body": real[i % len(real)]["solution"],
+                "symptoms": rng.sample(vocabulary, rng.randint(3, 6)),
+                "escalate": i % 5 == 0,
+            }
+            for i in range(sizes["kb_articles"])
+        ])
+
+    seed_tickets(engine, sizes["tickets"], seed)
+    cutoff = utcnow() - PENDING_ESCALATION_AGE
+    with engine.begin() as conn:
+        conn.execute(insert(Escalation).from_select(
+            ["ticket_id", "escalated_by", "reason", "queue_name", "resolved", "created_at"],
+            select(
+                Ticket.ticket_id, literal("technical_agent"), literal("Benchmark escalation"),
+                literal("escalation_queue"), Ticket.created_at < cutoff, Ticket.created_at,
+            ).where(Ticket.escalated.is_(True)),
+        ))
+    with sessionmaker(bind=engine)() as db:
+        rebuild_rollups(db)
+
+
+def _log_record() -> logging.LogRecord:
+    record = logging.LogRecord(
+        "agents.technical_agent.main", logging.INFO, __file__, 0,
+        "Resolved ticket via %s", ("llm",), None,
+    )
+    # What the request thread captures for a typical agent log line.
+    record.log_context = {
+        "agent": "technical_agent", "ticket_id": "TKT-20260101-0042",
+        "trace_id": "4bf92f3577b34da6a3ce929d0e0e4736", "span_id": "00f067aa0ba902b7",
+        "method": "llm", "latency_ms": 812.4,
+    }
+    return record
+
+
+def _memo_on(func: Callable[[], object]) -> Callable[[], object]:
+    """`func` with the memo enabled for the duration of the call (it's read per call)."""
+    def call():
+        size, config.MEMO_SIZE = config.MEMO_SIZE, 10_000
+        try:
+            return func()
+        finally:
+            config.MEMO_SIZE = size
+    return call
+
+
+def benchmarks(db) -> Dict[str, Callable[[], object]]:
+    """name -> zero-argument callable making one representative call."""
+    templates = json.loads(TEMPLATES_PATH.read_text())
+    tickets = itertools.cycle([
+        SupportTicket(
+            ticket_id=f"MB{i}", created_at=utcnow(),
+            **{k: v for k, v in t.items() if not k.startswith("expected_")},
+        )
+        for i, t in enumerate(templates)
+    ])
+    ticket_texts = itertools.cycle([f"{t['subject']} {t['description']}" for t in templates])
+    intent_texts = itertools.cycle(INTENT_TEXTS)
+    subjects = itertools.cycle([f"Benchmark subject {i}" for i in range(0, 200, 7)])
+
+    router, kb, formatter, record = RouterLogic(), TechnicalKnowledgeBase(db), JSONFormatter(), _log_record()
+    return {
+        "RouterLogic.classify": lambda: router.classify(next(tickets)),
+        "RouterLogic.classify (memo hit)": _memo_on(lambda: router.classify(next(tickets))),
+        "TechnicalKnowledgeBase.retrieve": lambda: kb.retrieve(next(ticket_texts)),
+        "extract_intent": lambda: extract_intent(next(intent_texts)),
+        "extract_intent (memo hit)": _memo_on(lambda: extract_intent(next(intent_texts))),
+        "find_cached_resolution": lambda: find_cached_resolution(db, next(subjects)),
+        "compute_ticket_metrics": lambda: compute_ticket_metrics(db),
+        "list_pending_escalations": lambda: list_pending_escalations(db, limit=50),
+        "JSONFormatter.format": lambda: formatter.format(record),
+    }
+
+
+def measure(func: Callable[[], object], rounds: int, min_round_seconds: float) -> dict:
+    func()  # warmup: first-call caches, statement compilation
+    iterations = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_round_seconds:
+            break
+        iterations *= 2
+
+    per_call = [elapsed / iterations]
+    for _ in range(rounds - 1):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        per_call.append((time.perf_counter() - started) / iterations)
+
+    us = [seconds * 1_000_000 for seconds in per_call]
+    return {
+        "min_us": round(min(us), 3),
+        "median_us": round(statistics.median(us), 3),
+        "mean_us": round(statistics.mean(us), 3),
+        "stddev_us": round(statistics.stdev(us), 3) if len(us) > 1 else 0.0,
+        "rounds": rounds,
+        "iterations": iterations,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _regression(result: dict, base: Optional[dict]) -> Optional[float]:
+    return None if base is None else result["min_us"] / base["min_us"] - 1
+
+
+def run(
+    database_url: str,
+    sizes: Dict[str, int],
+    only: List[str],
+    rounds: int,
+    min_round_seconds: float,
+    baseline: Optional[dict] = None,
+    threshold: float = 0.0,
+    retries: int = 0,
+) -> dict:
+    """With a `baseline`, functions that come out more than `threshold` slower are
+    measured again in up to `retries` later passes, keeping each one's fastest
+    attempt — so a burst of load from elsewhere on the machine isn't reported as a
+    regression, while a real one still is."""
+    config.MEMO_SIZE = 0  # see the module docstring; `_memo_on` turns it back on
+    engine = create_engine(database_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    seed(engine, sizes)
+
+    base = baseline["results"] if baseline else {}
+    results = {}
+    with sessionmaker(bind=engine)() as db:
+        funcs = {name: func for name, func in benchmarks(db).items() if not only or name in only}
+        for name, func in funcs.items():
+            results[name] = measure(func, rounds, min_round_seconds)
+        for _ in range(retries):
+            slower = [name for name in funcs if (_regression(results[name], base.get(name)) or 0) > threshold]
+            if not slower:
+                break
+            for name in slower:
+                retry = measure(funcs[name], rounds, min_round_seconds)
+                if retry["min_us"] < results[name]["min_us"]:
+                    results[name] = retry
+    return {
+        "benchmark": "micro",
+        "commit": _git_commit(),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpu": platform.processor()},
+        "dialect": engine.dialect.name,
+        "sizes": sizes,
+        "results": results,
+    }
+
+
+def check(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """Print a comparison table; returns the names of the functions that regressed."""
+    regressed = []
+    print(f"{'function':<40} {'baseline µs':>14} {'current µs':>14} {'change':>9}")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        change = _regression(result, base)
+        if change is None:
+            print(f"{name:<40} {'—':>14} {result['min_us']:>14.3f} {'new':>9}")
+            continue
+        flag = ""
+        if change > threshold:
+            regressed.append(name)
+            flag = "  REGRESSED"
+        print(f"{name:<40} {base['min_us']:>14.3f} {result['min_us']:>14.3f} {change:>+9.1%}{flag}")
+    return regressed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every dataset size by this.")
+    parser.add_argument("--only", action="append", default=[], help="Run just this function (repeatable).")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-round-seconds", type=float, default=0.05)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="Store the results as the baseline.")
+    parser.add_argument("--check", action="store_true", help="Fail if anything regressed against the baseline.")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown, e.g. 0.25 for 25%%.")
+    parser.add_argument("--retries", type=int, default=2, help="Re-measurements before a slowdown counts.")
+    parser.add_argument("--database-url", help="Scratch database to seed; defaults to a temp-file SQLite DB.")
+    args = parser.parse_args()
+
+    sizes = {name: max(int(size * args.scale), 1) for name, size in SIZES.items()}
+    baseline = None
+    if args.check:
+        if not args.baseline.exists():
+            print(f"No baseline at {args.baseline} — record one with --save first.", file=sys.stderr)
+            return 2
+        baseline = json.loads(args.baseline.read_text())
+        if baseline["sizes"] != sizes:
+            print(f"Baseline was recorded at sizes {baseline['sizes']}, not {sizes}.", file=sys.stderr)
+            return 2
+
+    options = dict(
+        sizes=sizes,
+        only=args.only,
+        rounds=args.rounds,
+        min_round_seconds=args.min_round_seconds,
+        baseline=baseline,
+        threshold=args.threshold,
+        retries=args.retries,
+    )
+    if args.database_url:
+        results = run(args.database_url, **options)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            results = run(f"sqlite:///{os.path.join(tmp, 'bench.db')}", **options)
+
+    if args.save:
+        stored = json.loads(args.baseline.read_text()) if args.only and args.baseline.exists() else None
+        if stored is not None and stored["sizes"] == sizes:
+            # A partial run updates just those functions in the stored baseline.
+            results["results"] = {**stored["results"], **results["results"]}
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+
+    if baseline is None:
+        print(json.dumps(results, indent=2))
+        return 0
+    regressed = check(results, baseline, args.threshold)
+    if regressed:
+        print(f"\n{len(regressed)} function(s) regressed by more than {args.threshold:.0%}: {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
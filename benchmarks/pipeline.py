@@ -0,0 +1,305 @@
+"""End-to-end load test of the ticket pipeline: orchestrator -> router -> technical/account agent.
+
+    python -m benchmarks.pipeline --tickets 500 --rate 20 --output results.json
+    python -m benchmarks.pipeline --llm-latency-ms 1500 --llm-failure-rate 0.2
+    python -m benchmarks.pipeline --no-llm        # rules/cache paths only
+
+Runs the three agents' FastAPI apps under uvicorn on localhost ports in this process
+and drives them through the real AgentOrchestrator, so every ticket pays the same
+HTTP hops, serialization and DB commits it would in Docker Compose. What's swapped
+out: the database is a freshly seeded temp-file SQLite DB (or --database-url, which
+is written to — point it at a scratch database), Redis is an in-memory stand-in, and
+the LLM is the stub server in benchmarks/llm_stub.py, also under uvicorn here:
+schema-valid answers after a lognormal delay around --llm-latency-ms, with 429s on
+--llm-failure-rate of calls and truncated JSON on --llm-malformed-rate (the OpenAI
+client's own retries on a 429 happen as they would against OpenRouter).
+
+Tickets are generated from the data/mock_tickets.json templates (department, sender
+and wording varied; --repeat-rate of them reuse a template's exact subject, so the
+technical agent's resolution cache sees realistic repeats) and sent open-loop at
+--rate per second: each ticket's latency is measured from when it was due to be
+sent, so a backed-up pipeline shows up as latency rather than a slower send rate.
+
+Reports throughput and p50/p95/p99 end to end, per stage (from the agents' own
+`timings` breakdown, see shared/stage_timing.py) and per agent decision method, as
+JSON on stdout and, with --output, in a file to compare against later runs. Not part
+of the pytest suite.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import uvicorn
+
+TEMPLATES_PATH = Path(__file__).resolve().parent.parent / "data" / "mock_tickets.json"
+
+DEPARTMENTS = ["Trading", "Risk Management", "Compliance", "Marketing", "Operations", "Finance", "Executive"]
+FIRST_NAMES = ["alex", "priya", "tom", "mei", "jordan", "fatima", "lucas", "nina", "omar", "grace"]
+# Appended to a template's description so generated tickets aren't all verbatim copies.
+DETAILS = [
+    "",
+    " This started this morning.",
+    " Several people on my team are seeing the same thing.",
+    " It was working fine yesterday.",
+    " Please treat this as urgent.",
+    " We need 3 more seats for the new analysts.",
+]
+
+
+def generate_tickets(count: int, repeat_rate: float, seed: int = 0) -> List[dict]:
+    """`count` ticket payloads varied from the mock_tickets.json templates."""
+    templates = json.loads(TEMPLATES_PATH.read_text())
+    rng = random.Random(seed)
+    tickets = []
+    for i in range(count):
+        template = rng.choice(templates)
+        subject = template["subject"]
+        if rng.random() >= repeat_rate:
+            subject = f"{subject} (ref {rng.randint(1000, 99999)})"
+        tickets.append({
+            "ticket_id": f"LOAD{i:07d}",
+            "user_email": f"{rng.choice(FIRST_NAMES)}.{i}@fintechanalytics.com",
+            "department": rng.choice([template["department"], *DEPARTMENTS]),
+            "subject": subject,
+            "description": template["description"] + rng.choice(DETAILS),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "messages": [],
+        })
+    return tickets
+
+
+class FakeRedis:
+    """The subset of redis.Redis that shared/message_queue.py uses, kept in memory."""
+
+    def __init__(self):
+        self.lists: Dict[str, list] = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def ping(self) -> bool:
+        return True
+
+    def lpush(self, name: str, value: str) -> int:
+        with self.lock:
+            self.lists[name].insert(0, value)
+            return len(self.lists[name])
+
+    def llen(self, name: str) -> int:
+        with self.lock:
+            return len(self.lists[name])
+
+    def brpop(self, name: str, timeout: int = 0):
+        with self.lock:
+            return (name, self.lists[name].pop()) if self.lists[name] else None
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve(app, port: Optional[int] = None) -> str:
+    """Start `app` under uvicorn on a background thread; returns its base URL."""
+    port = port or _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+def _percentiles(values: List[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    if len(values) == 1:
+        cuts = values * 99
+    else:
+        cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {
+        "count": len(values),
+        "p50": round(cuts[49], 3),
+        "p95": round(cuts[94], 3),
+        "p99": round(cuts[98], 3),
+        "max": round(max(values), 3),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(
+    database_url: str,
+    tickets: int,
+    rate: float,
+    concurrency: int,
+    repeat_rate: float,
+    llm_latency_ms: float,
+    llm_failure_rate: float,
+    llm_malformed_rate: float,
+    use_llm: bool,
+    seed: int = 0,
+) -> dict:
+    # shared.config reads the environment at import time, so it has to be set before
+    # anything from shared/ or agents/ is imported.
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["OPENROUTER_API_KEY"] = "benchmark-stub" if use_llm else ""
+    llm_port = _free_port()
+    os.environ["OPENROUTER_BASE_URL"] = f"http://127.0.0.1:{llm_port}"
+    os.environ.pop("TRACE_EXPORT_PATH", None)
+
+    # Agents log to stdout (bound when they configure logging on import) and so does
+    # the seed script; keep stdout for the results.
+    with contextlib.redirect_stdout(sys.stderr):
+        from agents.account_agent import main as account_main
+        from agents.router_agent import main as router_main
+        from agents.technical_agent import main as technical_main
+        from benchmarks.llm_stub import StubConfig, create_app
+        from scripts.seed_db import seed as seed_db
+        from shared.models import SupportTicket
+        from shared.orchestrator import AgentOrchestrator
+
+        seed_db()
+
+    # Every agent logs a JSON line or two per ticket; at load-test volumes that's noise.
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if use_llm:
+        _serve(create_app(StubConfig(
+            latency_ms=llm_latency_ms, rate_limit_rate=llm_failure_rate, malformed_rate=llm_malformed_rate, seed=seed,
+        )), llm_port)
+    redis = FakeRedis()
+    for agent in (router_main, technical_main, account_main):
+        agent.mq.redis_client = redis
+
+    orchestrator = AgentOrchestrator()
+    orchestrator.agent_endpoints = {
+        "router": _serve(router_main.app),
+        "technical": _serve(technical_main.app),
+        "account": _serve(account_main.app),
+    }
+
+    corpus = generate_tickets(tickets, repeat_rate, seed)
+    interval = 1 / rate
+    results = []
+
+    def process(payload: dict, due: float) -> None:
+        result = orchestrator.process_support_ticket(SupportTicket(**payload))
+        results.append((time.perf_counter() - due, result))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i, payload in enumerate(corpus):
+            due = started + i * interval
+            time.sleep(max(due - time.perf_counter(), 0))
+            pool.submit(process, payload, due)
+    elapsed = time.perf_counter() - started
+
+    end_to_end, stages, methods = [], defaultdict(list), defaultdict(list)
+    errors = defaultdict(int)
+    for latency, result in results:
+        if result["status"] != "completed":
+            errors[result.get("error", "unknown")] += 1
+            continue
+        end_to_end.append(latency * 1000)
+        timings = result["timings"]
+        stages["network"].append(timings["network"])
+        for name, ms in timings["stages"].items():
+            stages[name].append(ms)
+        for step in result["conversation"]:
+            agent = step["agent"]
+            methods[f"{agent}:{step['result'].get('method', 'unknown')}"].append(
+                timings["by_agent"][agent]["round_trip"]
+            )
+
+    completed = len(end_to_end)
+    return {
+        "benchmark": "pipeline",
+        "commit": _git_commit(),
+        "run_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "dialect": database_url.split(":", 1)[0],
+            "tickets": tickets,
+            "target_rate_per_second": rate,
+            "concurrency": concurrency,
+            "repeat_rate": repeat_rate,
+            "llm": {
+                "latency_ms": llm_latency_ms, "failure_rate": llm_failure_rate, "malformed_rate": llm_malformed_rate,
+            } if use_llm else None,
+            "seed": seed,
+        },
+        "completed": completed,
+        "errors": dict(errors),
+        "duration_seconds": round(elapsed, 2),
+        "throughput_per_second": round(completed / elapsed, 2),
+        # Milliseconds. Stages are summed across both agents a ticket visits; method
+        # latency is that agent's round trip as the orchestrator saw it.
+        "latency_ms": {
+            "end_to_end": _percentiles(end_to_end),
+            "by_stage": {name: _percentiles(values) for name, values in sorted(stages.items())},
+            "by_method": {name: _percentiles(values) for name, values in sorted(methods.items())},
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=10, help="Tickets sent per second.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Most tickets in flight at once.")
+    parser.add_argument("--repeat-rate", type=float, default=0.3,
+                        help="Fraction of tickets reusing a template's exact subject (resolution-cache hits).")
+    parser.add_argument("--llm-latency-ms", type=float, default=800, help="Median stub LLM latency.")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.05, help="Fraction of LLM calls answered 429.")
+    parser.add_argument("--llm-malformed-rate", type=float, default=0.0,
+                        help="Fraction of LLM calls answered with unparseable JSON.")
+    parser.add_argument("--no-llm", action="store_true", help="Run with no LLM configured at all.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database-url", help="Scratch database to seed; defaults to a temp-file SQLite DB.")
+    parser.add_argument("--output", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    options = dict(
+        tickets=args.tickets,
+        rate=args.rate,
+        concurrency=args.concurrency,
+        repeat_rate=args.repeat_rate,
+        llm_latency_ms=args.llm_latency_ms,
+        llm_failure_rate=args.llm_failure_rate,
+        llm_malformed_rate=args.llm_malformed_rate,
+        use_llm=not args.no_llm,
+        seed=args.seed,
+    )
+    if args.database_url:
+        results = run(args.database_url, **options)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            results = run(f"sqlite:///{os.path.join(tmp, 'bench.db')}", **options)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Department lookups against a remote Tableau backend, direct and through
+`CachingTableauBackend` (shared/tableau_cache.py).
+
+    python -m benchmarks.tableau_cache                          # 2000 operations, 100 ms per REST call
+    python -m benchmarks.tableau_cache --latency-ms 250 --write-rate 0.05 --output tableau_cache.json
+
+Serves the Tableau REST stand-in (benchmarks/tableau_stub.py) under uvicorn in this
+process and runs the same operation mix against it twice: once through `RestBackend`
+— the REST reads a Tableau backend has to make, kept to what this benchmark needs —
+and once through that backend wrapped in a CachingTableauBackend. Operations are
+`get_department` (departments drawn with a skew towards the first few, as ticket
+traffic is), `get_site_status` on --site-rate of them, and `provision_user` (a new
+user, which invalidates the cache) on --write-rate, run --concurrency at a time.
+
+Reports per-operation latency percentiles, the REST calls the stub served, and the
+cache's hit / stale-hit / miss counts, as JSON on stdout and, with --output, in a
+file. Not part of the pytest suite.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+API_VERSION = "3.22"
+PAGE_SIZE = 1000
+
+
+class RestBackend:
+    """The read path of a Tableau REST backend, plus `provision_user` and
+    `deactivate_user`: a department is a group, its license the group's minimum site
+    role, its active users the members not `Unlicensed`. Seat limits come from
+    `capacities`; reservations live in the support database, not on Tableau, so
+    `reserved_users` is always 0 here."""
+
+    def __init__(self, base_url: str, capacities: Dict[str, int], site: str = "fintechanalytics"):
+        self.capacities = capacities
+        self.http = httpx.Client(base_url=f"{base_url}/api/{API_VERSION}", timeout=30)
+        response = self.http.post("/auth/signin", json={"credentials": {
+            "personalAccessTokenName": "benchmark", "personalAccessTokenSecret": "stub", "site": {"contentUrl": site},
+        }})
+        response.raise_for_status()
+        credentials = response.json()["credentials"]
+        self.http.headers["X-Tableau-Auth"] = credentials["token"]
+        self.site_path = f"/sites/{credentials['site']['id']}"
+
+    def close(self) -> None:
+        self.http.close()
+
+    def _all(self, path: str, key: str, **params) -> List[dict]:
+        items, page = [], 1
+        while True:
+            response = self.http.get(f"{self.site_path}{path}", params={**params, "pageSize": PAGE_SIZE, "pageNumber": page})
+            response.raise_for_status()
+            body = response.json()
+            items.extend(body[f"{key}s"][key])
+            if len(items) >= int(body["pagination"]["totalAvailable"]):
+                return items
+            page += 1
+
+    def _group(self, name: str) -> Optional[dict]:
+        groups = self._all("/groups", "group", filter=f"name:eq:{name}")
+        return groups[0] if groups else None
+
+    def _user(self, email: str) -> Optional[dict]:
+        users = self._all("/users", "user", filter=f"name:eq:{email}")
+        return users[0] if users else None
+
+    def get_department(self, name: str):
+        from shared.tableau_service import DepartmentInfo
+
+        group = self._group(name)
+        if group is None or name not in self.capacities:
+            return None
+        members = self._all(f"/groups/{group['id']}/users", "user")
+        return DepartmentInfo(
+            name=name,
+            max_users=self.capacities[name],
+            current_users=sum(user["siteRole"] != "Unlicensed" for user in members),
+            license_type=group["minimumSiteRole"],
+        )
+
+    def get_site_status(self):
+        from shared.tableau_service import SiteStatus
+
+        groups = self._all("/groups", "group")
+        users = self._all("/users", "user")
+        return SiteStatus(
+            total_departments=len(groups),
+            total_active_users=sum(user["siteRole"] != "Unlicensed" for user in users),
+            total_capacity=sum(self.capacities.values()),
+        )
+
+    def provision_user(self, email: str, department: str) -> bool:
+        group = self._group(department)
+        if group is None:
+            return False
+        user = self._user(email)
+        role = {"siteRole": group["minimumSiteRole"]}
+        if user is None:
+            response = self.http.post(f"{self.site_path}/users", json={"user": {"name": email, **role}})
+        else:
+            response = self.http.put(f"{self.site_path}/users/{user['id']}", json={"user": role})
+        response.raise_for_status()
+        user_id = response.json()["user"]["id"]
+        response = self.http.post(f"{self.site_path}/groups/{group['id']}/users", json={"user": {"id": user_id}})
+        return response.status_code in (200, 409)
+
+    def deactivate_user(self, email: str) -> bool:
+        user = self._user(email)
+        if user is None:
+            return False
+        response = self.http.put(f"{self.site_path}/users/{user['id']}", json={"user": {"siteRole": "Unlicensed"}})
+        return response.is_success
+
+
+def generate_operations(departments: List[str], count: int, site_rate: float, write_rate: float,
+                        seed: int = 0) -> List[tuple]:
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, len(departments) + 1)]
+    operations = []
+    for i in range(count):
+        department = rng.choices(departments, weights)[0]
+        draw = rng.random()
+        if draw < write_rate:
+            operations.append(("provision_user", f"bench.{i}@fintechanalytics.com", department))
+        elif draw < write_rate + site_rate:
+            operations.append(("get_site_status",))
+        else:
+            operations.append(("get_department", department))
+    return operations
+
+
+def _drive(backend, operations: List[tuple], concurrency: int) -> dict:
+    from benchmarks.pipeline import _percentiles
+
+    latencies = defaultdict(list)
+
+    def call(operation: tuple) -> None:
+        started = time.perf_counter()
+        getattr(backend, operation[0])(*operation[1:])
+        latencies[operation[0]].append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, operations))
+    elapsed = time.perf_counter() - started
+    return {
+        "duration_seconds": round(elapsed, 2),
+        "operations_per_second": round(len(operations) / elapsed, 1),
+        "latency_ms": {name: _percentiles(values) for name, values in sorted(latencies.items())},
+    }
+
+
+def run(operations: int, concurrency: int, latency_ms: float, site_rate: float, write_rate: float,
+        ttl_seconds: float, stale_seconds: float, seed: int = 0) -> dict:
+    # Nothing here touches a database, but shared/ reads its config at import.
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    from benchmarks.pipeline import _serve
+    from benchmarks.tableau_stub import StubConfig, create_app
+    from scripts.seed_db import DEPARTMENTS
+    from shared.tableau_cache import CachingTableauBackend
+
+    capacities = {name: info["max_users"] for name, info in DEPARTMENTS.items()}
+    workload = generate_operations(list(DEPARTMENTS), operations, site_rate, write_rate, seed)
+    results = {}
+    for mode in ("direct", "cached"):
+        # A fresh site per mode, so both start from the same users.
+        stub = create_app(StubConfig(latency_ms=latency_ms, seed=seed))
+        rest = RestBackend(_serve(stub), capacities)
+        backend = CachingTableauBackend(rest, ttl_seconds, stale_seconds) if mode == "cached" else rest
+        try:
+            results[mode] = _drive(backend, workload, concurrency)
+        finally:
+            if mode == "cached":
+                results[mode]["cache"] = dict(backend.stats)
+                backend.close()
+            rest.close()
+        results[mode]["rest_calls"] = dict(stub.state.stats)
+
+    return {
+        "benchmark": "tableau_cache",
+        "config": {
+            "operations": operations, "concurrency": concurrency, "latency_ms": latency_ms,
+            "site_rate": site_rate, "write_rate": write_rate,
+            "ttl_seconds": ttl_seconds, "stale_seconds": stale_seconds, "seed": seed,
+        },
+        **results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operations", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=100, help="Stub delay per REST call.")
+    parser.add_argument("--site-rate", type=float, default=0.05, help="Fraction of operations that are get_site_status.")
+    parser.add_argument("--write-rate", type=float, default=0.01, help="Fraction that are provision_user.")
+    parser.add_argument("--ttl-seconds", type=float, default=30)
+    parser.add_argument("--stale-seconds", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    results = run(args.operations, args.concurrency, args.latency_ms, args.site_rate, args.write_rate,
+                  args.ttl_seconds, args.stale_seconds, args.seed)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""A local stand-in for the Tableau REST API, for developing and benchmarking Tableau
+backends (shared/tableau_cache.py, and a REST client behind the `TableauBackend`
+protocol) without a Tableau Cloud site, credentials, or its rate limits.
+
+    python -m benchmarks.tableau_stub --port 8091 --latency-ms 150
+
+Models the part of a site the agents touch, seeded from scripts/seed_db.py: one
+group per department whose `minimumSiteRole` is the department's license, with that
+department's users as members. A deactivated user keeps their account with site role
+`Unlicensed`, as on a real site. Seat limits aren't something Tableau stores, so a
+client brings its own per-department capacities.
+
+Serves, under /api/{version} (any version) and in Tableau's JSON shapes:
+
+    POST   /auth/signin                               personal access token -> X-Tableau-Auth token
+    POST   /auth/signout
+    GET    /sites/{site}/groups                       pageSize/pageNumber, filter=name:eq:<name>
+    GET    /sites/{site}/groups/{group}/users         pageSize/pageNumber
+    GET    /sites/{site}/users                        pageSize/pageNumber, filter=name:eq:<email> or
+                                                      name:in:[<email>,<email>,...]
+    GET    /sites/{site}/users/{user}/groups          pageSize/pageNumber
+    POST   /sites/{site}/users                        add a user
+    PUT    /sites/{site}/users/{user}                 change a user's site role
+    POST   /sites/{site}/groups/{group}/users         add a user to a group
+    DELETE /sites/{site}/groups/{group}/users/{user}  remove a user from a group
+
+Every call except signin needs a live token; tokens expire after --token-ttl-seconds
+and an expired or unknown one is a 401 with Tableau's error code 401002. Each
+response waits --latency-ms first (± --latency-spread of it, from a seeded
+generator). `GET /stub/stats` counts calls by operation; `PUT /stub/config` changes
+any setting while the server runs.
+"""
+import argparse
+import asyncio
+import math
+import random
+import secrets
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, Field
+
+SITE_CONTENT_URL = "fintechanalytics"
+EMAIL_DOMAIN = "fintechanalytics.com"
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+SITE_ROLES = {"Creator", "Explorer", "Viewer", "Unlicensed"}
+
+
+class StubConfig(BaseModel):
+    latency_ms: float = Field(100.0, ge=0, description="Delay before every response.")
+    latency_spread: float = Field(0.2, ge=0, le=1, description="± this fraction of latency_ms, uniformly.")
+    token_ttl_seconds: float = Field(14400.0, gt=0, description="Lifetime of a signin token.")
+    seed: int = 0
+
+
+def _id(kind: str, name: str) -> str:
+    # Stable ids, so a restarted stub (or a test) can be addressed with the same ones.
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"tableau-stub:{kind}:{name}"))
+
+
+def _slug(name: str) -> str:
+    return name.lower().replace(" ", "-")
+
+
+class TableauSite:
+    """The stub's state: users, groups and memberships of one site."""
+
+    def __init__(self, content_url: str = SITE_CONTENT_URL):
+        self.content_url = content_url
+        self.id = _id("site", content_url)
+        self.users: Dict[str, dict] = {}
+        self.user_ids_by_name: Dict[str, str] = {}
+        self.groups: Dict[str, dict] = {}
+        # group id -> member user ids, in the order they joined (dict as an ordered set)
+        self.members: Dict[str, Dict[str, None]] = {}
+
+    @classmethod
+    def seeded(cls, departments: Optional[Dict[str, dict]] = None) -> "TableauSite":
+        """A site with the seed_db departments (or `departments`, in its format) and
+        their `current_users` members each."""
+        if departments is None:
+            from scripts.seed_db import DEPARTMENTS as departments
+        site = cls()
+        for name, info in departments.items():
+            group = site.add_group(name, info["license"])
+            for i in range(info["current_users"]):
+                user = site.add_user(f"{_slug(name)}.user{i:04d}@{EMAIL_DOMAIN}", info["license"])
+                site.members[group["id"]][user["id"]] = None
+        return site
+
+    def add_group(self, name: str, minimum_site_role: str) -> dict:
+        group = {"id": _id("group", name), "name": name, "minimumSiteRole": minimum_site_role}
+        self.groups[group["id"]] = group
+        self.members[group["id"]] = {}
+        return group
+
+    def add_user(self, name: str, site_role: str) -> dict:
+        user = {"id": _id("user", name), "name": name, "siteRole": site_role}
+        self.users[user["id"]] = user
+        self.user_ids_by_name[name] = user["id"]
+        return user
+
+
+def _hours_minutes_seconds(seconds: float) -> str:
+    # Tableau's format for a token's estimatedTimeToExpiration, e.g. "239:59:59".
+    minutes, seconds = divmod(math.floor(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+def _error(status: int, code: str, summary: str, detail: str = "") -> JSONResponse:
+    return JSONResponse({"error": {"code": code, "summary": summary, "detail": detail}}, status_code=status)
+
+
+def _name_filter(request: Request) -> Optional[List[str]]:
+    """The names a `filter=name:eq:<name>` or `filter=name:in:[<name>,...]` query
+    parameter asks for (the only filters served); None if there's no filter."""
+    expression = request.query_params.get("filter")
+    if not expression or expression.count(":") < 2:
+        return None
+    field, operator, value = expression.split(":", 2)
+    if field != "name":
+        return None
+    if operator == "in":
+        return value.strip("[]").split(",")
+    return [value]
+
+
+def _page(request: Request, items: List[dict], key: str):
+    """Tableau's paginated envelope: {"pagination": {...}, "<key>s": {"<key>": [...]}}."""
+    try:
+        size = min(int(request.query_params.get("pageSize", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        number = int(request.query_params.get("pageNumber", 1))
+    except ValueError:
+        return _error(400, "400006", "Bad Request", "pageSize and pageNumber must be integers")
+    if size < 1 or number < 1:
+        return _error(400, "400006", "Bad Request", "pageSize and pageNumber must be positive")
+    start = (number - 1) * size
+    return {
+        "pagination": {"pageNumber": str(number), "pageSize": str(size), "totalAvailable": str(len(items))},
+        f"{key}s": {key: items[start:start + size]},
+    }
+
+
+def create_app(config: Optional[StubConfig] = None, site: Optional[TableauSite] = None) -> FastAPI:
+    app = FastAPI(title="Stub Tableau REST API")
+    app.state.config = config or StubConfig()
+    app.state.rng = random.Random(app.state.config.seed)
+    app.state.site = site or TableauSite.seeded()
+    app.state.tokens: Dict[str, float] = {}  # token -> expiry (time.monotonic())
+    app.state.stats = Counter()
+
+    @app.middleware("http")
+    async def latency_and_auth(request: Request, call_next):
+        path = request.url.path
+        if not path.startswith("/api/"):
+            return await call_next(request)
+        config = app.state.config
+        delay = config.latency_ms / 1000 * (1 + app.state.rng.uniform(-config.latency_spread, config.latency_spread))
+        await asyncio.sleep(delay)
+        if not path.endswith("/auth/signin"):
+            expires = app.state.tokens.get(request.headers.get("X-Tableau-Auth", ""))
+            if expires is None or expires <= time.monotonic():
+                app.state.stats["unauthorized"] += 1
+                return _error(401, "401002", "Unauthorized Access", "Invalid authentication credentials were provided.")
+        return await call_next(request)
+
+    def _site(site_id: str) -> Optional[TableauSite]:
+        return app.state.site if site_id == app.state.site.id else None
+
+    def _site_not_found(site_id: str) -> JSONResponse:
+        return _error(404, "404000", "Resource Not Found", f"Site '{site_id}' could not be found.")
+
+    @app.post("/api/{version}/auth/signin")
+    async def signin(version: str, body: dict):
+        app.state.stats["signin"] += 1
+        credentials = body.get("credentials") or {}
+        if not credentials.get("personalAccessTokenName") or not credentials.get("personalAccessTokenSecret"):
+            return _error(401, "401001", "Signin Error", "Missing personal access token.")
+        if (credentials.get("site") or {}).get("contentUrl", "") != app.state.site.content_url:
+            return _error(401, "401001", "Signin Error", "Unknown site.")
+        token = secrets.token_urlsafe(24)
+        app.state.tokens[token] = time.monotonic() + app.state.config.token_ttl_seconds
+        return {"credentials": {
+            "token": token,
+            "estimatedTimeToExpiration": _hours_minutes_seconds(app.state.config.token_ttl_seconds),
+            "site": {"id": app.state.site.id, "contentUrl": app.state.site.content_url},
+            "user": {"id": _id("user", credentials["personalAccessTokenName"])},
+        }}
+
+    @app.post("/api/{version}/auth/signout")
+    async def signout(version: str, request: Request):
+        app.state.stats["signout"] += 1
+        app.state.tokens.pop(request.headers.get("X-Tableau-Auth", ""), None)
+        return Response(status_code=204)
+
+    @app.get("/api/{version}/sites/{site_id}/groups")
+    async def list_groups(version: str, site_id: str, request: Request):
+        app.state.stats["list_groups"] += 1
+        site = _site(site_id)
+        if site is None:
+            return _site_not_found(site_id)
+        names = _name_filter(request)
+        groups = [g for g in site.groups.values() if names is None or g["name"] in names]
+        return _page(request, groups, "group")
+
+    @app.get("/api/{version}/sites/{site_id}/groups/{group_id}/users")
+    async def group_users(version: str, site_id: str, group_id: str, request: Request):
+        app.state.stats["group_users"] += 1
+        site = _site(site_id)
+        if site is None:
+            return _site_not_found(site_id)
+        if group_id not in site.groups:
+            return _error(404, "404002", "Resource Not Found", f"Group '{group_id}' could not be found.")
+        return _page(request, [site.users[user_id] for user_id in site.members[group_id]], "user")
+
+    @app.get("/api/{version}/sites/{site_id}/users")
+    async def list_users(version: str, site_id: str, request: Request):
+        app.state.stats["list_users"] += 1
+        site = _site(site_id)
+        if site is None:
+            return _site_not_found(site_id)
+        names = _name_filter(request)
+        if names is not None:
+            users = [site.users[site.user_ids_by_name[name]] for name in names if name in site.user_ids_by_name]
+        else:
+            users = list(site.users.values())
+        return _page(request, users, "user")
+
+    @app.get("/api/{version}/sites/{site_id}/users/{user_id}/groups")
+    async def user_groups(version: str, site_id: str, user_id: str, request: Request):
+        app.state.stats["user_groups"] += 1
+        site = _site(site_id)
+        if site is None:
+            return _site_not_found(site_id)
+        if user_id not in site.users:
+            return _error(404, "404002", "Resource Not Found", f"User '{user_id}' could not be found.")
+        groups = [site.groups[group_id] for group_id, members in site.members.items() if user_id in members]
+        return _page(request, groups, "group")
+
+    @app.post("/api/{version}/sites/{site_id}/users")
+    async def create_user(version: str, site_id: str, body: dict):
+        app.state.stats["create_user"] += 1
+        site = _site(site_id)
+        if site is None:
+            return _site_not_found(site_id)
+        user = body.get("user") or {}
+        name, role = user.get("name"), user.get("siteRole")
+        if not name or role not in SITE_ROLES:
+            return _error(400, "400000", "Bad Request", "user.name and a valid user.siteRole are required.")
+        if name in site.user_ids_by_name:
+            return _error(409, "409000", "Conflict", f"User '{name}' already exists on the site.")
+        return JSONResponse({"user": site.add_user(name, role)}, status_code=201)
+
+    @app.put("/api/{version}/sites/{site_id}/users/{user_id}")
+    async def update_user(version: str, site_id: str, user_id: str, body: dict):
+        app.state.stats["update_user"] += 1
+        site = _site(site_id)
+        if site is None:
+            return _site_not_found(site_id)
+        user = site.users.get(user_id)
+        if user is None:
+            return _error(404, "404002", "Resource Not Found", f"User '{user_id}' could not be found.")
+        role = (body.get("user") or {}).get("siteRole")
+        if role not in SITE_ROLES:
+            return _error(400, "400000", "Bad Request", "A valid user.siteRole is required.")
+        user["siteRole"] = role
+        return {"user": user}
+
+    @app.post("/api/{version}/sites/{site_id}/groups/{group_id}/users")
+    async def add_to_group(version: str, site_id: str, group_id: str, body: dict):
+        app.state.stats["add_to_group"] += 1
+        site = _site(site_id)
+        if site is None:
+            return _site_not_found(site_id)
+        user_id = (body.get("user") or {}).get("id")
+        if group_id not in site.groups or user_id not in site.users:
+            return _error(404, "404002", "Resource Not Found", "Group or user could not be found.")
+        if user_id in site.members[group_id]:
+            return _error(409, "409011", "Conflict", "The user is already a member of the group.")
+        site.members[group_id][user_id] = None
+        return {"user": site.users[user_id]}
+
+    @app.delete("/api/{version}/sites/{site_id}/groups/{group_id}/users/{user_id}")
+    async def remove_from_group(version: str, site_id: str, group_id: str, user_id: str):
+        app.state.stats["remove_from_group"] += 1
+        site = _site(site_id)
+        if site is None:
+            return _site_not_found(site_id)
+        if user_id not in site.members.get(group_id, {}):
+            return _error(404, "404002", "Resource Not Found", "The user is not a member of the group.")
+        del site.members[group_id][user_id]
+        return Response(status_code=204)
+
+    @app.get("/stub/stats")
+    async def stats():
+        return dict(app.state.stats)
+
+    @app.put("/stub/config")
+    async def update_config(changes: dict):
+        try:
+            updated = StubConfig.model_validate({**app.state.config.model_dump(), **changes})
+        except ValueError as e:
+            return _error(422, "422000", "Invalid stub config", str(e))
+        if updated.seed != app.state.config.seed:
+            app.state.rng = random.Random(updated.seed)
+        app.state.config = updated
+        return updated.model_dump()
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8091)
+    for name, field in StubConfig.model_fields.items():
+        option = f"--{name.replace('_', '-')}"
+        parser.add_argument(option, type=type(field.default), default=field.default, help=field.description)
+    args = parser.parse_args()
+
+    config = StubConfig(**{name: getattr(args, name) for name in StubConfig.model_fields})
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
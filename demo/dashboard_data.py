@@ -0,0 +1,173 @@
+"""The dashboard's data, kept current off the page: `DashboardData` refreshes a
+snapshot of the system metrics (ticket metrics, handling-time percentiles, site
+status, LLM availability) every DASHBOARD_METRICS_REFRESH_SECONDS and of the agents'
+/health every DASHBOARD_HEALTH_REFRESH_SECONDS, each on its own background thread.
+
+streamlit_interface.py holds one instance per process (`st.cache_resource`), so
+every session reads the same snapshots and a rerun — any click — only reads memory.
+The cost is staleness, which the page shows: every snapshot carries its age, and a
+failed refresh keeps the last good snapshot alongside the error. `refresh()` asks
+for a new snapshot right away, without waiting for it, after something the user
+did should show up (a submitted ticket).
+
+Nothing here imports Streamlit, so it's testable on its own.
+"""
+import concurrent.futures
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable, Dict, Generic, Optional, TypeVar
+
+import requests
+from sqlalchemy.orm import Session
+
+from shared import config
+from shared.db.metrics import (
+    HandlingTimePercentiles,
+    LLMAvailability,
+    TicketMetrics,
+    compute_llm_availability,
+    compute_llm_availability_windows,
+    compute_ticket_metrics,
+    handling_time_percentiles,
+)
+from shared.db.session import SessionLocal
+from shared.tableau_service import SimulatedTableauBackend, SiteStatus
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+AGENT_NAMES = {"router": "Router Agent", "technical": "Technical Agent", "account": "Account Agent"}
+HEALTH_TIMEOUT_SECONDS = 2
+
+
+@dataclass(frozen=True)
+class Snapshot(Generic[T]):
+    value: T
+    taken_at: float  # time.time()
+
+    def age_seconds(self) -> float:
+        return max(time.time() - self.taken_at, 0.0)
+
+
+@dataclass(frozen=True)
+class SystemMetrics:
+    tickets: TicketMetrics
+    site: SiteStatus
+    llm: LLMAvailability
+    llm_windows: Dict[timedelta, LLMAvailability]
+    handling_percentiles: Dict[str, HandlingTimePercentiles]
+
+
+def load_system_metrics(db: Session) -> SystemMetrics:
+    return SystemMetrics(
+        tickets=compute_ticket_metrics(db),
+        site=SimulatedTableauBackend(db).get_site_status(),
+        llm=compute_llm_availability(db),
+        llm_windows=compute_llm_availability_windows(db),
+        handling_percentiles=handling_time_percentiles(db, group_by="department"),
+    )
+
+
+def _agent_is_online(url: str) -> bool:
+    try:
+        return requests.get(f"{url}/health", timeout=HEALTH_TIMEOUT_SECONDS).status_code == 200
+    except requests.RequestException:
+        return False
+
+
+def check_agent_health(endpoints: Dict[str, str]) -> Dict[str, bool]:
+    """Display name -> whether that agent's /health answered 200, checked in
+    parallel, so a sweep costs the slowest check rather than the sum."""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(endpoints)) as executor:
+        futures = {AGENT_NAMES.get(key, key): executor.submit(_agent_is_online, url) for key, url in endpoints.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+class PeriodicSnapshot(Generic[T]):
+    """`load()`'s latest result, reloaded every `interval` seconds on a daemon thread."""
+
+    def __init__(self, name: str, load: Callable[[], T], interval: float):
+        self.name = name
+        self.interval = interval
+        self._load = load
+        self._latest: Optional[Snapshot[T]] = None
+        self._error: Optional[str] = None
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def latest(self) -> Optional[Snapshot[T]]:
+        """The newest snapshot, or None until the first load finishes."""
+        return self._latest
+
+    @property
+    def error(self) -> Optional[str]:
+        """Why the most recent load failed; None if it succeeded."""
+        return self._error
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"dashboard-{self.name}", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def refresh(self) -> None:
+        """Load again now rather than at the next interval; doesn't wait for it."""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.clear()
+            try:
+                self._latest = Snapshot(self._load(), time.time())
+                self._error = None
+            except Exception as e:
+                logger.warning("Dashboard %s refresh failed: %s", self.name, e)
+                self._error = str(e) or type(e).__name__
+            self._wake.wait(self.interval)
+
+
+class DashboardData:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        endpoints: Optional[Dict[str, str]] = None,
+        metrics_interval: Optional[float] = None,
+        health_interval: Optional[float] = None,
+    ):
+        self._session_factory = session_factory
+        endpoints = config.AGENT_ENDPOINTS if endpoints is None else endpoints
+        self.metrics = PeriodicSnapshot(
+            "metrics", self._load_metrics,
+            config.DASHBOARD_METRICS_REFRESH_SECONDS if metrics_interval is None else metrics_interval,
+        )
+        self.health = PeriodicSnapshot(
+            "agent_health", lambda: check_agent_health(endpoints),
+            config.DASHBOARD_HEALTH_REFRESH_SECONDS if health_interval is None else health_interval,
+        )
+
+    def start(self) -> "DashboardData":
+        self.metrics.start()
+        self.health.start()
+        return self
+
+    def stop(self) -> None:
+        self.metrics.stop()
+        self.health.stop()
+
+    def _load_metrics(self) -> SystemMetrics:
+        db = self._session_factory()
+        try:
+            return load_system_metrics(db)
+        finally:
+            db.close()
@@ -5,11 +5,10 @@ import sys
 # sys.path, and this app imports the top-level `shared` package.
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import concurrent.futures
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Optional
 
-import requests
 import streamlit as st
 from sqlalchemy import func
 
@@ -26,14 +25,25 @@ try:
 except Exception:
     pass  # no Streamlit secrets configured — env vars come from the shell/.env instead
 
-from shared.config import AGENT_ENDPOINTS
-from shared.db.metrics import compute_llm_availability, compute_ticket_metrics
-from shared.db.models import Ticket, User
+from shared import config
+from shared.db.models import Department, Ticket, utcnow
 from shared.db.session import SessionLocal
-from shared.escalation_review import approve_escalation, list_pending_escalations, reject_escalation
+from shared.escalation_review import (
+    approve_escalation,
+    approve_escalations,
+    count_pending_escalations,
+    list_pending_escalations,
+    reject_escalation,
+    reject_escalations,
+)
 from shared.models import SupportTicket
 from shared.orchestrator import AgentOrchestrator
-from shared.tableau_service import SimulatedTableauBackend
+from shared.user_directory import search_users
+
+try:
+    from demo.dashboard_data import DashboardData, Snapshot
+except ImportError:  # the demo image copies demo/ itself to the app root
+    from dashboard_data import DashboardData, Snapshot
 
 # Configure page
 st.set_page_config(
@@ -44,6 +54,21 @@ st.set_page_config(
 
 orchestrator = AgentOrchestrator()
 
+USER_SEARCH_LIMIT = 50
+
+
+@st.cache_resource
+def dashboard_data() -> DashboardData:
+    """One per process, shared by every session: its background threads keep the
+    metrics and agent-health snapshots fresh, so no rerun waits on the DB or the
+    agents for them (see dashboard_data.py)."""
+    return DashboardData().start()
+
+
+def _age(snapshot: Snapshot) -> str:
+    seconds = snapshot.age_seconds()
+    return f"{seconds:.0f} s" if seconds < 120 else f"{seconds / 60:.0f} min"
+
 
 def main():
     st.title("🤖 Multi-Agent Tableau Customer Support System")
@@ -56,28 +81,25 @@ def main():
         "picture, or submit a ticket below to see it work."
     )
 
-    db = SessionLocal()
-    try:
-        pending_escalations = list_pending_escalations(db)
-        site_status = SimulatedTableauBackend(db).get_site_status()
-    finally:
-        db.close()
+    pending_count = _pending_count()
+    data = dashboard_data()
 
     # Sidebar configuration
     st.sidebar.header("System Configuration")
+    metrics = data.metrics.latest
+    site_status = metrics.value.site if metrics else None
     st.sidebar.info(
         f"**Company**: FinTech Analytics Corp\n"
-        f"**Users**: {site_status.total_active_users:,} Tableau users\n"
-        f"**Departments**: {site_status.total_departments} business units"
+        f"**Users**: {f'{site_status.total_active_users:,}' if site_status else '…'} Tableau users\n"
+        f"**Departments**: {site_status.total_departments if site_status else '…'} business units"
     )
 
-    # Check agent status
-    agent_status = check_agent_status()
-    display_agent_status(agent_status)
-    display_cold_start_banner(agent_status)
+    # Agent status, as of the last background health check
+    display_agent_status(data.health.latest)
+    display_cold_start_banner(data.health.latest)
 
-    if pending_escalations:
-        st.sidebar.warning(f"⚠️ {len(pending_escalations)} escalation(s) awaiting review")
+    if pending_count:
+        st.sidebar.warning(f"⚠️ {pending_count} escalation(s) awaiting review")
 
     # Main interface tabs
     tab1, tab2, tab3, tab4 = st.tabs(
@@ -91,47 +113,28 @@ def main():
         predefined_scenarios()
 
     with tab3:
-        human_review_interface(pending_escalations)
+        human_review_interface()
 
     with tab4:
         system_architecture()
 
 
-def _agent_is_online(url: str) -> bool:
-    try:
-        response = requests.get(f"{url}/health", timeout=2)
-        return response.status_code == 200
-    except requests.RequestException:
-        return False
-
-
-def check_agent_status():
-    """Check if all agents are running, in parallel — this runs on every Streamlit
-    rerun (every button click, not just first page load), so keeping it to the
-    slowest single check rather than the sum of three matters for responsiveness."""
-    agents = {
-        "Router Agent": AGENT_ENDPOINTS["router"],
-        "Technical Agent": AGENT_ENDPOINTS["technical"],
-        "Account Agent": AGENT_ENDPOINTS["account"],
-    }
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=len(agents)) as executor:
-        futures = {name: executor.submit(_agent_is_online, url) for name, url in agents.items()}
-        return {name: ("🟢 Online" if future.result() else "🔴 Offline") for name, future in futures.items()}
-
-
-def display_agent_status(status):
+def display_agent_status(health: Optional[Snapshot]):
     """Display agent status in sidebar"""
     st.sidebar.header("Agent Status")
-    for agent, state in status.items():
-        st.sidebar.markdown(f"**{agent}**: {state}")
+    if health is None:
+        st.sidebar.caption("Checking agents…")
+        return
+    for agent, online in health.value.items():
+        st.sidebar.markdown(f"**{agent}**: {'🟢 Online' if online else '🔴 Offline'}")
+    st.sidebar.caption(f"Checked {_age(health)} ago")
 
 
-def display_cold_start_banner(status):
+def display_cold_start_banner(health: Optional[Snapshot]):
     """Prominent, actionable banner when any agent is offline — likely a free-tier
     cold start rather than a real outage, so tell the user what's actually going on
     instead of leaving them looking at an unexplained red dot in the sidebar."""
-    if all(state.startswith("🟢") for state in status.values()):
+    if health is None or all(health.value.values()):
         return
     st.warning(
         "Some agents are showing offline. If this is the free-tier deployment, it "
@@ -142,16 +145,16 @@ def display_cold_start_banner(status):
 
 
 @st.cache_data(ttl=300)
-def _user_directory() -> dict:
-    """email -> department for every active seeded user, cached briefly since
-    Streamlit reruns this whole script on every interaction and re-querying
-    ~3,800 rows that often would be wasteful. Backs the email selectbox below —
-    since the dropdown is built from this same directory, every option is by
-    construction a real, found user."""
+def _find_users(prefix: str) -> dict:
+    """email -> department for the first active users whose email starts with
+    `prefix` — one indexed query (see shared/user_directory.py), so the form never
+    loads the whole directory. Cached briefly per prefix since Streamlit reruns this
+    whole script on every interaction. Backs the email selectbox below — since its
+    options come from this same lookup, every option is by construction a real,
+    found user."""
     db = SessionLocal()
     try:
-        users = db.query(User).filter(User.status == "active").order_by(User.email).all()
-        return {u.email: u.department.name for u in users}
+        return {user.email: user.department for user in search_users(db, prefix, limit=USER_SEARCH_LIMIT)}
     finally:
         db.close()
 
@@ -163,7 +166,7 @@ def _top_subjects(limit: int = 10) -> list:
     exists to rank on its own merit. This is the "self-learning" piece: as more
     tickets come in with a given subject, it climbs the ranking and eventually
     displaces the static placeholders. Cached for the same rerun-frequency
-    reason as _user_directory — a newly-submitted subject can take up to the
+    reason as _find_users — a newly-submitted subject can take up to the
     cache TTL to affect the ranking, a deliberate trade-off against
     re-aggregating the whole tickets table on every page interaction.
     """
@@ -212,10 +215,20 @@ def live_demo_interface():
     with col1:
         st.subheader("Submit Support Request")
 
-        directory = _user_directory()
-        user_email = st.selectbox("User Email", list(directory.keys()))
-        department = directory[user_email]
-        st.caption(f"Department: **{department}**")
+        email_prefix = st.text_input(
+            "Find user", key="user_email_prefix", placeholder="Start of their email, e.g. john.smith"
+        )
+        matches = _find_users(email_prefix)
+        if matches:
+            user_email = st.selectbox("User Email", list(matches), key="user_email")
+            department = matches[user_email]
+            caption = f"Department: **{department}**"
+            if len(matches) == USER_SEARCH_LIMIT:
+                caption += f"  ·  first {USER_SEARCH_LIMIT} matches — keep typing to narrow them"
+            st.caption(caption)
+        else:
+            user_email = department = None
+            st.warning(f"No active user's email starts with “{email_prefix.strip()}”.")
 
         subject_choice = st.selectbox("Subject", _top_subjects() + ["Other"], key="ticket_subject_choice")
         if subject_choice == "Other":
@@ -228,7 +241,7 @@ def live_demo_interface():
         )
         description = st.text_area("Problem Description", key="ticket_description")
 
-        submit_clicked = st.button("🚀 Submit Ticket", type="primary")
+        submit_clicked = st.button("🚀 Submit Ticket", type="primary", disabled=user_email is None)
 
         if st.session_state.pop("_ticket_just_submitted", False):
             st.success("Ticket submitted — form is reset and ready for a new one.")
@@ -252,6 +265,8 @@ def live_demo_interface():
                     "longer than usual if a free-tier agent is waking up from idle..."
                 ):
                     result = orchestrator.process_support_ticket(ticket)
+                dashboard_data().metrics.refresh()
+                _pending_count.clear()  # the ticket may have escalated
 
                 st.session_state['last_result'] = result
 
@@ -307,8 +322,41 @@ def display_agent_conversation(result):
 
         st.write(f"**Confidence**: {handling['response']['confidence_score']:.0%}")
 
+    timings = result.get("timings")
+    if timings:
+        display_stage_timings(timings)
+
     # Final result
-    st.success(f"Ticket {result['ticket_id']} processed successfully! Resolution time: < 2 seconds.")
+    total = f"{timings['total'] / 1000:.2f} s" if timings else "—"
+    st.success(f"Ticket {result['ticket_id']} processed successfully! Resolution time: {total}.")
+
+
+STAGE_LABELS = {
+    "queue_wait": "Queue wait",
+    "classification": "Classification",
+    "retrieval": "Retrieval",
+    "llm": "LLM",
+    "db_write": "DB write",
+    "network": "Network",
+}
+
+
+def display_stage_timings(timings: dict):
+    """Where this ticket's time went, per stage summed across agents (see
+    shared/stage_timing.py), plus whatever the stages didn't cover."""
+    stages = {**timings["stages"], "network": timings["network"]}
+    accounted = sum(stages.values())
+    rows = [
+        {"Stage": STAGE_LABELS.get(name, name), "ms": round(ms, 1)}
+        for name, ms in stages.items() if ms > 0
+    ]
+    rows.append({"Stage": "Other (agent logic, UI)", "ms": round(max(timings["total"] - accounted, 0.0), 1)})
+    with st.expander(f"⏱️ Timing breakdown — {timings['total']:.0f} ms total"):
+        st.bar_chart(rows, x="Stage", y="ms", horizontal=True)
+        st.caption(" · ".join(
+            f"{agent.replace('_', ' ')}: {agent_timings['round_trip']:.0f} ms round trip"
+            for agent, agent_timings in timings["by_agent"].items()
+        ))
 
 
 def predefined_scenarios():
@@ -374,6 +422,8 @@ def predefined_scenarios():
                         "free-tier agent is waking up from idle..."
                     ):
                         result = orchestrator.process_support_ticket(ticket)
+                    dashboard_data().metrics.refresh()
+                    _pending_count.clear()  # the ticket may have escalated
 
                     st.session_state[f'scenario_result_{i}'] = result
 
@@ -382,17 +432,137 @@ def predefined_scenarios():
                 display_agent_conversation(st.session_state[f'scenario_result_{i}'])
 
 
-def human_review_interface(pending):
-    """Human-in-the-loop review queue for tickets the AI agents escalated."""
+REVIEW_PAGE_SIZE = 20
+REVIEW_QUEUES = {
+    "All queues": None,
+    "Technical escalations": "escalation_queue",
+    "Manager approval": "manager_approval_queue",
+}
+REVIEW_AGES = {
+    "Any age": None,
+    "Waiting > 1 h": timedelta(hours=1),
+    "Waiting > 24 h": timedelta(days=1),
+    "Waiting > 7 days": timedelta(days=7),
+}
+
+
+@st.cache_data(ttl=300)
+def _department_names() -> list:
+    db = SessionLocal()
+    try:
+        return [name for (name,) in db.query(Department.name).order_by(Department.name)]
+    finally:
+        db.close()
+
+
+def _created_before(age: str) -> Optional[datetime]:
+    waited = REVIEW_AGES[age]
+    return utcnow() - waited if waited is not None else None
+
+
+@st.cache_data(ttl=30)
+def _pending_count(queue: str = "All queues", department: Optional[str] = None, age: str = "Any age") -> int:
+    """How many escalations match the review filters, cached per filter choice so
+    paging and typing in the drafts don't re-count. Keyed by the age *option*, not
+    the cutoff it implies, so the cache still hits as the clock moves; the count can
+    lag by the TTL, and review actions clear it."""
+    db = SessionLocal()
+    try:
+        return count_pending_escalations(
+            db, queue_name=REVIEW_QUEUES[queue], department=department, created_before=_created_before(age)
+        )
+    finally:
+        db.close()
+
+
+def _after_review() -> None:
+    _pending_count.clear()
+    st.rerun()
+
+
+def human_review_interface():
+    """Human-in-the-loop review queue for tickets the AI agents escalated, a page at
+    a time: only the visible page is queried and rendered, however deep the queue."""
     st.header("🧑‍💼 Human Review Queue")
     st.markdown("Tickets the AI agents escalated, waiting for a human decision.")
 
+    filter_col1, filter_col2, filter_col3 = st.columns(3)
+    with filter_col1:
+        department = st.selectbox("Department", ["All departments"] + _department_names(), key="review_department")
+    with filter_col2:
+        queue = st.selectbox("Queue", list(REVIEW_QUEUES), key="review_queue")
+    with filter_col3:
+        age = st.selectbox("Age", list(REVIEW_AGES), key="review_age")
+    department = None if department == "All departments" else department
+
+    # Keyset paging: a stack of the after_id each visited page started from, so
+    # "Previous" is a pop. New filters start over from the first page.
+    filters = (department, queue, age)
+    if st.session_state.get("review_filters") != filters:
+        st.session_state.review_filters = filters
+        st.session_state.review_cursors = [None]
+    cursors = st.session_state.review_cursors
+
+    total = _pending_count(queue, department, age)
+    db = SessionLocal()
+    try:
+        # One row past the page says whether there's a next page without trusting
+        # the (cached, possibly stale) count.
+        rows = list_pending_escalations(
+            db, limit=REVIEW_PAGE_SIZE + 1, after_id=cursors[-1], queue_name=REVIEW_QUEUES[queue],
+            department=department, created_before=_created_before(age),
+        )
+    finally:
+        db.close()
+    pending, has_next = rows[:REVIEW_PAGE_SIZE], len(rows) > REVIEW_PAGE_SIZE
+
     if not pending:
+        if len(cursors) > 1:  # the rest of this page was just reviewed
+            cursors.pop()
+            st.rerun()
         st.success("✅ No escalations pending review.")
         return
 
     reviewer = st.text_input("Reviewing as", "manager@fintechanalytics.com", key="reviewer_email")
-    st.info(f"**{len(pending)}** escalation(s) awaiting review.")
+    pages = max(-(-total // REVIEW_PAGE_SIZE), len(cursors))
+    st.info(f"**{total}** escalation(s) awaiting review — page {len(cursors)} of {pages}.")
+
+    with st.expander("📦 Bulk actions — e.g. clearing an outage backlog", expanded=False):
+        st.markdown("Send one response to every escalation on this page, in a single transaction:")
+        bulk_response = st.text_area(
+            "Response for all", key="bulk_review_text", label_visibility="collapsed", height=120
+        )
+        # A bulk write can't be undone, so both buttons wait for this. Keyed by the
+        # page's first and last escalation, it starts unticked for any other set.
+        confirmed = st.checkbox(
+            f"Yes, apply this to all {len(pending)} escalations on this page",
+            key=f"bulk_review_confirm_{pending[0].escalation_id}_{pending[-1].escalation_id}",
+        )
+        bulk_col1, bulk_col2 = st.columns(2)
+        with bulk_col1:
+            if st.button(
+                f"✅ Approve these {len(pending)} with this response",
+                disabled=not (confirmed and bulk_response.strip()),
+            ):
+                db = SessionLocal()
+                try:
+                    approve_escalations(
+                        db, [(esc.escalation_id, bulk_response) for esc in pending], reviewer=reviewer
+                    )
+                finally:
+                    db.close()
+                _after_review()
+        with bulk_col2:
+            if st.button(f"❌ Reject these {len(pending)}", disabled=not confirmed):
+                db = SessionLocal()
+                try:
+                    reject_escalations(
+                        db, [esc.escalation_id for esc in pending],
+                        "Handled manually outside the system.", reviewer=reviewer,
+                    )
+                finally:
+                    db.close()
+                _after_review()
 
     for esc in pending:
         with st.expander(f"🎫 {esc.ticket_id} — {esc.subject} ({esc.department})", expanded=False):
@@ -418,7 +588,7 @@ def human_review_interface(pending):
                         approve_escalation(db, esc.escalation_id, esc.draft_response or "", reviewer=reviewer)
                     finally:
                         db.close()
-                    st.rerun()
+                    _after_review()
             with col2:
                 if st.button("✏️ Send Edited Response", key=f"edit_{esc.escalation_id}"):
                     db = SessionLocal()
@@ -426,7 +596,7 @@ def human_review_interface(pending):
                         approve_escalation(db, esc.escalation_id, edited_response, reviewer=reviewer)
                     finally:
                         db.close()
-                    st.rerun()
+                    _after_review()
             with col3:
                 if st.button("❌ Reject", key=f"reject_{esc.escalation_id}"):
                     db = SessionLocal()
@@ -436,7 +606,82 @@ def human_review_interface(pending):
                         )
                     finally:
                         db.close()
-                    st.rerun()
+                    _after_review()
+
+    # Callbacks run before the next rerun, so turning a page costs one run, not two.
+    prev_col, next_col = st.columns(2)
+    with prev_col:
+        st.button("← Previous page", disabled=len(cursors) == 1, on_click=cursors.pop)
+    with next_col:
+        st.button("Next page →", disabled=not has_next, on_click=cursors.append, args=(pending[-1].escalation_id,))
+
+
+def _window_label(window) -> str:
+    minutes = int(window.total_seconds() // 60)
+    return f"{minutes // 60}h" if minutes % 60 == 0 else f"{minutes}m"
+
+
+@st.fragment(run_every=config.DASHBOARD_METRICS_REFRESH_SECONDS)
+def system_metrics():
+    """The latest metrics snapshot — a fragment rerunning on the refresh interval, so
+    the numbers (and their age) move without the rest of the page rerunning."""
+    data = dashboard_data()
+    snapshot, error = data.metrics.latest, data.metrics.error
+    if snapshot is None:
+        if error:
+            st.warning(f"Metrics unavailable: {error}")
+        else:
+            st.caption("Collecting metrics…")
+        return
+    metrics = snapshot.value.tickets
+    site_status = snapshot.value.site
+    llm_stats = snapshot.value.llm
+    llm_windows = snapshot.value.llm_windows
+    percentiles = snapshot.value.handling_percentiles
+
+    metrics_col1, metrics_col2 = st.columns(2)
+
+    with metrics_col1:
+        st.metric("Total Users Supported", f"{site_status.total_active_users:,}")
+        st.metric("Tickets Processed", f"{metrics.total_tickets:,}")
+        st.metric("Resolution Rate", f"{metrics.resolution_rate:.0%}" if metrics.total_tickets else "—")
+
+    with metrics_col2:
+        st.metric("Escalation Rate", f"{metrics.escalation_rate:.0%}" if metrics.total_tickets else "—")
+        median = metrics.median_handling_seconds
+        st.metric("Median Handling Time", f"{median:.1f} sec" if median is not None else "—")
+        st.metric("Departments", site_status.total_departments)
+
+    if percentiles:
+        st.markdown("**⏱️ Handling Time by Department**")
+        st.dataframe(
+            [
+                {"Department": department, "Tickets": p.count,
+                 "p50 (s)": round(p.p50, 1), "p90 (s)": round(p.p90, 1), "p99 (s)": round(p.p99, 1)}
+                for department, p in percentiles.items()
+            ],
+            hide_index=True,
+        )
+
+    st.markdown("**🧠 LLM Availability**")
+    if llm_stats.total_calls:
+        st.write(
+            f"{llm_stats.successful}/{llm_stats.total_calls} calls succeeded "
+            f"({llm_stats.availability_rate:.0%})"
+        )
+        if llm_stats.failures_by_reason:
+            reasons = ", ".join(f"{reason}: {count}" for reason, count in llm_stats.failures_by_reason.items())
+            st.caption(f"Failure reasons — {reasons}")
+        recent = " · ".join(
+            f"{_window_label(window)}: {stats.availability_rate:.0%}" if stats.total_calls
+            else f"{_window_label(window)}: —"
+            for window, stats in llm_windows.items()
+        )
+        st.caption(f"Recent availability — {recent}")
+    else:
+        st.caption("No LLM calls yet — rules haven't needed a fallback, or OPENROUTER_API_KEY isn't set.")
+
+    st.caption(f"As of {_age(snapshot)} ago" + (f" — the last refresh failed: {error}" if error else ""))
 
 
 def system_architecture():
@@ -469,39 +714,7 @@ def system_architecture():
 
     with col2:
         st.subheader("📊 System Metrics")
-
-        db = SessionLocal()
-        try:
-            metrics = compute_ticket_metrics(db)
-            site_status = SimulatedTableauBackend(db).get_site_status()
-            llm_stats = compute_llm_availability(db)
-        finally:
-            db.close()
-
-        metrics_col1, metrics_col2 = st.columns(2)
-
-        with metrics_col1:
-            st.metric("Total Users Supported", f"{site_status.total_active_users:,}")
-            st.metric("Tickets Processed", f"{metrics.total_tickets:,}")
-            st.metric("Resolution Rate", f"{metrics.resolution_rate:.0%}" if metrics.total_tickets else "—")
-
-        with metrics_col2:
-            st.metric("Escalation Rate", f"{metrics.escalation_rate:.0%}" if metrics.total_tickets else "—")
-            median = metrics.median_handling_seconds
-            st.metric("Median Handling Time", f"{median:.1f} sec" if median is not None else "—")
-            st.metric("Departments", site_status.total_departments)
-
-        st.markdown("**🧠 LLM Availability**")
-        if llm_stats.total_calls:
-            st.write(
-                f"{llm_stats.successful}/{llm_stats.total_calls} calls succeeded "
-                f"({llm_stats.availability_rate:.0%})"
-            )
-            if llm_stats.failures_by_reason:
-                reasons = ", ".join(f"{reason}: {count}" for reason, count in llm_stats.failures_by_reason.items())
-                st.caption(f"Failure reasons — {reasons}")
-        else:
-            st.caption("No LLM calls yet — rules haven't needed a fallback, or OPENROUTER_API_KEY isn't set.")
+        system_metrics()
 
     st.subheader("🔄 Communication Flow")
     st.markdown("""
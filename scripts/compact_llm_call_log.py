@@ -0,0 +1,24 @@
+"""Retention job for llm_call_log: deletes raw LLM call rows older than
+LLM_CALL_LOG_RETENTION_DAYS. Their hourly counts already live in llm_call_rollups,
+so the dashboard's all-time and long-window availability are unaffected. Safe to
+run as often as you like (e.g. a daily cron / scheduled `docker compose run`).
+"""
+from datetime import timedelta
+
+from shared.config import LLM_CALL_LOG_RETENTION_DAYS
+from shared.db.rollups import compact_llm_call_log
+from shared.db.session import SessionLocal, init_db
+
+
+def compact() -> None:
+    init_db()
+    db = SessionLocal()
+    try:
+        deleted = compact_llm_call_log(db, timedelta(days=LLM_CALL_LOG_RETENTION_DAYS))
+        print(f"Deleted {deleted} llm_call_log rows older than {LLM_CALL_LOG_RETENTION_DAYS} days.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    compact()
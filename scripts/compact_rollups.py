@@ -0,0 +1,26 @@
+"""Compaction job for the dashboard's ticket rollups: folds hourly buckets older
+than ROLLUP_HOURLY_DAYS into days, and days older than ROLLUP_DAILY_DAYS more into
+months, so reading all of history stays a bounded number of rows. Backfills the
+rollups first if they're empty. Safe to run as often as you like (e.g. an hourly
+or daily cron / scheduled `docker compose run`).
+"""
+from shared.config import ROLLUP_DAILY_DAYS, ROLLUP_HOURLY_DAYS
+from shared.db.rollups import compact_ticket_rollups
+from shared.db.session import SessionLocal, init_db
+
+
+def compact() -> None:
+    init_db()
+    db = SessionLocal()
+    try:
+        folded = compact_ticket_rollups(db)
+        print(
+            f"Folded {folded} rollup rows older than {ROLLUP_HOURLY_DAYS} day(s) into daily "
+            f"and older than {ROLLUP_HOURLY_DAYS + ROLLUP_DAILY_DAYS} days into monthly buckets."
+        )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    compact()
@@ -0,0 +1,29 @@
+"""Checks every department's maintained active-user counter (department_user_counts)
+against a real count of its active users and corrects any that drifted — e.g. after
+users were edited directly in the database rather than through the Tableau backend.
+Safe to run at any time (e.g. a nightly cron / scheduled `docker compose run`); exits
+non-zero if it had to correct anything, so a scheduler can alert on it.
+"""
+import sys
+
+from shared.db.session import SessionLocal, init_db
+from shared.tableau_service import reconcile_department_user_counts
+
+
+def reconcile() -> int:
+    init_db()
+    db = SessionLocal()
+    try:
+        drift = reconcile_department_user_counts(db)
+    finally:
+        db.close()
+    for d in drift:
+        counted = "missing" if d.counted is None else d.counted
+        print(f"{d.department}: counter was {counted}, actual active users {d.actual} — corrected.")
+    if not drift:
+        print("All department user counters match.")
+    return 1 if drift else 0
+
+
+if __name__ == "__main__":
+    sys.exit(reconcile())
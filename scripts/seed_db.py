@@ -1,15 +1,17 @@
 """One-time database seed: licenses, departments, a Faker-generated user
 population matching the original demo's per-department counts, and the KB
-articles from data/kb_articles.json. Safe to re-run — skips if already seeded.
+articles from data/kb_articles.json. Safe to re-run — skips if already seeded (after backfilling the metrics rollups
+and department user counters for a database that predates them).
 """
 import json
 from pathlib import Path
 
 from faker import Faker
 
-from shared.db.base import Base
 from shared.db.models import Department, KBArticle, License, User
-from shared.db.session import SessionLocal, engine
+from shared.db.rollups import backfill_rollups_if_empty
+from shared.db.session import SessionLocal, init_db
+from shared.tableau_service import reconcile_department_user_counts
 
 DEPARTMENTS = {
     "Trading": {"max_users": 900, "current_users": 850, "license": "Creator"},
@@ -25,10 +27,12 @@ KB_ARTICLES_PATH = Path(__file__).resolve().parent.parent / "data" / "kb_article
 
 
 def seed() -> None:
-    Base.metadata.create_all(bind=engine)
+    init_db()
     db = SessionLocal()
     try:
         if db.query(Department).count() > 0:
+            backfill_rollups_if_empty(db)
+            reconcile_department_user_counts(db)
             print("Database already seeded — skipping. Drop the tables / delete the DB file to reseed.")
             return
 
@@ -69,6 +73,7 @@ def seed() -> None:
             ))
 
         db.commit()
+        reconcile_department_user_counts(db)
         print(f"Seeded {len(DEPARTMENTS)} departments, {total_users} users, {len(articles)} KB articles.")
     finally:
         db.close()
@@ -15,10 +15,71 @@ DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./support.db")
 
 # Unused until the hybrid rules+LLM pipeline lands (see docs/UPGRADE_PLAN.md Phase 2).
 OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY")
+# Point the LLM client somewhere else — e.g. the local stub server in
+# benchmarks/llm_stub.py for performance testing.
+OPENROUTER_BASE_URL = os.environ.get("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 CLASSIFIER_MODEL = os.environ.get("CLASSIFIER_MODEL", "openrouter/free")
 GENERATION_MODEL = os.environ.get("GENERATION_MODEL", "openrouter/free")
 
+# Raw llm_call_log rows older than this are deleted by scripts/compact_llm_call_log.py
+# (their hourly counts stay in llm_call_rollups); windowed availability within it is exact.
+LLM_CALL_LOG_RETENTION_DAYS = int(os.environ.get("LLM_CALL_LOG_RETENTION_DAYS", "7"))
+
+# Ticket rollups (see shared/db/rollups.py) are hourly for this many days, daily for
+# ROLLUP_DAILY_DAYS before that, and monthly further back; scripts/compact_rollups.py
+# folds buckets into the coarser ones as they age.
+ROLLUP_HOURLY_DAYS = int(os.environ.get("ROLLUP_HOURLY_DAYS", "1"))
+ROLLUP_DAILY_DAYS = int(os.environ.get("ROLLUP_DAILY_DAYS", "7"))
+
+# How long each process reuses a department's capacity numbers (and the site totals)
+# before re-reading them (see shared/tableau_service.py); 0 disables the cache.
+DEPARTMENT_CACHE_TTL_SECONDS = float(os.environ.get("DEPARTMENT_CACHE_TTL_SECONDS", "5"))
+
+# How long licenses held by reserve_licenses stay held, if not committed or released,
+# before they count as free again (see shared/tableau_service.py).
+LICENSE_RESERVATION_TTL_MINUTES = int(os.environ.get("LICENSE_RESERVATION_TTL_MINUTES", "120"))
+
+# Which Tableau the account agent acts on: "simulated" (the support database, see
+# shared/tableau_service.py) or "cloud", a real site over its REST API (see
+# shared/tableau_cloud.py), signed in to with a personal access token.
+TABLEAU_BACKEND = os.environ.get("TABLEAU_BACKEND", "simulated")
+TABLEAU_SERVER_URL = os.environ.get("TABLEAU_SERVER_URL", "")
+TABLEAU_SITE = os.environ.get("TABLEAU_SITE", "")
+TABLEAU_PAT_NAME = os.environ.get("TABLEAU_PAT_NAME", "")
+TABLEAU_PAT_SECRET = os.environ.get("TABLEAU_PAT_SECRET", "")
+TABLEAU_API_VERSION = os.environ.get("TABLEAU_API_VERSION", "3.22")
+TABLEAU_MAX_CONCURRENCY = int(os.environ.get("TABLEAU_MAX_CONCURRENCY", "8"))
+
+# CachingTableauBackend / AsyncCachingTableauBackend (shared/tableau_cache.py), for
+# backends whose reads are remote calls (the account agent with TABLEAU_BACKEND=cloud):
+# how long a department's info is served without asking, and how much
+# longer a stale copy is still served while it's refreshed in the background.
+TABLEAU_CACHE_TTL_SECONDS = float(os.environ.get("TABLEAU_CACHE_TTL_SECONDS", "30"))
+TABLEAU_CACHE_STALE_SECONDS = float(os.environ.get("TABLEAU_CACHE_STALE_SECONDS", "300"))
+
+# How often the demo dashboard (demo/dashboard_data.py) refreshes its metrics
+# snapshot and its check of the agents' /health, in the background.
+DASHBOARD_METRICS_REFRESH_SECONDS = float(os.environ.get("DASHBOARD_METRICS_REFRESH_SECONDS", "30"))
+DASHBOARD_HEALTH_REFRESH_SECONDS = float(os.environ.get("DASHBOARD_HEALTH_REFRESH_SECONDS", "15"))
+
+# Memo of intent extraction and ticket classification by ticket text (see
+# shared/memo.py): entries per process (0 disables it), and optionally a shared
+# tier in Redis (REDIS_URL) whose entries expire after MEMO_REDIS_TTL_SECONDS.
+MEMO_SIZE = int(os.environ.get("MEMO_SIZE", "10000"))
+MEMO_REDIS = os.environ.get("MEMO_REDIS", "").lower() in ("1", "true", "yes")
+MEMO_REDIS_TTL_SECONDS = int(os.environ.get("MEMO_REDIS_TTL_SECONDS", "3600"))
+
 # Shared-secret header between internal services (see shared/auth.py). Auth is
 # opt-in: unset means every agent endpoint is open, which is what local dev and
 # the test suite rely on.
 INTERNAL_API_TOKEN = os.environ.get("INTERNAL_API_TOKEN")
+
+# Logging (see shared/logging_config.py): LOG_QUEUE moves JSON formatting and the
+# stdout write off the request thread; LOG_INFO_SAMPLE_RATE keeps that fraction of
+# tickets' INFO lines (WARNING and above are always kept).
+LOG_QUEUE = os.environ.get("LOG_QUEUE", "").lower() in ("1", "true", "yes")
+LOG_INFO_SAMPLE_RATE = float(os.environ.get("LOG_INFO_SAMPLE_RATE", "1"))
+
+# Append finished trace spans to this file as OTLP/JSON, one export request per line
+# (see shared/tracing.py). Unset: spans still correlate logs, but aren't written.
+TRACE_EXPORT_PATH = os.environ.get("TRACE_EXPORT_PATH")
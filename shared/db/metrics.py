@@ -1,10 +1,14 @@
-import statistics
 from dataclasses import dataclass, field
-from typing import Dict, Optional
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
 
+from sqlalchemy import case, func
 from sqlalchemy.orm import Session
 
-from shared.db.models import LLMCallLog, Ticket
+from shared.db import rollups
+from shared.config import LLM_CALL_LOG_RETENTION_DAYS
+from shared.db.models import HandlingTimeRollup, LLMCallLog, LLMCallRollup, TicketEvent, TicketRollup, utcnow
+from shared.db.sketch import DDSketch
 
 
 @dataclass
@@ -20,25 +24,43 @@ class TicketMetrics:
     tickets_by_priority: Dict[str, int] = field(default_factory=dict)
 
 
-def compute_ticket_metrics(db: Session) -> TicketMetrics:
-    tickets = db.query(Ticket).all()
-    total = len(tickets)
-    resolved = sum(1 for t in tickets if t.status == "resolved")
-    escalated = sum(1 for t in tickets if t.escalated)
-    open_count = sum(1 for t in tickets if t.status == "open")
+def compute_ticket_metrics(db: Session, window: Optional[timedelta] = None) -> TicketMetrics:
+    """Read from the incrementally maintained rollups (shared/db/rollups.py), never
+    from `tickets` itself — a fixed number of small grouped queries whose cost
+    depends on how many buckets the window spans, not how many tickets exist:
+    hourly ones for the last day, daily for the week before, monthly beyond that,
+    and for all time a single running-total bucket.
 
-    handling_times = [
-        (t.resolved_at - t.created_at).total_seconds()
-        for t in tickets
-        if t.resolved_at is not None
-    ]
+    `window` limits this to tickets created within roughly that long ago (rounded
+    out to the whole hour, day or month it starts in); None covers all time. The median handling time comes from
+    the rollups' log-scale histogram, accurate to within
+    `rollups.RELATIVE_ACCURACY` of the exact value; `handling_time_percentiles`
+    has the tails and per-group breakdowns.
+    """
+    def in_window(query, bucket_column):
+        return query.filter(rollups.ticket_window(bucket_column, window))
+
+    total, resolved, escalated, open_count = in_window(db.query(
+        func.coalesce(func.sum(TicketRollup.created), 0),
+        func.coalesce(func.sum(TicketRollup.resolved), 0),
+        func.coalesce(func.sum(TicketRollup.escalated), 0),
+        func.coalesce(func.sum(TicketRollup.open), 0),
+    ), TicketRollup.bucket_start).one()
 
-    by_department: Dict[str, int] = {}
-    by_priority: Dict[str, int] = {}
-    for t in tickets:
-        by_department[t.department] = by_department.get(t.department, 0) + 1
-        if t.priority:
-            by_priority[t.priority] = by_priority.get(t.priority, 0) + 1
+    by_department = dict(
+        in_window(db.query(TicketRollup.department, func.sum(TicketRollup.created)), TicketRollup.bucket_start)
+        .group_by(TicketRollup.department)
+        .having(func.sum(TicketRollup.created) > 0)
+        .all()
+    )
+    by_priority = dict(
+        in_window(db.query(TicketRollup.priority, func.sum(TicketRollup.created)), TicketRollup.bucket_start)
+        .filter(TicketRollup.priority != "")
+        .group_by(TicketRollup.priority)
+        .having(func.sum(TicketRollup.created) > 0)
+        .all()
+    )
+    handling = _handling_time_sketches(db, window, group_column=None).get(None, rollups.handling_time_sketch())
 
     return TicketMetrics(
         total_tickets=total,
@@ -47,12 +69,75 @@ def compute_ticket_metrics(db: Session) -> TicketMetrics:
         open=open_count,
         resolution_rate=(resolved / total) if total else 0.0,
         escalation_rate=(escalated / total) if total else 0.0,
-        median_handling_seconds=statistics.median(handling_times) if handling_times else None,
+        median_handling_seconds=handling.quantile(0.5),
         tickets_by_department=by_department,
         tickets_by_priority=by_priority,
     )
 
 
+HANDLING_TIME_GROUPS = {
+    "department": HandlingTimeRollup.department,
+}
+
+
+def _handling_time_sketches(
+    db: Session, window: Optional[timedelta], group_column
+) -> Dict[Optional[str], DDSketch]:
+    """One handling-time sketch per value of `group_column` (a single one keyed
+    None when it's None), merged in SQL across every bucket in `window`."""
+    columns = [HandlingTimeRollup.bin, func.sum(HandlingTimeRollup.count)]
+    if group_column is not None:
+        columns.insert(0, group_column)
+    query = db.query(*columns).filter(rollups.ticket_window(HandlingTimeRollup.bucket_start, window))
+    if group_column is not None:
+        query = query.filter(group_column != "").group_by(group_column)
+    rows = query.group_by(HandlingTimeRollup.bin).having(func.sum(HandlingTimeRollup.count) > 0).all()
+
+    sketches: Dict[Optional[str], DDSketch] = {}
+    for row in rows:
+        group = row[0] if group_column is not None else None
+        sketches.setdefault(group, rollups.handling_time_sketch()).add_bins([row[-2:]])
+    return sketches
+
+
+@dataclass
+class HandlingTimePercentiles:
+    count: int
+    p50: Optional[float]
+    p90: Optional[float]
+    p99: Optional[float]
+
+
+def handling_time_percentiles(
+    db: Session,
+    window: Optional[timedelta] = None,
+    group_by: Optional[str] = "department",
+) -> Dict[str, HandlingTimePercentiles]:
+    """p50/p90/p99 handling time per department (`group_by`), each within
+    `rollups.RELATIVE_ACCURACY` of the exact value; `group_by=None` gives a single
+    overall entry keyed "all". `window` works as in `compute_ticket_metrics`.
+
+    One grouped query over the handling-time rollups, whose sketches — one per
+    bucket and department, however many replicas wrote to it — are merged by
+    summing their bin counts in SQL. It reads at most buckets x departments x
+    bins rows; for all time, just the all-time bucket's.
+    """
+    if group_by is not None and group_by not in HANDLING_TIME_GROUPS:
+        raise ValueError(f"group_by must be one of {sorted(HANDLING_TIME_GROUPS)} or None, got {group_by!r}")
+    sketches = _handling_time_sketches(
+        db, window, HANDLING_TIME_GROUPS[group_by] if group_by is not None else None
+    )
+    return {
+        group if group is not None else "all": HandlingTimePercentiles(
+            count=sketch.count,
+            p50=sketch.quantile(0.5),
+            p90=sketch.quantile(0.9),
+            p99=sketch.quantile(0.99),
+        )
+        for group, sketch in sorted(sketches.items(), key=lambda item: item[0] or "")
+    }
+
+
 @dataclass
 class LLMAvailability:
     total_calls: int
@@ -61,22 +146,87 @@ class LLMAvailability:
     failures_by_reason: Dict[str, int] = field(default_factory=dict)
 
 
-def compute_llm_availability(db: Session) -> LLMAvailability:
-    """Aggregates shared.llm_client.complete_json()'s LLMCallLog rows — how often
-    LLM calls actually succeeded, and why they didn't when they failed.
-    """
-    logs = db.query(LLMCallLog).all()
-    total = len(logs)
-    successful = sum(1 for log in logs if log.success)
+# The dashboard's availability widget: recent enough to show an outage as it
+# happens, long enough to show a trend.
+AVAILABILITY_WINDOWS = (timedelta(minutes=5), timedelta(hours=1), timedelta(hours=24))
 
-    failures_by_reason: Dict[str, int] = {}
-    for log in logs:
-        if not log.success:
-            failures_by_reason[log.reason] = failures_by_reason.get(log.reason, 0) + 1
 
+def _availability(rows) -> LLMAvailability:
+    total = sum(calls for _, _, calls in rows)
+    successful = sum(calls for success, _, calls in rows if success)
     return LLMAvailability(
         total_calls=total,
         successful=successful,
         availability_rate=(successful / total) if total else 0.0,
-        failures_by_reason=failures_by_reason,
+        failures_by_reason={reason: calls for success, reason, calls in rows if not success and calls},
     )
+
+
+def compute_llm_availability(db: Session, window: Optional[timedelta] = None) -> LLMAvailability:
+    """Aggregates shared.llm_client.complete_json()'s call attempts — how often LLM
+    calls actually succeeded, and why they didn't when they failed.
+
+    A `window` within the raw log's retention (`LLM_CALL_LOG_RETENTION_DAYS`) is
+    exact, counted from llm_call_log itself (see `compute_llm_availability_windows`).
+    Anything longer — or None, for all time — reads the hourly LLMCallRollup
+    counters instead, rounded out to whole hours like `compute_ticket_metrics`.
+    """
+    if window is not None and window <= timedelta(days=LLM_CALL_LOG_RETENTION_DAYS):
+        return compute_llm_availability_windows(db, (window,))[window]
+
+    query = db.query(LLMCallRollup.success, LLMCallRollup.reason, func.sum(LLMCallRollup.calls))
+    since = rollups.window_start(window)
+    if since is not None:
+        query = query.filter(LLMCallRollup.bucket_start >= since)
+    return _availability(query.group_by(LLMCallRollup.success, LLMCallRollup.reason).all())
+
+
+def compute_llm_availability_windows(
+    db: Session, windows: Sequence[timedelta] = AVAILABILITY_WINDOWS
+) -> Dict[timedelta, LLMAvailability]:
+    """Exact availability over each of the trailing `windows`, in one grouped query
+    over llm_call_log: a range scan of the (created_at, model) index back to the
+    longest window, with one conditional count per window. Its cost follows the
+    traffic inside that window, not the table's whole history.
+    """
+    now = utcnow()
+    starts = [now - window for window in windows]
+    counts = [func.sum(case((LLMCallLog.created_at >= start, 1), else_=0)) for start in starts]
+    rows = (
+        db.query(LLMCallLog.success, LLMCallLog.reason, *counts)
+        .filter(LLMCallLog.created_at >= min(starts))
+        .group_by(LLMCallLog.success, LLMCallLog.reason)
+        .all()
+    )
+    return {
+        window: _availability([(row[0], row[1], row[2 + i]) for row in rows])
+        for i, window in enumerate(windows)
+    }
+
+
+@dataclass
+class SlowStage:
+    ticket_id: str
+    agent: str
+    stage_ms: float
+    timings: Dict[str, float]
+    timestamp: datetime
+
+
+def slowest_ticket_stages(
+    db: Session, stage: str, window: Optional[timedelta] = timedelta(hours=24), limit: int = 20
+) -> List[SlowStage]:
+    """The agent events where `stage` (see shared/stage_timing.py) took longest,
+    slowest first, from the `timings` breakdown each agent stores in its event
+    payload. A diagnostic query — it reads every event in `window` — not a
+    dashboard one.
+    """
+    stage_ms = TicketEvent.payload["timings"][stage].as_float()
+    query = db.query(TicketEvent.ticket_id, TicketEvent.agent, stage_ms, TicketEvent.payload, TicketEvent.timestamp)
+    if window is not None:
+        query = query.filter(TicketEvent.timestamp >= utcnow() - window)
+    rows = query.filter(stage_ms.isnot(None)).order_by(stage_ms.desc()).limit(limit).all()
+    return [
+        SlowStage(ticket_id=ticket_id, agent=agent, stage_ms=ms, timings=payload["timings"], timestamp=timestamp)
+        for ticket_id, agent, ms, payload, timestamp in rows
+    ]
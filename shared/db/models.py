@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, JSON, String, Text
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, JSON, String, Text
 from sqlalchemy.orm import relationship
 
 from shared.db.base import Base
@@ -32,6 +32,16 @@ class Department(Base):
 
 class User(Base):
     __tablename__ = "users"
+    # Backs SimulatedTableauBackend's per-department active-user count. Lookups by
+    # email (+ status) are already served by the unique index on `email`, and so are
+    # user_directory's prefix searches on SQLite; Postgres needs a text_pattern_ops
+    # index to serve a LIKE prefix.
+    __table_args__ = (
+        Index("ix_users_department_id_status", "department_id", "status"),
+        Index("ix_users_email_pattern", "email", postgresql_ops={"email": "text_pattern_ops"}).ddl_if(
+            dialect="postgresql"
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     email = Column(String(255), unique=True, nullable=False)
@@ -44,6 +54,39 @@ class User(Base):
     license = relationship("License")
 
 
+class DepartmentUserCount(Base):
+    """A department's active-user count, kept in step with `users` by
+    SimulatedTableauBackend in the same transaction as each provision/deactivation,
+    so a capacity check reads one row instead of counting. A side table rather than
+    a Department column so init_db() can add it to an existing database; a missing
+    row is counted from `users` on first read, and
+    tableau_service.reconcile_department_user_counts repairs any drift.
+    """
+    __tablename__ = "department_user_counts"
+
+    department_id = Column(Integer, ForeignKey("departments.id"), primary_key=True)
+    active_users = Column(Integer, nullable=False, default=0)
+
+
+class LicenseReservation(Base):
+    """Seats held for a department by SimulatedTableauBackend.reserve_licenses until
+    they're committed (provisioned), released, or `expires_at` passes. Pending,
+    unexpired holds count against the department's capacity; an expired one simply
+    stops counting, so nothing has to sweep them up."""
+    __tablename__ = "license_reservations"
+    # Backs the capacity check's sum of a department's pending, unexpired holds.
+    __table_args__ = (
+        Index("ix_license_reservations_department_id_status_expires_at", "department_id", "status", "expires_at"),
+    )
+
+    id = Column(String(36), primary_key=True)
+    department_id = Column(Integer, ForeignKey("departments.id"), nullable=False)
+    seats = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending | committed | released
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+
 class KBArticle(Base):
     __tablename__ = "kb_articles"
 
@@ -56,6 +99,8 @@ class KBArticle(Base):
 
 class Ticket(Base):
     __tablename__ = "tickets"
+    # Backs the technical agent's resolution cache: exact-subject match, newest first.
+    __table_args__ = (Index("ix_tickets_subject_resolved_at", "subject", "resolved_at"),)
 
     ticket_id = Column(String(20), primary_key=True)
     user_email = Column(String(255), nullable=False)
@@ -78,7 +123,7 @@ class TicketEvent(Base):
     __tablename__ = "ticket_events"
 
     id = Column(Integer, primary_key=True)
-    ticket_id = Column(String(20), ForeignKey("tickets.ticket_id"), nullable=False)
+    ticket_id = Column(String(20), ForeignKey("tickets.ticket_id"), nullable=False, index=True)
     agent = Column(String(50), nullable=False)
     action = Column(String(50), nullable=False)
     payload = Column(JSON, nullable=False)
@@ -89,6 +134,8 @@ class TicketEvent(Base):
 
 class Escalation(Base):
     __tablename__ = "escalations"
+    # Backs the human review queue: unresolved escalations, oldest first.
+    __table_args__ = (Index("ix_escalations_resolved_created_at", "resolved", "created_at"),)
 
     id = Column(Integer, primary_key=True)
     ticket_id = Column(String(20), ForeignKey("tickets.ticket_id"), nullable=False)
@@ -106,11 +153,59 @@ class LLMCallLog(Base):
     LLM availability metric. Not tied to a ticket: some attempts may not resolve to
     one (e.g. a call made outside a ticket-handling request), and a ticket can trigger
     zero, one, or several attempts (retries).
+
+    Raw rows are only kept for `LLM_CALL_LOG_RETENTION_DAYS` (see
+    rollups.compact_llm_call_log); older history lives on in LLMCallRollup.
     """
     __tablename__ = "llm_call_log"
+    __table_args__ = (Index("ix_llm_call_log_created_at_model", "created_at", "model"),)
 
     id = Column(Integer, primary_key=True)
     model = Column(String(100), nullable=False)
     success = Column(Boolean, nullable=False)
     reason = Column(String(50), nullable=False)
     created_at = Column(DateTime, nullable=False, default=utcnow)
+
+
+class TicketRollup(Base):
+    """Ticket counters per department/priority, maintained incrementally by
+    shared/db/rollups.py in the same transaction as the ticket writes they count —
+    the dashboard reads these instead of scanning `tickets`. Bucketed by the
+    ticket's `created_at` hour, day or month, coarser with age (see
+    `rollups.rollup_bucket`); `priority` is "" when unset.
+    """
+    __tablename__ = "ticket_rollups"
+
+    bucket_start = Column(DateTime, primary_key=True)
+    department = Column(String(100), primary_key=True)
+    priority = Column(String(20), primary_key=True)
+    created = Column(Integer, nullable=False, default=0)
+    open = Column(Integer, nullable=False, default=0)
+    resolved = Column(Integer, nullable=False, default=0)
+    escalated = Column(Integer, nullable=False, default=0)
+
+
+class HandlingTimeRollup(Base):
+    """Handling-time histogram per department behind TicketRollup's buckets: one
+    row per occupied log-scale bin (see shared/db/rollups.py), so percentiles come
+    from summing a bounded number of counts rather than sorting every ticket.
+    """
+    __tablename__ = "handling_time_rollups"
+
+    bucket_start = Column(DateTime, primary_key=True)
+    department = Column(String(100), primary_key=True)
+    bin = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class LLMCallRollup(Base):
+    """Hourly LLMCallLog counts per model and outcome, maintained alongside each
+    LLMCallLog row — backs the dashboard's LLM availability metric.
+    """
+    __tablename__ = "llm_call_rollups"
+
+    bucket_start = Column(DateTime, primary_key=True)
+    model = Column(String(100), primary_key=True)
+    reason = Column(String(50), primary_key=True)
+    success = Column(Boolean, nullable=False)
+    calls = Column(Integer, nullable=False, default=0)
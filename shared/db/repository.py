@@ -1,7 +1,9 @@
-from typing import Optional
+from datetime import datetime
+from typing import Optional, Union
 
 from sqlalchemy.orm import Session
 
+from shared.db import rollups
 from shared.db.models import Escalation, Ticket, TicketEvent, utcnow
 from shared.models import SupportTicket
 
@@ -16,8 +18,12 @@ def get_or_create_ticket(
     and a handling agent calling this afterwards just wants the existing row. It
     only builds a fresh row when nothing exists yet, e.g. a handling agent's
     endpoint invoked directly, without a prior routing step.
+
+    Pass the returned row on to `record_resolution` later in the request so it
+    doesn't have to look the ticket up again. A newly created ticket is counted in
+    the dashboard rollups (see shared/db/rollups.py).
     """
-    db_ticket = db.query(Ticket).filter(Ticket.ticket_id == ticket.ticket_id).first()
+    db_ticket = db.get(Ticket, ticket.ticket_id)
     if db_ticket is not None:
         return db_ticket
 
@@ -34,20 +40,47 @@ def get_or_create_ticket(
     )
     db.add(db_ticket)
     db.flush()
+    rollups.record_ticket_state(db, rollups.ticket_key(db_ticket), None, (db_ticket.status, db_ticket.escalated))
     return db_ticket
 
 
+def _handling_seconds(created_at: datetime, resolved_at: Optional[datetime]) -> Optional[float]:
+    return (resolved_at - created_at).total_seconds() if resolved_at is not None else None
+
+
 def record_event(db: Session, ticket_id: str, agent: str, action: str, payload: dict) -> None:
     db.add(TicketEvent(ticket_id=ticket_id, agent=agent, action=action, payload=payload))
 
 
-def record_resolution(db: Session, ticket_id: str, resolution: str, escalated: bool) -> None:
-    db_ticket = db.query(Ticket).filter(Ticket.ticket_id == ticket_id).first()
-    if db_ticket is not None:
-        db_ticket.status = "escalated" if escalated else "resolved"
-        db_ticket.resolution = resolution
-        db_ticket.escalated = escalated
-        db_ticket.resolved_at = utcnow()
+def record_resolution(db: Session, ticket: Union[Ticket, str], resolution: str, escalated: bool) -> None:
+    """Mark the ticket resolved (or escalated) with the agent's final response.
+
+    `ticket` is the row `get_or_create_ticket` returned earlier in the request —
+    passing it through costs no query at all — or a ticket ID, looked up with
+    `Session.get`. Hold on to that returned row rather than relying on the identity
+    map: the session only keeps weak references to unmodified objects, so a row
+    nothing references any more may already be gone from it. The ticket's previous
+    state is what the dashboard rollups need to count the change (see
+    shared/db/rollups.py), so it's always loaded rather than updated blind.
+    """
+    db_ticket = ticket if isinstance(ticket, Ticket) else db.get(Ticket, ticket)
+    if db_ticket is None:
+        return
+
+    before = (db_ticket.status, db_ticket.escalated)
+    previous_resolved_at = db_ticket.resolved_at
+    db_ticket.status = "escalated" if escalated else "resolved"
+    db_ticket.resolution = resolution
+    db_ticket.escalated = escalated
+    db_ticket.resolved_at = utcnow()
+
+    key = rollups.ticket_key(db_ticket)
+    rollups.record_ticket_state(db, key, before, (db_ticket.status, escalated))
+    rollups.record_handling_time(
+        db, key,
+        _handling_seconds(db_ticket.created_at, db_ticket.resolved_at),
+        _handling_seconds(db_ticket.created_at, previous_resolved_at),
+    )
 
 
 def record_escalation(
@@ -0,0 +1,349 @@
+"""Incrementally maintained aggregates behind the dashboard metrics.
+
+Repository functions (and `shared.llm_client._record`) report what changed via the
+`record_*` helpers below; the deltas accumulate on the session and are applied as
+one upsert per rollup table right before the session commits — so the rollups move
+in the same transaction as the rows they count, a rolled-back request leaves them
+untouched, and a request that touches the same bucket several times (create, then
+resolve) costs one statement, not several.
+
+Ticket rollups coarsen with age, so that a window's read sums a bounded number of
+buckets however many tickets fell in them: a bucket is an hour for the last
+ROLLUP_HOURLY_DAYS, a day for the ROLLUP_DAILY_DAYS before that, and a calendar
+month further back (`rollup_bucket`). Writes land in the bucket their ticket's age
+calls for; `compact_ticket_rollups` folds the buckets that have aged since into
+coarser ones. Every write also counts into an all-time bucket (`ALL_TIME`), which
+is all an all-time read — the dashboard's — touches.
+
+`rebuild_rollups` recomputes everything from the raw tables, for databases whose
+tickets predate the rollups. `compact_llm_call_log` deletes raw LLM call rows once
+they're old enough that only their hourly counts are still needed.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import and_, delete, event, func, insert, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from shared import config
+from shared.db.models import HandlingTimeRollup, LLMCallLog, LLMCallRollup, Ticket, TicketRollup, utcnow
+from shared.db.sketch import DDSketch
+
+_PENDING_KEY = "pending_rollups"
+_UPSERT_CHUNK_ROWS = 500
+
+# Only what the dashboard groups by: finer keys multiply the rows every read sums.
+TICKET_KEY = ("bucket_start", "department", "priority")
+TICKET_COUNTERS = ("created", "open", "resolved", "escalated")
+
+# Handling times are kept as DDSketch bins (shared/db/sketch.py). The accuracy is
+# baked into the persisted bin numbers, so changing it means a rebuild_rollups.
+RELATIVE_ACCURACY = 0.01
+MIN_HANDLING_SECONDS = 0.001
+
+TicketKey = Tuple[datetime, str, str]
+# A handling-time histogram is one set of bins per bucket and department: a
+# percentile read sums at most buckets x bins rows.
+HANDLING_KEY = ("bucket_start", "department", "bin")
+
+# The bucket_start of the running all-time totals, which no ticket's own bucket can be.
+ALL_TIME = datetime(1970, 1, 1)
+
+_TICKET_TABLES = (TicketRollup.__table__, HandlingTimeRollup.__table__)
+
+
+def hour_bucket(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(moment: datetime) -> datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def month_bucket(moment: datetime) -> datetime:
+    return day_bucket(moment).replace(day=1)
+
+
+def rollup_bucket(moment: datetime, now: Optional[datetime] = None) -> datetime:
+    """The ticket-rollup bucket `moment` belongs to as of `now`: its hour for the
+    last ROLLUP_HOURLY_DAYS, its day for the ROLLUP_DAILY_DAYS before that, its
+    month before then."""
+    now = now or utcnow()
+    hourly_since = hour_bucket(now - timedelta(days=config.ROLLUP_HOURLY_DAYS))
+    if moment >= hourly_since:
+        return hour_bucket(moment)
+    if moment >= day_bucket(hourly_since - timedelta(days=config.ROLLUP_DAILY_DAYS)):
+        return day_bucket(moment)
+    return month_bucket(moment)
+
+
+def ticket_key(ticket) -> TicketKey:
+    """The rollup bucket a ticket counts toward — `ticket` is a Ticket, or any row
+    carrying its created_at/department/priority columns."""
+    return (rollup_bucket(ticket.created_at), ticket.department, ticket.priority or "")
+
+
+def handling_time_sketch() -> DDSketch:
+    """An empty sketch whose bins line up with HandlingTimeRollup.bin."""
+    return DDSketch(RELATIVE_ACCURACY, MIN_HANDLING_SECONDS)
+
+
+_HANDLING_BINS = handling_time_sketch()
+
+
+def handling_time_bin(seconds: float) -> int:
+    return _HANDLING_BINS.key(seconds)
+
+
+def _pending(db: Session) -> dict:
+    return db.info.setdefault(_PENDING_KEY, {
+        "tickets": defaultdict(lambda: dict.fromkeys(TICKET_COUNTERS, 0)),
+        "handling": defaultdict(int),
+        "llm": defaultdict(int),
+    })
+
+
+def _state_counters(status: Optional[str], escalated: bool) -> Dict[str, int]:
+    return {"open": int(status == "open"), "resolved": int(status == "resolved"), "escalated": int(bool(escalated))}
+
+
+def record_ticket_state(
+    db: Session,
+    key: TicketKey,
+    before: Optional[Tuple[str, bool]],
+    after: Tuple[str, bool],
+) -> None:
+    """Count a ticket moving from `before` to `after` (each a `(status, escalated)`
+    pair); `before=None` means the ticket was just created."""
+    previous = _state_counters(*before) if before is not None else {}
+    for bucket_key in (key, (ALL_TIME,) + key[1:]):
+        counters = _pending(db)["tickets"][bucket_key]
+        if before is None:
+            counters["created"] += 1
+        for name, value in _state_counters(*after).items():
+            counters[name] += value - previous.get(name, 0)
+
+
+def record_handling_time(
+    db: Session, key: TicketKey, seconds: float, previous_seconds: Optional[float] = None
+) -> None:
+    """Count a ticket's handling time, under `key`'s bucket and department;
+    `previous_seconds` is the one it was counted with before, if it's being
+    re-resolved (e.g. a human approving an escalation), so only its latest
+    resolution is ever counted."""
+    handling = _pending(db)["handling"]
+    bucket, department = key[:2]
+    for bucket_key in ((bucket, department), (ALL_TIME, department)):
+        if previous_seconds is not None:
+            handling[bucket_key + (handling_time_bin(previous_seconds),)] -= 1
+        handling[bucket_key + (handling_time_bin(seconds),)] += 1
+
+
+def record_llm_call(db: Session, model: str, success: bool, reason: str, at: Optional[datetime] = None) -> None:
+    _pending(db)["llm"][(hour_bucket(at or utcnow()), model, reason, success)] += 1
+
+
+def _upsert(db: Session, table, key_columns, counter_columns, rows) -> None:
+    """INSERT ... ON CONFLICT DO UPDATE SET counter = counter + excluded.counter for
+    every row at once on SQLite/Postgres; UPDATE-then-INSERT per row elsewhere."""
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        dialect_insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        # Chunked to stay under SQLite's bound-parameter limit on large rebuilds; a
+        # normal request's handful of rows is a single statement.
+        for start in range(0, len(rows), _UPSERT_CHUNK_ROWS):
+            stmt = dialect_insert(table).values(rows[start:start + _UPSERT_CHUNK_ROWS])
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=list(key_columns),
+                set_={name: table.c[name] + stmt.excluded[name] for name in counter_columns},
+            ))
+        return
+    for row in rows:
+        match = and_(*(table.c[name] == row[name] for name in key_columns))
+        result = db.execute(
+            update(table).where(match).values({name: table.c[name] + row[name] for name in counter_columns})
+        )
+        if result.rowcount == 0:
+            db.execute(insert(table).values(row))
+
+
+def _apply(db: Session, pending: dict) -> None:
+    ticket_rows = [
+        dict(zip(TICKET_KEY, key), **counters)
+        for key, counters in pending["tickets"].items()
+        if any(counters.values())
+    ]
+    _upsert(db, TicketRollup.__table__, TICKET_KEY, TICKET_COUNTERS, ticket_rows)
+
+    handling_rows = [
+        dict(zip(HANDLING_KEY, key), count=count) for key, count in pending["handling"].items() if count
+    ]
+    _upsert(db, HandlingTimeRollup.__table__, HANDLING_KEY, ("count",), handling_rows)
+
+    llm_rows = [
+        {"bucket_start": bucket, "model": model, "reason": reason, "success": success, "calls": calls}
+        for (bucket, model, reason, success), calls in pending["llm"].items()
+    ]
+    _upsert(db, LLMCallRollup.__table__, ("bucket_start", "model", "reason"), ("calls",), llm_rows)
+
+
+@event.listens_for(Session, "before_commit")
+def _apply_pending_rollups(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        _apply(session, pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_rollups(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def window_start(window: Optional[timedelta]) -> Optional[datetime]:
+    """The first hourly LLM call bucket inside `window` (None: no lower bound). Those
+    rollups are hourly, so a window is rounded out to whole hours."""
+    return hour_bucket(utcnow() - window) if window is not None else None
+
+
+def ticket_window(bucket_column, window: Optional[timedelta]):
+    """A filter on a ticket rollup table's `bucket_column` for the tickets created
+    within `window` — the `ALL_TIME` bucket for None — rounded out to the whole
+    hour, day or month the window starts in (see `rollup_bucket`).
+
+    Every bucket from that one on is inside the window: buckets only ever get
+    coarser with age, so one a compaction hasn't reached yet starts after it too.
+    """
+    since = rollup_bucket(utcnow() - window) if window is not None else ALL_TIME
+    if since <= ALL_TIME:
+        return bucket_column == ALL_TIME
+    return bucket_column >= since
+
+
+def rebuild_rollups(db: Session) -> None:
+    """Recompute every rollup from the raw tickets/llm_call_log rows, replacing what's
+    there, and commit. Streams only the few columns it needs — safe on a large table,
+    but a full pass over it, so this is a backfill/repair step, not a per-request one.
+
+    LLM call rollups older than the oldest remaining llm_call_log row are left alone:
+    compaction already deleted the rows they were counted from.
+    """
+    db.execute(delete(TicketRollup))
+    db.execute(delete(HandlingTimeRollup))
+    oldest_call = db.query(func.min(LLMCallLog.created_at)).scalar()
+    if oldest_call is not None:
+        db.execute(delete(LLMCallRollup).where(LLMCallRollup.bucket_start >= hour_bucket(oldest_call)))
+    db.info.pop(_PENDING_KEY, None)
+
+    rows = db.query(
+        Ticket.created_at, Ticket.department, Ticket.priority,
+        Ticket.status, Ticket.escalated, Ticket.resolved_at,
+    ).yield_per(10_000)
+    now = utcnow()
+    for created_at, department, priority, status, escalated, resolved_at in rows:
+        key = (rollup_bucket(created_at, now), department, priority or "")
+        record_ticket_state(db, key, None, (status, escalated))
+        if resolved_at is not None:
+            record_handling_time(db, key, (resolved_at - created_at).total_seconds())
+
+    for model, success, reason, created_at in db.query(
+        LLMCallLog.model, LLMCallLog.success, LLMCallLog.reason, LLMCallLog.created_at
+    ).yield_per(10_000):
+        record_llm_call(db, model, success, reason, at=created_at)
+
+    db.commit()
+
+
+def backfill_rollups_if_empty(db: Session) -> None:
+    """Run `rebuild_rollups` once for a database that has tickets or LLM call logs
+    but no rollups yet (i.e. one created before they existed)."""
+    if db.query(TicketRollup.bucket_start).first() or db.query(LLMCallRollup.bucket_start).first():
+        return
+    if db.query(Ticket.ticket_id).first() is None and db.query(LLMCallLog.id).first() is None:
+        return
+    rebuild_rollups(db)
+
+
+def compact_llm_call_log(db: Session, retention: timedelta, batch_size: int = 10_000) -> int:
+    """Delete llm_call_log rows from before the hour `retention` ago and return how
+    many went. Every row was counted into llm_call_rollups in the transaction that
+    wrote it, so nothing is lost to the hourly metrics — only the exact sub-hour
+    windows stop reaching back that far. Cutting on an hour boundary keeps every
+    remaining hour whole, which `rebuild_rollups` relies on.
+
+    Deletes in `batch_size` chunks, committing each, so a first run over months of
+    backlog doesn't hold one huge transaction open.
+    """
+    backfill_rollups_if_empty(db)
+    cutoff = hour_bucket(utcnow() - retention)
+    deleted = 0
+    while True:
+        batch = select(LLMCallLog.id).where(LLMCallLog.created_at < cutoff).limit(batch_size).scalar_subquery()
+        result = db.execute(
+            delete(LLMCallLog).where(LLMCallLog.id.in_(batch)),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+
+def compact_ticket_rollups(db: Session) -> int:
+    """Fold ticket and handling-time rollup buckets that have aged past their
+    granularity (see `rollup_bucket`) into the coarser bucket that now holds them,
+    committing per table, and return how many rows were folded. Safe to run as
+    often as you like; how often only decides how long aged buckets linger.
+
+    Aged rows are taken with DELETE ... RETURNING and re-added to their new
+    buckets with the same upsert the writes use, in the same transaction. A
+    request's increment to one of those rows either commits first, and is
+    returned with it, or waits for the delete and then inserts the row afresh,
+    for the next run to fold. Finding the aged buckets only reads the distinct
+    bucket starts, through the primary key.
+    """
+    backfill_rollups_if_empty(db)
+    now = utcnow()
+    hourly_since = hour_bucket(now - timedelta(days=config.ROLLUP_HOURLY_DAYS))
+    folded = 0
+    for table in _TICKET_TABLES:
+        key_columns = [column.name for column in table.primary_key.columns]
+        counter_columns = [column.name for column in table.columns if not column.primary_key]
+        aged = [
+            bucket for bucket in db.execute(
+                select(table.c.bucket_start).where(table.c.bucket_start < hourly_since).distinct()
+            ).scalars()
+            if rollup_bucket(bucket, now) != bucket
+        ]
+        for start in range(0, len(aged), _UPSERT_CHUNK_ROWS):
+            deleted = db.execute(
+                delete(table).where(table.c.bucket_start.in_(aged[start:start + _UPSERT_CHUNK_ROWS]))
+                .returning(*table.columns)
+            ).mappings().all()
+            merged: Dict[tuple, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(counter_columns, 0))
+            for row in deleted:
+                key = (rollup_bucket(row["bucket_start"], now),) + tuple(row[name] for name in key_columns[1:])
+                for name in counter_columns:
+                    merged[key][name] += row[name]
+            _upsert(db, table, key_columns, counter_columns, [
+                dict(zip(key_columns, key), **counters) for key, counters in merged.items() if any(counters.values())
+            ])
+            folded += len(deleted)
+        db.commit()
+    return folded
+
+
+def drop_outdated_rollup_tables(engine) -> None:
+    """Drop the ticket rollup tables of a database created when their key had other
+    columns: they're derived data, so `init_db` recreates them empty and
+    `backfill_rollups_if_empty` (scripts/seed_db.py, scripts/compact_rollups.py)
+    refills them."""
+    inspector = inspect(engine)
+    for table in _TICKET_TABLES:
+        if not inspector.has_table(table.name):
+            continue
+        if {column["name"] for column in inspector.get_columns(table.name)} != set(table.columns.keys()):
+            table.drop(bind=engine, checkfirst=True)
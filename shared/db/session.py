@@ -11,11 +11,26 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
 def init_db() -> None:
-    """Create all tables if they don't already exist. Idempotent — safe to call at startup."""
+    """Create all tables and indexes if they don't already exist. Idempotent — safe to
+    call at startup.
+
+    `create_all()` only emits an index alongside the CREATE TABLE for a table it's
+    creating, so an index added to the models after a database was first created would
+    never reach it. Creating each index with `checkfirst=True` afterwards is the
+    migration step for that case (see docs/UPGRADE_PLAN.md on why there's no
+    Alembic). The other is a ticket rollup table whose key has changed: it's
+    derived data, so it's dropped and recreated empty, to be backfilled (see
+    `rollups.drop_outdated_rollup_tables`).
+    """
     from shared.db import models  # noqa: F401 — import registers the models on Base.metadata
     from shared.db.base import Base
+    from shared.db.rollups import drop_outdated_rollup_tables
 
+    drop_outdated_rollup_tables(engine)
     Base.metadata.create_all(bind=engine)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
 
 def get_db():
@@ -0,0 +1,74 @@
+"""A DDSketch (Masson et al., VLDB 2019): a quantile sketch with a relative-error
+guarantee that is exactly mergeable.
+
+Values go into log-scale bins — bin i covers (gamma**(i-1), gamma**i] — and the
+sketch is just the bin -> count map, so any value reported back from a bin is
+within `relative_accuracy` of every value that landed in it, whatever the
+magnitude. Two sketches with the same accuracy merge by adding counts, which is
+what lets the handling-time rollups (shared/db/rollups.py) persist one row per
+non-empty bin per bucket, have every agent replica increment those rows
+independently, and sum them across hours and groups in SQL.
+"""
+import math
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class DDSketch:
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 0.001):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        # Values below min_value (including zero) share its bin.
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+
+    def key(self, value: float) -> int:
+        """The bin `value` lands in."""
+        return math.ceil(math.log(max(value, self.min_value)) / self._log_gamma)
+
+    def value(self, key: int) -> float:
+        """The value reported for everything in bin `key` — the point within
+        `relative_accuracy` of both of the bin's edges."""
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    @property
+    def count(self) -> int:
+        return sum(self.bins.values())
+
+    def add(self, value: float, count: int = 1) -> None:
+        key = self.key(value)
+        self.bins[key] = self.bins.get(key, 0) + count
+
+    def add_bins(self, bins: Iterable[Tuple[int, int]]) -> None:
+        """Fold in (bin, count) pairs, e.g. rows read back from the rollup table."""
+        for key, count in bins:
+            self.bins[key] = self.bins.get(key, 0) + count
+
+    def merge(self, other: "DDSketch") -> None:
+        if other.gamma != self.gamma or other.min_value != self.min_value:
+            raise ValueError("Only sketches with the same relative_accuracy and min_value can be merged")
+        self.add_bins(other.bins.items())
+
+    def quantile(self, q: float) -> Optional[float]:
+        """The q-quantile (0 <= q <= 1), interpolating between the two nearest
+        ranks the way `statistics.median` does for an even count; None if empty."""
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+        total = self.count
+        if total <= 0:
+            return None
+        rank = q * (total - 1)
+        lower_rank, upper_rank = math.floor(rank), math.ceil(rank)
+
+        lower = upper = None
+        seen = 0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if lower is None and seen > lower_rank:
+                lower = self.value(key)
+            if seen > upper_rank:
+                upper = self.value(key)
+                break
+        return lower + (upper - lower) * (rank - lower_rank)
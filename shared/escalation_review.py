@@ -1,11 +1,12 @@
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from sqlalchemy.orm import Session
+from sqlalchemy import func, insert, select, tuple_, update
+from sqlalchemy.orm import Session, aliased
 
-from shared.db.models import Escalation, Ticket, utcnow
-from shared.db.repository import record_event
+from shared.db import rollups
+from shared.db.models import Escalation, Ticket, TicketEvent, utcnow
 
 
 @dataclass
@@ -22,67 +23,179 @@ class PendingEscalation:
     draft_response: Optional[str]
 
 
-def list_pending_escalations(db: Session) -> List[PendingEscalation]:
-    """Escalations no human has reviewed yet, oldest first."""
-    escalations = (
-        db.query(Escalation)
-        .filter(Escalation.resolved.is_(False))
-        .order_by(Escalation.created_at.asc())
+def _pending_query(
+    db: Session, columns, queue_name: Optional[str], department: Optional[str], created_before: Optional[datetime],
+):
+    query = db.query(*columns).filter(Escalation.resolved.is_(False))
+    if queue_name is not None:
+        query = query.filter(Escalation.queue_name == queue_name)
+    if department is not None:
+        query = query.filter(Ticket.department == department)
+    if created_before is not None:
+        query = query.filter(Escalation.created_at < created_before)
+    return query
+
+
+def list_pending_escalations(
+    db: Session,
+    limit: Optional[int] = None,
+    after_id: Optional[int] = None,
+    queue_name: Optional[str] = None,
+    department: Optional[str] = None,
+    created_before: Optional[datetime] = None,
+) -> List[PendingEscalation]:
+    """Escalations no human has reviewed yet, oldest first — optionally only those in
+    one queue, for one department, or escalated before `created_before` (waiting at
+    least so long).
+
+    One query, joined to the ticket for its context and draft response. Paged by
+    keyset rather than OFFSET: pass the last `escalation_id` of the previous page as
+    `after_id` and the next page starts right after it, at the same cost however deep
+    into the queue it is. `limit=None` returns everything that's left.
+    """
+    query = _pending_query(
+        db,
+        (
+            Escalation.id, Escalation.ticket_id, Escalation.escalated_by, Escalation.reason,
+            Escalation.queue_name, Escalation.created_at,
+            Ticket.department, Ticket.subject, Ticket.description, Ticket.resolution,
+        ),
+        queue_name,
+        department,
+        created_before,
+    ).outerjoin(Ticket, Ticket.ticket_id == Escalation.ticket_id)
+
+    if after_id is not None:
+        cursor = aliased(Escalation)
+        cursor_created_at = select(cursor.created_at).where(cursor.id == after_id).scalar_subquery()
+        query = query.filter(tuple_(Escalation.created_at, Escalation.id) > tuple_(cursor_created_at, after_id))
+
+    query = query.order_by(Escalation.created_at.asc(), Escalation.id.asc())
+    if limit is not None:
+        query = query.limit(limit)
+
+    return [
+        PendingEscalation(
+            escalation_id=row.id,
+            ticket_id=row.ticket_id,
+            department=row.department or "",
+            subject=row.subject or "",
+            description=row.description or "",
+            escalated_by=row.escalated_by,
+            reason=row.reason,
+            queue_name=row.queue_name,
+            created_at=row.created_at,
+            draft_response=row.resolution,
+        )
+        for row in query.all()
+    ]
+
+
+def count_pending_escalations(
+    db: Session,
+    queue_name: Optional[str] = None,
+    department: Optional[str] = None,
+    created_before: Optional[datetime] = None,
+) -> int:
+    """How many escalations are awaiting review, with `list_pending_escalations`'
+    filters — a COUNT, for badges and page totals that don't need the rows themselves.
+    """
+    query = _pending_query(db, (func.count(Escalation.id),), queue_name, department, created_before)
+    if department is not None:
+        query = query.join(Ticket, Ticket.ticket_id == Escalation.ticket_id)
+    return query.scalar()
+
+
+def _tickets_by_escalation(db: Session, escalation_ids: Sequence[int]) -> Dict[int, Any]:
+    """escalation_id -> its ticket's ID and current state for the whole batch in one
+    query; raises if any ID doesn't exist, before anything has been written.
+    """
+    rows = (
+        db.query(
+            Escalation.id, Escalation.ticket_id,
+            Ticket.status, Ticket.escalated, Ticket.created_at, Ticket.resolved_at,
+            Ticket.department, Ticket.priority,
+        )
+        .join(Ticket, Ticket.ticket_id == Escalation.ticket_id)
+        .filter(Escalation.id.in_(escalation_ids))
         .all()
     )
+    tickets = {row.id: row for row in rows}
+    for escalation_id in escalation_ids:
+        if escalation_id not in tickets:
+            raise ValueError(f"Escalation {escalation_id} not found")
+    return tickets
 
-    pending = []
-    for esc in escalations:
-        ticket = db.query(Ticket).filter(Ticket.ticket_id == esc.ticket_id).first()
-        pending.append(PendingEscalation(
-            escalation_id=esc.id,
-            ticket_id=esc.ticket_id,
-            department=ticket.department if ticket else "",
-            subject=ticket.subject if ticket else "",
-            description=ticket.description if ticket else "",
-            escalated_by=esc.escalated_by,
-            reason=esc.reason,
-            queue_name=esc.queue_name,
-            created_at=esc.created_at,
-            draft_response=ticket.resolution if ticket else None,
-        ))
-    return pending
-
-
-def _get_escalation(db: Session, escalation_id: int) -> Escalation:
-    escalation = db.query(Escalation).filter(Escalation.id == escalation_id).first()
-    if escalation is None:
-        raise ValueError(f"Escalation {escalation_id} not found")
-    return escalation
+
+def _resolve_escalations(db: Session, escalation_ids: Sequence[int]) -> None:
+    db.execute(update(Escalation).where(Escalation.id.in_(escalation_ids)).values(resolved=True))
+
+
+def approve_escalations(
+    db: Session, items: Sequence[Tuple[int, str]], reviewer: str = "human_reviewer"
+) -> None:
+    """Approve a batch of `(escalation_id, final_response)` pairs in one transaction.
+
+    The statement count doesn't grow with the batch: one lookup for the tickets' IDs
+    and current state, one executemany UPDATE for the tickets (by primary key), one
+    UPDATE for the escalations, one bulk INSERT for the audit events, and the
+    dashboard rollup upserts at commit (see shared/db/rollups.py). ticket.escalated stays True — it's a historical fact (the AI did escalate
+    this), not a "still pending" flag; escalation.resolved tracks that instead.
+    """
+    if not items:
+        return
+    tickets = _tickets_by_escalation(db, [escalation_id for escalation_id, _ in items])
+    now = utcnow()
+
+    db.execute(update(Ticket), [
+        {"ticket_id": tickets[escalation_id].ticket_id, "status": "resolved",
+         "resolution": final_response, "resolved_at": now}
+        for escalation_id, final_response in items
+    ])
+    _resolve_escalations(db, list(tickets))
+    db.execute(insert(TicketEvent), [
+        {"ticket_id": tickets[escalation_id].ticket_id, "agent": reviewer, "action": "human_review",
+         "payload": {"decision": "approved", "final_response": final_response}}
+        for escalation_id, final_response in items
+    ])
+
+    for ticket in {t.ticket_id: t for t in tickets.values()}.values():
+        key = rollups.ticket_key(ticket)
+        rollups.record_ticket_state(db, key, (ticket.status, ticket.escalated), ("resolved", ticket.escalated))
+        rollups.record_handling_time(
+            db, key,
+            (now - ticket.created_at).total_seconds(),
+            (ticket.resolved_at - ticket.created_at).total_seconds() if ticket.resolved_at is not None else None,
+        )
+    db.commit()
+
+
+def reject_escalations(
+    db: Session, escalation_ids: Sequence[int], note: str, reviewer: str = "human_reviewer"
+) -> None:
+    """Reject a batch of escalations in one transaction — see `reject_escalation`."""
+    if not escalation_ids:
+        return
+    tickets = _tickets_by_escalation(db, escalation_ids)
+
+    _resolve_escalations(db, escalation_ids)
+    db.execute(insert(TicketEvent), [
+        {"ticket_id": tickets[escalation_id].ticket_id, "agent": reviewer, "action": "human_review",
+         "payload": {"decision": "rejected", "note": note}}
+        for escalation_id in escalation_ids
+    ])
+    db.commit()
 
 
 def approve_escalation(
     db: Session, escalation_id: int, final_response: str, reviewer: str = "human_reviewer"
 ) -> None:
     """Send `final_response` (the AI's draft, edited or as-is) as the ticket's resolution."""
-    escalation = _get_escalation(db, escalation_id)
-
-    ticket = db.query(Ticket).filter(Ticket.ticket_id == escalation.ticket_id).first()
-    if ticket is not None:
-        ticket.status = "resolved"
-        ticket.resolution = final_response
-        ticket.resolved_at = utcnow()
-        # ticket.escalated stays True — it's a historical fact (the AI did escalate
-        # this), not a "still pending" flag; escalation.resolved tracks that instead.
-
-    escalation.resolved = True
-    record_event(db, escalation.ticket_id, reviewer, "human_review",
-                 {"decision": "approved", "final_response": final_response})
-    db.commit()
+    approve_escalations(db, [(escalation_id, final_response)], reviewer=reviewer)
 
 
 def reject_escalation(db: Session, escalation_id: int, note: str, reviewer: str = "human_reviewer") -> None:
     """Decline the AI's draft — the ticket stays escalated for manual handling outside
     the system; this only clears it from the review queue and records why.
     """
-    escalation = _get_escalation(db, escalation_id)
-
-    escalation.resolved = True
-    record_event(db, escalation.ticket_id, reviewer, "human_review",
-                 {"decision": "rejected", "note": note})
-    db.commit()
+    reject_escalations(db, [escalation_id], note, reviewer=reviewer)
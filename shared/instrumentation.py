@@ -0,0 +1,145 @@
+"""Prometheus metrics for the agents, served at each agent's `/metrics`.
+
+Counters and histograms are prometheus_client's in-process collectors — updating
+one is a lock and an add, cheap enough for every request. Each uvicorn worker is
+its own process with its own values; to run several, point PROMETHEUS_MULTIPROC_DIR
+at an empty writable directory (cleared on each deploy) before the agent starts,
+and prometheus_client keeps the values in per-process mmap files that `/metrics`
+sums across workers. Redis queue depth and DB pool usage are read fresh at scrape
+time instead, so they never go stale in a worker that's stopped serving traffic.
+"""
+import os
+import time
+from typing import Iterable, Sequence
+
+from fastapi import FastAPI, Request, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+
+from shared.db.session import engine
+from shared.logging_config import dropped_log_records, set_agent
+from shared.message_queue import MessageQueue, MessageQueueError
+from shared.tracing import dropped_traces
+
+REQUEST_DURATION = Histogram(
+    "agent_request_duration_seconds",
+    "HTTP request latency per agent and route.",
+    ["agent", "route", "status"],
+)
+DECISION_DURATION = Histogram(
+    "agent_decision_duration_seconds",
+    "Time to classify or handle a ticket, by how the agent decided (rules, llm, cache).",
+    ["agent", "method"],
+)
+LLM_DURATION = Histogram(
+    "llm_request_duration_seconds",
+    "OpenRouter call latency per attempt, by outcome.",
+    ["model", "outcome"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 90),
+)
+LLM_FAILURES = Counter(
+    "llm_failures",
+    "LLM call attempts that fell back to the deterministic path, by reason.",
+    ["model", "reason"],
+)
+ESCALATIONS = Counter(
+    "escalations",
+    "Tickets escalated for human review, by agent and review queue.",
+    ["agent", "queue"],
+)
+RESOLUTION_CACHE_LOOKUPS = Counter(
+    "resolution_cache_lookups",
+    "Technical agent resolution-cache lookups, by result (hit, miss).",
+    ["result"],
+)
+MEMO_LOOKUPS = Counter(
+    "memo_lookups",
+    "Intent/classification memo lookups (see shared/memo.py), by memo and result (hit, redis_hit, miss).",
+    ["memo", "result"],
+)
+
+
+class _LiveCollector:
+    """Gauges computed when scraped rather than kept up to date on every change."""
+
+    def __init__(self, mq: MessageQueue, queues: Sequence[str]):
+        self.mq = mq
+        self.queues = queues
+
+    def collect(self) -> Iterable[Metric]:
+        depth = GaugeMetricFamily("message_queue_length", "Messages waiting on a Redis queue.", labels=["queue"])
+        for queue in self.queues:
+            try:
+                depth.add_metric([queue], self.mq.queue_length(queue))
+            except MessageQueueError:
+                pass  # Redis unreachable: no sample beats a misleading zero.
+        yield depth
+
+        pool = engine.pool
+        if hasattr(pool, "checkedout"):  # QueuePool; SQLite's in-memory/static pools don't track this
+            connections = GaugeMetricFamily(
+                "db_pool_connections", "SQLAlchemy connection pool usage in this process.", labels=["state"]
+            )
+            connections.add_metric(["checked_out"], pool.checkedout())
+            connections.add_metric(["checked_in"], pool.checkedin())
+            connections.add_metric(["overflow"], max(pool.overflow(), 0))
+            connections.add_metric(["size"], pool.size())
+            yield connections
+
+        yield CounterMetricFamily(
+            "log_records_dropped",
+            "Log lines dropped because the queued-logging buffer was full (LOG_QUEUE=1).",
+            value=dropped_log_records(),
+        )
+        yield CounterMetricFamily(
+            "traces_dropped",
+            "Traces not written to TRACE_EXPORT_PATH because the export queue was full.",
+            value=dropped_traces(),
+        )
+
+
+def _render(live: CollectorRegistry) -> bytes:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(live)
+
+
+def instrument(app: FastAPI, agent: str, mq: MessageQueue, queues: Sequence[str] = ()) -> None:
+    """Time every request to `app`, label its log lines with `agent`, and serve
+    `/metrics`, including the length of each Redis queue in `queues`.
+    Unauthenticated, like `/health`, so a scraper needn't hold the internal token."""
+    live = CollectorRegistry(auto_describe=False)
+    live.register(_LiveCollector(mq, queues))
+
+    @app.middleware("http")
+    async def _time_request(request: Request, call_next):
+        # Every line logged while handling this request names this agent, even when
+        # several agents' apps share a process.
+        set_agent(agent)
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # The route template ("/handle_ticket"), never the raw path, so label
+            # cardinality stays bounded whatever URLs clients send.
+            route = getattr(request.scope.get("route"), "path", "unmatched")
+            REQUEST_DURATION.labels(agent, route, str(status)).observe(time.perf_counter() - started)
+
+    # Sync, so FastAPI runs it in its threadpool: the queue-length reads block on Redis.
+    @app.get("/metrics", include_in_schema=False)
+    def metrics() -> Response:
+        return Response(_render(live), media_type=CONTENT_TYPE_LATEST)
@@ -1,12 +1,17 @@
 import logging
+import time
 from typing import Optional, Type, TypeVar
 
 from openai import APIConnectionError, APIStatusError, OpenAI, RateLimitError
 from pydantic import BaseModel, ValidationError
 from sqlalchemy.orm import Session
 
-from shared.config import OPENROUTER_API_KEY
-from shared.db.models import LLMCallLog
+from shared.config import OPENROUTER_API_KEY, OPENROUTER_BASE_URL
+from shared.db import rollups
+from shared.db.models import LLMCallLog, utcnow
+from shared.instrumentation import LLM_DURATION, LLM_FAILURES
+from shared.stage_timing import LLM, timed_stage
+from shared.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -18,32 +23,47 @@ _client: Optional[OpenAI] = None
 def _default_client() -> Optional[OpenAI]:
     """Lazily construct the shared OpenRouter client. Returns None if no API key is
     configured — every caller treats "no client" and "the LLM call failed" the same
-    way: fall back to the deterministic path.
+    way: fall back to the deterministic path. OPENROUTER_BASE_URL can point it at
+    any other OpenAI-compatible server, such as benchmarks/llm_stub.py.
     """
     global _client
     if not OPENROUTER_API_KEY:
         return None
     if _client is None:
-        _client = OpenAI(base_url="https://openrouter.ai/api/v1", api_key=OPENROUTER_API_KEY)
+        _client = OpenAI(base_url=OPENROUTER_BASE_URL, api_key=OPENROUTER_API_KEY)
     return _client
 
 
-def _record(db: Optional[Session], model: str, success: bool, reason: str) -> None:
-    """Best-effort attempt logging for the dashboard's LLM-availability metric.
+def _record(
+    db: Optional[Session], model: str, success: bool, reason: str, started: Optional[float] = None
+) -> None:
+    """Best-effort attempt logging for the dashboard's LLM-availability metric, plus
+    the attempt's Prometheus latency (timed from `started`, a `time.perf_counter()`
+    reading, when the attempt reached the API) and failure counters.
 
     Never raises, never commits — `db.add()` only, so it piggybacks on whatever
-    transaction the caller eventually commits. If that never happens (or `db` is
-    None), the call simply isn't recorded; this is an observability aid, not part
-    of the correctness contract.
+    transaction the caller eventually commits, as does the hourly rollup the
+    dashboard reads (see shared/db/rollups.py). If that never happens (or `db` is
+    None), the call simply isn't recorded; this is an observability aid, not part of
+    the correctness contract.
     """
+    if started is not None:
+        LLM_DURATION.labels(model, reason).observe(time.perf_counter() - started)
+    if not success:
+        LLM_FAILURES.labels(model, reason).inc()
     if db is None:
         return
     try:
-        db.add(LLMCallLog(model=model, success=success, reason=reason))
+        # One timestamp for both, so the raw row and its rollup always agree on the hour.
+        now = utcnow()
+        db.add(LLMCallLog(model=model, success=success, reason=reason, created_at=now))
+        rollups.record_llm_call(db, model, success, reason, at=now)
     except Exception:
         logger.debug("Failed to record LLM call log entry", exc_info=True)
 
 
+@traced("complete_json")
+@timed_stage(LLM)
 def complete_json(
     model: str,
     system: str,
@@ -69,6 +89,7 @@ def complete_json(
         return None
 
     for attempt in range(retries + 1):
+        started = time.perf_counter()
         try:
             response = resolved_client.chat.completions.create(
                 model=model,
@@ -83,15 +104,15 @@ def complete_json(
         except RateLimitError as e:
             # Expected routinely on a free tier — no retry storm, straight to fallback.
             logger.warning("OpenRouter rate limited (model=%s): %s", model, e)
-            _record(db, model, success=False, reason="rate_limited")
+            _record(db, model, success=False, reason="rate_limited", started=started)
             return None
         except APIConnectionError as e:
             logger.warning("OpenRouter connection error (model=%s): %s", model, e)
-            _record(db, model, success=False, reason="connection_error")
+            _record(db, model, success=False, reason="connection_error", started=started)
             return None
         except APIStatusError as e:
             logger.warning("OpenRouter API error (model=%s, status=%s): %s", model, e.status_code, e)
-            _record(db, model, success=False, reason="api_error")
+            _record(db, model, success=False, reason="api_error", started=started)
             return None
         except Exception as e:
             # Anything else the provider or transport can throw. Still degrade,
@@ -99,7 +120,7 @@ def complete_json(
             # persistently high "unknown_error" count is a signal something in this
             # integration needs attention, not just free-tier flakiness.
             logger.warning("Unexpected OpenRouter failure (model=%s): %s", model, e)
-            _record(db, model, success=False, reason="unknown_error")
+            _record(db, model, success=False, reason="unknown_error", started=started)
             return None
 
         try:
@@ -111,12 +132,12 @@ def complete_json(
             )
             continue
 
-        _record(db, model, success=True, reason="success")
+        _record(db, model, success=True, reason="success", started=started)
         return result
 
     logger.warning(
         "LLM output never validated against %s after %d attempt(s)",
         schema.__name__, retries + 1,
     )
-    _record(db, model, success=False, reason="invalid_response")
+    _record(db, model, success=False, reason="invalid_response", started=started)
     return None
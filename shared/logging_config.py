@@ -1,11 +1,36 @@
+import atexit
 import json
 import logging
+import queue
+import random
 import sys
+import zlib
 from contextvars import ContextVar
 from datetime import datetime, timezone
-from typing import Optional
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+from shared import config
+from shared.tracing import current_span
+
+try:
+    import orjson
+except ImportError:  # the stdlib encoder below is the fallback, just slower
+    orjson = None
 
 _ticket_id_var: ContextVar[Optional[str]] = ContextVar("ticket_id", default=None)
+_agent_var: ContextVar[Optional[str]] = ContextVar("agent", default=None)
+_log_context_var: ContextVar[Optional[Dict[str, Any]]] = ContextVar("log_context", default=None)
+
+# The agent named on lines logged outside any `set_agent` scope (startup, background
+# threads) — the last `configure_logging(agent=...)` in this process.
+_default_agent: Optional[str] = None
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["_DeferredFormatQueueHandler"] = None
+
+_json_encoder = json.JSONEncoder(ensure_ascii=False, check_circular=False, separators=(",", ":"), default=str)
+
+QUEUE_MAX_RECORDS = 10_000
 
 
 def set_ticket_id(ticket_id: Optional[str]) -> None:
@@ -17,31 +42,184 @@ def set_ticket_id(ticket_id: Optional[str]) -> None:
     _ticket_id_var.set(ticket_id)
 
 
+def set_agent(agent: Optional[str]) -> None:
+    """Name the agent on every log record emitted for the rest of this request —
+    scoped exactly like `set_ticket_id`, so a process hosting several agents (the
+    benchmarks, the test suite) labels each line with the agent that handled it.
+    `instrumentation.instrument` sets it for every request to an agent's app."""
+    _agent_var.set(agent)
+
+
+def bind_log_context(**fields: Any) -> None:
+    """Add fields (e.g. `method`, `latency_ms`) to every log record emitted for the
+    rest of this request — scoped exactly like `set_ticket_id`."""
+    _log_context_var.set({**(_log_context_var.get() or {}), **fields})
+
+
+def _capture_context(record: logging.LogRecord) -> Dict[str, Any]:
+    """The contextvar-carried fields for `record`, read once on the thread that
+    logged it and stashed on the record — a queued record is formatted on the
+    listener thread, where this request's contextvars aren't set."""
+    context = getattr(record, "log_context", None)
+    if context is None:
+        context = {}
+        agent = _agent_var.get() or _default_agent
+        if agent is not None:
+            context["agent"] = agent
+        ticket_id = _ticket_id_var.get()
+        if ticket_id is not None:
+            context["ticket_id"] = ticket_id
+        span = current_span()
+        if span is not None:
+            context["trace_id"] = span.trace_id
+            context["span_id"] = span.span_id
+        context.update(_log_context_var.get() or {})
+        record.log_context = context
+    return context
+
+
+def _dumps(payload: Dict[str, Any]) -> str:
+    if orjson is not None:
+        return orjson.dumps(payload, default=str).decode()
+    return _json_encoder.encode(payload)
+
+
 class JSONFormatter(logging.Formatter):
+    def __init__(self) -> None:
+        super().__init__()
+        # (whole second, its ISO-8601 text): records arrive many per second, and
+        # strftime is most of the cost of a timestamp. One tuple so a concurrent
+        # format() never sees a second paired with another second's text.
+        self._second_cache = (None, "")
+
+    def _timestamp(self, created: float) -> str:
+        # Rounded, not truncated, the way datetime.fromtimestamp does it.
+        second = int(created)
+        micros = round((created - second) * 1_000_000)
+        if micros == 1_000_000:
+            second, micros = second + 1, 0
+        cached_second, text = self._second_cache
+        if cached_second != second:
+            text = datetime.fromtimestamp(second, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+            self._second_cache = (second, text)
+        return f"{text}.{micros:06d}+00:00"
+
     def format(self, record: logging.LogRecord) -> str:
+        # The record's own creation time, not now: with queued logging, formatting
+        # happens later, on the listener thread.
         payload = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": self._timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
         }
-        ticket_id = _ticket_id_var.get()
-        if ticket_id is not None:
-            payload["ticket_id"] = ticket_id
+        payload.update(_capture_context(record))
         if record.exc_info:
             payload["exc_info"] = self.formatException(record.exc_info)
-        return json.dumps(payload)
+        return _dumps(payload)
+
 
+class InfoSampler(logging.Filter):
+    """Keeps every WARNING-and-above record and a `rate` fraction of the rest.
 
-def configure_logging(level: int = logging.INFO) -> None:
+    Sampled per ticket (by a hash of its ID) rather than per line, so a kept ticket
+    keeps its whole story across the router, agent and orchestrator logs — every
+    process makes the same choice for the same ticket. Lines outside any ticket are
+    sampled at random.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1:
+            return True
+        ticket_id = _ticket_id_var.get()
+        if ticket_id is not None:
+            return zlib.crc32(ticket_id.encode()) / 2 ** 32 < self.rate
+        return random.random() < self.rate
+
+
+class _DeferredFormatQueueHandler(QueueHandler):
+    """Hands records to the listener thread without formatting them. The stock
+    QueueHandler formats in `prepare()` — on the request thread, the cost this
+    exists to move off it."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        _capture_context(record)
+        # Resolve %-args now: they may be mutable objects the caller changes next.
+        record.msg, record.args = record.getMessage(), None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # A full queue means stdout can't keep up; dropping a line beats stalling
+        # the request that logged it.
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def dropped_log_records() -> int:
+    """Log lines queued logging has dropped since it was configured because the
+    queue was full (stdout not keeping up); 0 when logging isn't queued. Exported as
+    `log_records_dropped_total` on each agent's /metrics."""
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+@atexit.register
+def _stop_listener() -> None:
+    """Flush and stop the queued-logging thread, if there is one."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure_logging(
+    level: int = logging.INFO,
+    agent: Optional[str] = None,
+    queued: Optional[bool] = None,
+    info_sample_rate: Optional[float] = None,
+) -> None:
     """Replace the root logger's handlers with a single JSON-formatted stdout handler.
 
     Idempotent — safe to call from multiple modules (each agent's main.py, the
     orchestrator) even within the same process, since it replaces rather than
     appends handlers.
+
+    `agent` is added to every line not logged under `set_agent` — the process's
+    default, so the last call wins; per-request lines name their own agent.
+    `queued` (default: LOG_QUEUE) moves formatting and the stdout write to a
+    background thread behind a bounded queue, so a slow stdout drops log lines
+    instead of stalling requests. `info_sample_rate` (default:
+    LOG_INFO_SAMPLE_RATE) keeps only that fraction of tickets' INFO lines.
     """
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setFormatter(JSONFormatter())
+    global _default_agent, _listener, _queue_handler
+    queued = config.LOG_QUEUE if queued is None else queued
+    info_sample_rate = config.LOG_INFO_SAMPLE_RATE if info_sample_rate is None else info_sample_rate
+    if agent is not None:
+        _default_agent = agent
+
+    _stop_listener()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JSONFormatter())
+    if queued:
+        handler = _DeferredFormatQueueHandler(queue.Queue(maxsize=QUEUE_MAX_RECORDS))
+        _listener = QueueListener(handler.queue, stream_handler)
+        _listener.start()
+    else:
+        handler = stream_handler
+    _queue_handler = handler if queued else None
+    if info_sample_rate < 1:
+        handler.addFilter(InfoSampler(info_sample_rate))
+
     root = logging.getLogger()
     root.handlers = [handler]
     root.setLevel(level)
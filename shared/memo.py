@@ -0,0 +1,151 @@
+"""Bounded memo for the agents' ticket-text decisions — `extract_intent` and
+`RouterLogic.classify` — so a duplicate ticket, or the orchestrator retrying one,
+doesn't redo the work, and above all doesn't ask the LLM again.
+
+Each `Memo` is a per-process LRU of at most MEMO_SIZE entries, keyed on the
+ticket text as `normalize` leaves it (whitespace collapsed). With MEMO_REDIS set,
+it's backed by a second, shared tier in Redis (REDIS_URL): a local miss checks
+Redis before computing, and a computed result is written to both, so worker
+processes and replicas answer each other's duplicates. Redis entries expire after
+MEMO_REDIS_TTL_SECONDS. An unreachable Redis is just a miss, and isn't tried again
+for REDIS_RETRY_SECONDS, so an outage costs one timeout, not one per ticket.
+Values cross that tier as JSON, so a memo stores what its caller's `dump` returns
+and rebuilds with `load` — callers get a fresh object every time, never one
+another caller may mutate.
+
+Every lookup counts in the `memo_lookups` metric by memo and result
+(hit, redis_hit, miss), which gives each agent's hit rate on `/metrics`.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple, TypeVar
+
+import redis
+
+from shared import config
+from shared.instrumentation import MEMO_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_memos: "weakref.WeakSet[Memo]" = weakref.WeakSet()
+REDIS_RETRY_SECONDS = 30
+
+
+def normalize(text: str) -> str:
+    """Ticket text as a memo key: whitespace differences don't make a new ticket."""
+    return " ".join(text.split())
+
+
+class Memo:
+    def __init__(self, name: str, version: int = 1, redis_client: Optional[redis.Redis] = None):
+        # `version` is part of every Redis key: bump it when the memoized function's
+        # answers change, so a deploy doesn't read the old code's results back.
+        self.name = name
+        self.version = version
+        self._redis = redis_client
+        self._redis_down_until = 0.0
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        _memos.add(self)
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Tuple[T, bool]],
+        dump: Callable[[T], Any],
+        load: Callable[[Any], T],
+    ) -> T:
+        """`load` of the memoized value for `key`, or else `compute()`'s result.
+        `compute` returns (result, cacheable): a result that came from a fallback
+        (the LLM was down, say) is returned but not stored, so the next duplicate
+        tries again."""
+        size = config.MEMO_SIZE
+        if size <= 0:
+            return compute()[0]
+
+        with self._lock:
+            stored = self._entries.get(key)
+            if stored is not None:
+                self._entries.move_to_end(key)
+        if stored is not None:
+            MEMO_LOOKUPS.labels(self.name, "hit").inc()
+            return load(stored)
+
+        stored = self._redis_get(key)
+        if stored is not None:
+            MEMO_LOOKUPS.labels(self.name, "redis_hit").inc()
+            self._store(key, stored, size)
+            return load(stored)
+
+        MEMO_LOOKUPS.labels(self.name, "miss").inc()
+        result, cacheable = compute()
+        if cacheable:
+            stored = dump(result)
+            self._store(key, stored, size)
+            self._redis_set(key, stored)
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _store(self, key: str, stored: Any, size: int) -> None:
+        with self._lock:
+            self._entries[key] = stored
+            self._entries.move_to_end(key)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+
+    def _redis_key(self, key: str) -> str:
+        return f"memo:{self.name}:v{self.version}:{hashlib.sha256(key.encode()).hexdigest()}"
+
+    def _client(self) -> Optional[redis.Redis]:
+        if time.monotonic() < self._redis_down_until:
+            return None
+        if self._redis is None and config.MEMO_REDIS:
+            # Short timeouts: the shared tier must never cost more than the work it saves.
+            self._redis = redis.Redis.from_url(
+                config.REDIS_URL, decode_responses=True, socket_timeout=0.1, socket_connect_timeout=0.1,
+            )
+        return self._redis
+
+    def _redis_get(self, key: str) -> Optional[Any]:
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            raw = client.get(self._redis_key(key))
+        except redis.RedisError as e:
+            self._redis_failed("read", e)
+            return None
+        return None if raw is None else json.loads(raw)
+
+    def _redis_set(self, key: str, stored: Any) -> None:
+        client = self._client()
+        if client is None:
+            return
+        try:
+            client.set(self._redis_key(key), json.dumps(stored), ex=config.MEMO_REDIS_TTL_SECONDS)
+        except redis.RedisError as e:
+            self._redis_failed("write", e)
+
+    def _redis_failed(self, operation: str, error: Exception) -> None:
+        logger.warning("Memo %s: Redis %s failed (%s); local tier only for %ss",
+                       self.name, operation, error, REDIS_RETRY_SECONDS)
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+
+
+def clear_all() -> None:
+    """Empty every memo's local tier in this process (the Redis tier is untouched)."""
+    for memo in list(_memos):
+        memo.clear()
@@ -42,6 +42,12 @@ class MessageQueue:
             raise MessageQueueError(f"Failed to enqueue message to '{queue_name}': {e}") from e
         return message_id
 
+    def queue_length(self, queue_name: str) -> int:
+        try:
+            return self.redis_client.llen(queue_name)
+        except redis.RedisError as e:
+            raise MessageQueueError(f"Failed to read the length of '{queue_name}': {e}") from e
+
     def receive_message(self, queue_name: str) -> Optional[Dict[str, Any]]:
         try:
             result = self.redis_client.brpop(queue_name, timeout=1)
@@ -1,13 +1,18 @@
 import logging
+import time
 from datetime import datetime
+from typing import Dict, List, Tuple
 
 import requests
 
 from shared.config import AGENT_ENDPOINTS, INTERNAL_API_TOKEN
-from shared.logging_config import configure_logging, set_ticket_id
+from shared.logging_config import configure_logging, set_agent, set_ticket_id
 from shared.models import SupportTicket
+from shared.stage_timing import request_start_header
+from shared.tracing import SPAN_KIND_CLIENT, configure_tracing, inject, span
 
-configure_logging()
+configure_logging(agent="orchestrator")
+configure_tracing("orchestrator")
 logger = logging.getLogger(__name__)
 
 # Render's free-tier web services sleep after ~15 minutes idle; the first request
@@ -23,12 +28,53 @@ COLD_START_MESSAGE = (
 )
 
 
+def aggregate_timings(round_trips: List[Tuple[str, float, Dict[str, float]]], total_ms: float) -> dict:
+    """Fold each agent's stage breakdown (see shared/stage_timing.py) into one for
+    the whole ticket: per-stage sums across agents, each agent's own breakdown plus
+    its round trip, and `network` — round-trip time the agents didn't account for
+    (transport and serialization; queue wait is already its own stage)."""
+    stages: Dict[str, float] = {}
+    by_agent = {}
+    network = 0.0
+    for agent, round_trip, timings in round_trips:
+        for name, ms in timings.items():
+            if name != "total":
+                stages[name] = round(stages.get(name, 0.0) + ms, 3)
+        by_agent[agent] = {**timings, "round_trip": round(round_trip, 3)}
+        network += max(round_trip - timings.get("total", 0.0), 0.0)
+    return {"total": round(total_ms, 3), "stages": stages, "network": round(network, 3), "by_agent": by_agent}
+
+
 class AgentOrchestrator:
     def __init__(self):
         self.agent_endpoints = AGENT_ENDPOINTS
         self.headers = {"X-Internal-Token": INTERNAL_API_TOKEN} if INTERNAL_API_TOKEN else {}
 
+    def _post(self, agent: str, url: str, payload: dict) -> Tuple[requests.Response, float]:
+        """POST to an agent inside a client span whose context rides along as a
+        `traceparent` header, so the agent's spans join this ticket's trace. Returns
+        the response and the round trip in milliseconds."""
+        with span(f"POST {agent}", kind=SPAN_KIND_CLIENT, **{"http.url": url}) as client_span:
+            started = time.perf_counter()
+            response = requests.post(
+                url,
+                json=payload,
+                headers={**inject(dict(self.headers)), **request_start_header()},
+                timeout=AGENT_REQUEST_TIMEOUT_SECONDS,
+            )
+            client_span.set_attribute("http.status_code", response.status_code)
+            return response, (time.perf_counter() - started) * 1000
+
     def process_support_ticket(self, ticket: SupportTicket) -> dict:
+        with span("process_support_ticket", ticket_id=ticket.ticket_id):
+            started = time.perf_counter()
+            round_trips = []  # (agent, round-trip ms, the agent's own stage timings)
+            result = self._process_support_ticket(ticket, round_trips)
+            result["timings"] = aggregate_timings(round_trips, (time.perf_counter() - started) * 1000)
+            return result
+
+    def _process_support_ticket(self, ticket: SupportTicket, round_trips: list) -> dict:
+        set_agent("orchestrator")
         set_ticket_id(ticket.ticket_id)
         conversation_log = []
 
@@ -45,14 +91,12 @@ class AgentOrchestrator:
             }
 
             # Step 1: Route the ticket
-            routing_response = requests.post(
-                f"{self.agent_endpoints['router']}/route_ticket",
-                json=ticket_dict,
-                headers=self.headers,
-                timeout=AGENT_REQUEST_TIMEOUT_SECONDS,
+            routing_response, round_trip = self._post(
+                "router_agent", f"{self.agent_endpoints['router']}/route_ticket", ticket_dict
             )
             routing_response.raise_for_status()
             routing_result = routing_response.json()
+            round_trips.append(("router_agent", round_trip, routing_result.get("timings", {})))
             conversation_log.append({
                 "agent": "router_agent",
                 "action": "classification",
@@ -64,14 +108,12 @@ class AgentOrchestrator:
             assigned_agent = routing_result["assigned_agent"]
             agent_endpoint = self.agent_endpoints[assigned_agent.replace("_agent", "")]
 
-            handling_response = requests.post(
-                f"{agent_endpoint}/handle_ticket",
-                json={"ticket": ticket_dict},
-                headers=self.headers,
-                timeout=AGENT_REQUEST_TIMEOUT_SECONDS,
+            handling_response, round_trip = self._post(
+                assigned_agent, f"{agent_endpoint}/handle_ticket", {"ticket": ticket_dict}
             )
             handling_response.raise_for_status()
             handling_result = handling_response.json()
+            round_trips.append((assigned_agent, round_trip, handling_result.get("timings", {})))
             conversation_log.append({
                 "agent": assigned_agent,
                 "action": "response",
@@ -85,7 +127,7 @@ class AgentOrchestrator:
                 "ticket_id": ticket.ticket_id,
                 "conversation": conversation_log,
                 "final_response": handling_result["response"]["content"],
-                "escalated": handling_result.get("escalated", False)
+                "escalated": handling_result.get("escalated", False),
             }
 
         except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
@@ -94,7 +136,7 @@ class AgentOrchestrator:
                 "status": "error",
                 "error": COLD_START_MESSAGE,
                 "ticket_id": ticket.ticket_id,
-                "conversation": conversation_log
+                "conversation": conversation_log,
             }
         except Exception as e:
             logger.warning("Ticket processing failed: %s", e)
@@ -102,5 +144,5 @@ class AgentOrchestrator:
                 "status": "error",
                 "error": str(e),
                 "ticket_id": ticket.ticket_id,
-                "conversation": conversation_log
+                "conversation": conversation_log,
             }
@@ -0,0 +1,114 @@
+"""Per-stage timing breakdown for one ticket-handling request.
+
+`collect_stage_timings(app)` starts a fresh breakdown for every request to an agent;
+code inside the request wraps its work in `stage(...)` (or `@timed_stage(...)`), and
+`stage_timings()` returns the breakdown so far, in milliseconds, for the agent to put
+in its response and its `ticket_events` payload. Stages are exclusive: time spent in
+a nested stage (e.g. the LLM call inside classification) is counted there and not
+in the enclosing one, so a breakdown's stages never add up to more than its total.
+
+Queue wait comes from the `X-Request-Start` header the orchestrator stamps on each
+agent call (the convention Heroku/New Relic use for request queueing): the time
+between the orchestrator sending the request and the agent starting on it. It spans
+two hosts' clocks, so it's clamped at zero and only as good as their NTP sync.
+"""
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from fastapi import FastAPI, Request
+
+QUEUE_WAIT = "queue_wait"
+CLASSIFICATION = "classification"
+RETRIEVAL = "retrieval"
+LLM = "llm"
+DB_WRITE = "db_write"
+STAGES = (QUEUE_WAIT, CLASSIFICATION, RETRIEVAL, LLM, DB_WRITE)
+
+REQUEST_START_HEADER = "X-Request-Start"
+
+
+class _Breakdown:
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        # Seconds spent in nested stages, per open stage — subtracted from it on exit.
+        self.open_children: List[float] = []
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+
+_breakdown: ContextVar[Optional[_Breakdown]] = ContextVar("stage_breakdown", default=None)
+
+
+def request_start_header() -> Dict[str, str]:
+    return {REQUEST_START_HEADER: f"t={time.time_ns() // 1000}"}
+
+
+def _queue_wait_seconds(header: Optional[str]) -> Optional[float]:
+    if not header or not header.startswith("t="):
+        return None
+    try:
+        sent_us = int(header[2:])
+    except ValueError:
+        return None
+    return max(time.time_ns() // 1000 - sent_us, 0) / 1_000_000
+
+
+def collect_stage_timings(app: FastAPI) -> None:
+    """Give every request to `app` its own stage breakdown."""
+    @app.middleware("http")
+    async def _collect(request: Request, call_next):
+        breakdown = _Breakdown()
+        queue_wait = _queue_wait_seconds(request.headers.get(REQUEST_START_HEADER))
+        if queue_wait is not None:
+            breakdown.add(QUEUE_WAIT, queue_wait)
+        token = _breakdown.set(breakdown)
+        try:
+            return await call_next(request)
+        finally:
+            _breakdown.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the block as stage `name`; a no-op outside `collect_stage_timings`."""
+    breakdown = _breakdown.get()
+    if breakdown is None:
+        yield
+        return
+    breakdown.open_children.append(0.0)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        nested = breakdown.open_children.pop()
+        breakdown.add(name, elapsed - nested)
+        if breakdown.open_children:
+            breakdown.open_children[-1] += elapsed
+
+
+def timed_stage(name: str):
+    """Decorator form of `stage` for a whole function."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def stage_timings() -> Dict[str, float]:
+    """The current request's breakdown so far: milliseconds per stage that ran, plus
+    `total` (time since the agent started on the request, queue wait included)."""
+    breakdown = _breakdown.get()
+    if breakdown is None:
+        return {}
+    timings = {name: round(seconds * 1000, 3) for name, seconds in breakdown.stages.items()}
+    timings["total"] = round((time.perf_counter() - breakdown.started + breakdown.stages.get(QUEUE_WAIT, 0)) * 1000, 3)
+    return timings
@@ -0,0 +1,326 @@
+"""`CachingTableauBackend`: any `TableauBackend` behind a read cache, for backends
+where reading a department is a remote call — a Tableau REST client — rather than
+a local query. (`SimulatedTableauBackend` caches its own reads already.)
+
+Department info and site status are served from memory for TABLEAU_CACHE_TTL_SECONDS.
+For TABLEAU_CACHE_STALE_SECONDS after that an entry is still served, but the first
+read to see it stale starts a refresh on a background thread (stale-while-revalidate),
+so a hot department never makes a request wait on the remote call. Only a read past
+both windows, or of something never read, waits — and concurrent readers of the same
+missing entry share one remote call.
+
+Every write goes straight to the wrapped backend and then invalidates what it may
+have changed: the department for a reservation; everything for provisioning and
+deactivation, which can move users between departments the caller didn't name. A
+refresh that was already running when a write landed doesn't store its (pre-write)
+result.
+
+The background refreshes call the wrapped backend from worker threads, so it must
+be safe to share between threads — a REST client is; a Session-bound backend isn't.
+
+`AsyncCachingTableauBackend` is the same cache for a backend whose methods are
+coroutines (`TableauCloudBackend`): the same windows, invalidation and stats, with
+every load — a miss or a refresh — run as a task on the event loop instead of a
+thread and shared through an asyncio future. Like the httpx client underneath it,
+one instance belongs to one event loop.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from shared import config
+from shared.tableau_cloud import TableauCloudBackend
+from shared.tableau_service import (
+    DepartmentInfo,
+    ProvisionResult,
+    SiteStatus,
+    TableauBackend,
+    capacity_check,
+)
+
+logger = logging.getLogger(__name__)
+
+_SITE = "site"
+
+# What a read does next (see `_ReadCache._lookup`).
+_HIT, _REFRESH, _LOAD, _JOIN = "hit", "refresh", "load", "join"
+
+
+class _ReadCache:
+    """The bookkeeping both caches share — entries, in-flight loads, invalidation
+    and stats. None of it blocks, so the async cache can take `_lock` on the event
+    loop too."""
+
+    def __init__(self, ttl_seconds: Optional[float], stale_seconds: Optional[float]):
+        self.ttl = config.TABLEAU_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.stale = config.TABLEAU_CACHE_STALE_SECONDS if stale_seconds is None else stale_seconds
+        # Reads by outcome — hit, stale_hit, miss, joined (a miss waiting on another
+        # reader's load) — plus background refreshes and invalidations.
+        self.stats: Counter = Counter()
+        self._entries: Dict[str, Tuple[float, object]] = {}
+        # key -> the running load's future (a concurrent or an asyncio one).
+        self._inflight: Dict[str, object] = {}
+        # Bumped by invalidation; a load only stores its result if they haven't moved.
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self, *keys: str) -> None:
+        """Drop `keys` ("department:<name>", "site"), or everything if none given."""
+        with self._lock:
+            self.stats["invalidation"] += 1
+            if not keys:
+                self._entries.clear()
+                self._inflight.clear()
+                self._epoch += 1
+                return
+            for key in keys:
+                self._entries.pop(key, None)
+                self._inflight.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+    def _lookup(self, key: str, new_future: Callable[[], object]) -> Tuple[str, object, object, tuple]:
+        """With the lock held: what a read of `key` does next, as (action, cached
+        value, future, generation). _HIT serves the value; _REFRESH serves it and
+        runs the load into `future` in the background; _LOAD runs it and waits;
+        _JOIN waits on another reader's `future`."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self.ttl:
+                self.stats["hit"] += 1
+                return _HIT, entry[1], None, ()
+            if age < self.ttl + self.stale:
+                self.stats["stale_hit"] += 1
+                if key in self._inflight:
+                    return _HIT, entry[1], None, ()
+                self.stats["refresh"] += 1
+                future, generation = self._start_load(key, new_future())
+                return _REFRESH, entry[1], future, generation
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["joined"] += 1
+            return _JOIN, None, future, ()
+        self.stats["miss"] += 1
+        future, generation = self._start_load(key, new_future())
+        return _LOAD, None, future, generation
+
+    def _start_load(self, key: str, future) -> Tuple[object, tuple]:
+        self._inflight[key] = future
+        return future, (self._epoch, self._generations.get(key, 0))
+
+    def _end_load(self, key: str, future, generation: tuple, loaded: bool, value: object = None) -> None:
+        """With the lock held: the load is over. Store what it `loaded` unless an
+        invalidation landed while it ran."""
+        if loaded and generation == (self._epoch, self._generations.get(key, 0)):
+            self._entries[key] = (time.monotonic(), value)
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+
+
+class CachingTableauBackend(_ReadCache):
+    def __init__(
+        self,
+        backend: TableauBackend,
+        ttl_seconds: Optional[float] = None,
+        stale_seconds: Optional[float] = None,
+        refresh_workers: int = 2,
+    ):
+        super().__init__(ttl_seconds, stale_seconds)
+        self.backend = backend
+        self._refresher = ThreadPoolExecutor(refresh_workers, thread_name_prefix="tableau-cache")
+
+    def close(self) -> None:
+        self._refresher.shutdown(wait=True)
+
+    def __enter__(self) -> "CachingTableauBackend":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # -- reads -------------------------------------------------------------
+
+    def get_department(self, name: str) -> Optional[DepartmentInfo]:
+        return self._get(f"department:{name}", lambda: self.backend.get_department(name))
+
+    def get_site_status(self) -> SiteStatus:
+        return self._get(_SITE, self.backend.get_site_status)
+
+    def check_capacity(self, department: str, requested_users: int) -> ProvisionResult:
+        return capacity_check(self.get_department(department), requested_users)
+
+    # -- writes ------------------------------------------------------------
+
+    def reserve_licenses(self, department: str, seats: int) -> ProvisionResult:
+        result = self.backend.reserve_licenses(department, seats)
+        self.invalidate(f"department:{department}", _SITE)
+        return result
+
+    def commit_reservation(self, reservation_id: str, emails: List[str]) -> bool:
+        result = self.backend.commit_reservation(reservation_id, emails)
+        self.invalidate()
+        return result
+
+    def release_reservation(self, reservation_id: str) -> bool:
+        result = self.backend.release_reservation(reservation_id)
+        self.invalidate()
+        return result
+
+    def provision_user(self, email: str, department: str) -> bool:
+        result = self.backend.provision_user(email, department)
+        self.invalidate()
+        return result
+
+    def provision_users(self, emails: List[str], department: str) -> ProvisionResult:
+        result = self.backend.provision_users(emails, department)
+        self.invalidate()
+        return result
+
+    def deactivate_user(self, email: str) -> bool:
+        result = self.backend.deactivate_user(email)
+        self.invalidate()
+        return result
+
+    def deactivate_users(self, emails: List[str]) -> Dict[str, bool]:
+        result = self.backend.deactivate_users(emails)
+        self.invalidate()
+        return result
+
+    # -- the cache ---------------------------------------------------------
+
+    def _get(self, key: str, load: Callable[[], object]):
+        with self._lock:
+            action, value, future, generation = self._lookup(key, Future)
+        if action == _HIT:
+            return value
+        if action == _REFRESH:
+            self._refresher.submit(self._load, key, load, future, generation)
+            return value
+        if action == _LOAD:
+            self._load(key, load, future, generation)
+        return future.result()
+
+    def _load(self, key: str, load: Callable[[], object], future: Future, generation: tuple) -> None:
+        try:
+            value = load()
+        except Exception as e:
+            logger.warning("Tableau cache: loading %s failed: %s", key, e)
+            with self._lock:
+                self._end_load(key, future, generation, loaded=False)
+            future.set_exception(e)
+            return
+        with self._lock:
+            self._end_load(key, future, generation, loaded=True, value=value)
+        future.set_result(value)
+
+
+class AsyncCachingTableauBackend(_ReadCache):
+    """`CachingTableauBackend` for `TableauCloudBackend`, whose calls are coroutines."""
+
+    def __init__(
+        self,
+        backend: TableauCloudBackend,
+        ttl_seconds: Optional[float] = None,
+        stale_seconds: Optional[float] = None,
+    ):
+        super().__init__(ttl_seconds, stale_seconds)
+        self.backend = backend
+        # Running loads and background refreshes: held so they aren't garbage-collected
+        # mid-run, and so aclose can cancel them.
+        self._refreshes: Set[asyncio.Task] = set()
+
+    async def aclose(self) -> None:
+        """Cancel any running loads and refreshes, then close the wrapped backend."""
+        for task in list(self._refreshes):
+            task.cancel()
+        await asyncio.gather(*self._refreshes, return_exceptions=True)
+        await self.backend.aclose()
+
+    # -- reads -------------------------------------------------------------
+
+    async def get_department(self, name: str) -> Optional[DepartmentInfo]:
+        return await self._get(f"department:{name}", lambda: self.backend.get_department(name))
+
+    async def get_site_status(self) -> SiteStatus:
+        return await self._get(_SITE, self.backend.get_site_status)
+
+    async def check_capacity(self, department: str, requested_users: int) -> ProvisionResult:
+        return capacity_check(await self.get_department(department), requested_users)
+
+    # -- writes ------------------------------------------------------------
+
+    async def reserve_licenses(self, department: str, seats: int) -> ProvisionResult:
+        result = await self.backend.reserve_licenses(department, seats)
+        self.invalidate(f"department:{department}", _SITE)
+        return result
+
+    async def commit_reservation(self, reservation_id: str, emails: List[str]) -> bool:
+        result = await self.backend.commit_reservation(reservation_id, emails)
+        self.invalidate()
+        return result
+
+    async def release_reservation(self, reservation_id: str) -> bool:
+        result = await self.backend.release_reservation(reservation_id)
+        self.invalidate()
+        return result
+
+    async def provision_user(self, email: str, department: str) -> bool:
+        result = await self.backend.provision_user(email, department)
+        self.invalidate()
+        return result
+
+    async def provision_users(self, emails: List[str], department: str) -> ProvisionResult:
+        result = await self.backend.provision_users(emails, department)
+        self.invalidate()
+        return result
+
+    async def deactivate_user(self, email: str) -> bool:
+        result = await self.backend.deactivate_user(email)
+        self.invalidate()
+        return result
+
+    async def deactivate_users(self, emails: List[str]) -> Dict[str, bool]:
+        result = await self.backend.deactivate_users(emails)
+        self.invalidate()
+        return result
+
+    # -- the cache ---------------------------------------------------------
+
+    async def _get(self, key: str, load: Callable[[], Awaitable[object]]):
+        with self._lock:
+            action, value, future, generation = self._lookup(key, asyncio.get_running_loop().create_future)
+        if action == _HIT:
+            return value
+        if action != _JOIN:
+            task = asyncio.create_task(self._load(key, load, future, generation))
+            self._refreshes.add(task)
+            task.add_done_callback(self._refreshes.discard)
+        if action == _REFRESH:
+            return value
+        # The load is a task of its own, not part of any reader, and every reader —
+        # the one that started it included — waits through a shield: a reader that's
+        # cancelled gives up alone, and the others still get the value.
+        return await asyncio.shield(future)
+
+    async def _load(self, key: str, load: Callable[[], Awaitable[object]], future: asyncio.Future, generation: tuple):
+        try:
+            value = await load()
+        except BaseException as e:
+            if not isinstance(e, asyncio.CancelledError):
+                logger.warning("Tableau cache: loading %s failed: %s", key, e)
+            with self._lock:
+                self._end_load(key, future, generation, loaded=False)
+            if isinstance(e, asyncio.CancelledError):  # aclose: nobody is left to wait
+                future.cancel()
+                raise
+            future.set_exception(e)
+            future.exception()  # retrieved: a refresh nobody joined mustn't log "never retrieved"
+            return
+        with self._lock:
+            self._end_load(key, future, generation, loaded=True, value=value)
+        future.set_result(value)
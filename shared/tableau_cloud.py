@@ -0,0 +1,385 @@
+"""`TableauCloudBackend`: the `TableauBackend` operations against a real Tableau
+site (Tableau Cloud or Server) over its REST API, as an asyncio client — every
+method is a coroutine, so the account agent awaits it instead of blocking its
+event loop on the network.
+
+A department is a group on the site: its license is the group's minimum site role,
+its active users the members whose site role isn't `Unlicensed` (deactivating a user
+unlicenses them, as an admin would). Seat limits aren't stored in Tableau; they
+come from `capacities` — `department_capacities` reads them from the support
+database's `departments.max_users`.
+
+One client holds one pooled `httpx.AsyncClient` for the life of the process, at most
+TABLEAU_MAX_CONCURRENCY requests in flight. It signs in with a personal access token
+once and reuses the token until shortly before Tableau's estimated expiry; a 401
+anyway (a revoked or server-expired token) signs in again and retries that request
+once, and concurrent requests share the one sign-in. Paginated lists fetch page one
+for the total, then all remaining pages concurrently; bulk operations look users up
+a hundred emails per `name:in:[...]` filter and apply their changes concurrently.
+
+Capacity decisions are serialized per department by an asyncio lock, in this
+process. Tableau has nowhere to keep a license hold either, so reservations are
+held in memory too: this backend guarantees no overshoot only with a single
+account-agent process. A REST batch also isn't a transaction — a failure partway
+through `provision_users` raises `TableauAPIError` with the users before it applied.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from datetime import timedelta
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import httpx
+from sqlalchemy.orm import Session
+
+from shared import config
+from shared.db.models import Department, utcnow
+from shared.tableau_service import DepartmentInfo, ProvisionResult, Reservation, SiteStatus, capacity_check
+
+logger = logging.getLogger(__name__)
+
+UNLICENSED = "Unlicensed"
+PAGE_SIZE = 1000  # the most Tableau serves per page
+NAME_FILTER_CHUNK = 100  # emails per name:in:[...] filter, to keep URLs short
+# Sign in again this long before Tableau's estimated token expiry.
+TOKEN_REFRESH_MARGIN_SECONDS = 60
+DEFAULT_TOKEN_LIFETIME_SECONDS = 240 * 60
+
+
+class TableauAPIError(Exception):
+    def __init__(self, status: int, code: str, summary: str, detail: str = ""):
+        super().__init__(f"Tableau REST API {status} ({code}): {summary}" + (f" — {detail}" if detail else ""))
+        self.status = status
+        self.code = code
+
+
+def _api_error(response: httpx.Response) -> TableauAPIError:
+    try:
+        error = response.json()["error"]
+    except (ValueError, KeyError, TypeError):
+        error = {}
+    return TableauAPIError(
+        response.status_code, error.get("code", ""), error.get("summary", response.reason_phrase), error.get("detail", ""),
+    )
+
+
+def _seconds(estimate: Optional[str]) -> float:
+    """A token's `estimatedTimeToExpiration` ("HHH:MM:SS") in seconds."""
+    try:
+        hours, minutes, seconds = (int(part) for part in estimate.split(":"))
+    except (AttributeError, ValueError):
+        return DEFAULT_TOKEN_LIFETIME_SECONDS
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def _chunks(items: List, size: int) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def department_capacities(db: Session) -> Dict[str, int]:
+    return dict(db.query(Department.name, Department.max_users).all())
+
+
+class TableauCloudBackend:
+    def __init__(
+        self,
+        server_url: str,
+        site: str,
+        token_name: str,
+        token_secret: str,
+        capacities: Mapping[str, int],
+        api_version: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        page_size: int = PAGE_SIZE,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.capacities = dict(capacities)
+        self.page_size = page_size
+        self._credentials = {
+            "personalAccessTokenName": token_name,
+            "personalAccessTokenSecret": token_secret,
+            "site": {"contentUrl": site},
+        }
+        self._api = f"/api/{api_version or config.TABLEAU_API_VERSION}"
+        concurrency = max_concurrency or config.TABLEAU_MAX_CONCURRENCY
+        self._http = client or httpx.AsyncClient(
+            base_url=server_url,
+            timeout=httpx.Timeout(30, connect=5),
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+        self._requests = asyncio.Semaphore(concurrency)
+        self._auth_lock = asyncio.Lock()
+        self._token: Optional[str] = None
+        self._token_expires = 0.0
+        self._site_id: Optional[str] = None
+        # Department name -> its group. Departments don't come and go at runtime.
+        self._groups: Dict[str, dict] = {}
+        self._department_locks: Dict[str, asyncio.Lock] = {}
+        self._holds: Dict[str, Reservation] = {}
+
+    @classmethod
+    def from_config(cls, capacities: Mapping[str, int]) -> "TableauCloudBackend":
+        return cls(
+            config.TABLEAU_SERVER_URL, config.TABLEAU_SITE, config.TABLEAU_PAT_NAME, config.TABLEAU_PAT_SECRET,
+            capacities,
+        )
+
+    async def aclose(self) -> None:
+        if self._token is not None:
+            try:
+                await self._http.post(f"{self._api}/auth/signout", headers={"X-Tableau-Auth": self._token})
+            except httpx.HTTPError as e:
+                logger.warning("Tableau sign-out failed: %s", e)
+            self._token = None
+        await self._http.aclose()
+
+    # -- transport -----------------------------------------------------------
+
+    async def _signed_in(self) -> str:
+        async with self._auth_lock:
+            if self._token is None or time.monotonic() >= self._token_expires:
+                response = await self._http.post(f"{self._api}/auth/signin", json={"credentials": self._credentials})
+                if response.is_error:
+                    raise _api_error(response)
+                credentials = response.json()["credentials"]
+                lifetime = _seconds(credentials.get("estimatedTimeToExpiration"))
+                self._token = credentials["token"]
+                self._site_id = credentials["site"]["id"]
+                self._token_expires = time.monotonic() + max(lifetime - TOKEN_REFRESH_MARGIN_SECONDS, lifetime / 2)
+            return self._token
+
+    async def _expire(self, token: str) -> None:
+        # Only the token that was refused: a concurrent request may already have
+        # signed in again.
+        async with self._auth_lock:
+            if self._token == token:
+                self._token = None
+
+    async def _request(self, method: str, path: str, ok: Tuple[int, ...] = (), **kwargs) -> httpx.Response:
+        """One call to `path` under the site, signed in. Error statuses raise
+        TableauAPIError, except those in `ok`, which the caller handles."""
+        async with self._requests:
+            for attempt in range(2):
+                token = await self._signed_in()
+                response = await self._http.request(
+                    method, f"{self._api}/sites/{self._site_id}{path}", headers={"X-Tableau-Auth": token}, **kwargs,
+                )
+                if response.status_code != 401 or attempt:
+                    break
+                await self._expire(token)
+        if response.is_error and response.status_code not in ok:
+            raise _api_error(response)
+        return response
+
+    async def _page(self, path: str, key: str, number: int, params: dict) -> dict:
+        response = await self._request(
+            "GET", path, params={**params, "pageSize": self.page_size, "pageNumber": number},
+        )
+        return response.json()
+
+    async def _all(self, path: str, key: str, **params) -> List[dict]:
+        """Every item of a paginated list: page one for the total, then the rest at once."""
+        first = await self._page(path, key, 1, params)
+        pages = -(-int(first["pagination"]["totalAvailable"]) // self.page_size)
+        rest = await asyncio.gather(*(self._page(path, key, number, params) for number in range(2, pages + 1)))
+        return [item for page in (first, *rest) for item in page[f"{key}s"].get(key, [])]
+
+    # -- lookups -------------------------------------------------------------
+
+    async def _group(self, department: str) -> Optional[dict]:
+        if department not in self.capacities:
+            return None
+        group = self._groups.get(department)
+        if group is None:
+            groups = await self._all("/groups", "group", filter=f"name:eq:{department}")
+            if not groups:
+                return None
+            group = self._groups[department] = groups[0]
+        return group
+
+    async def _members(self, group: dict) -> List[dict]:
+        return await self._all(f"/groups/{group['id']}/users", "user")
+
+    async def _users(self, emails: List[str]) -> Dict[str, dict]:
+        """email -> user, for those of `emails` with an account on the site."""
+        pages = await asyncio.gather(*(
+            self._all("/users", "user", filter=f"name:in:[{','.join(chunk)}]")
+            for chunk in _chunks(emails, NAME_FILTER_CHUNK)
+        ))
+        return {user["name"]: user for page in pages for user in page}
+
+    def _held_seats(self, department: str) -> int:
+        now = utcnow()
+        for reservation_id in [r.id for r in self._holds.values() if r.expires_at <= now]:
+            del self._holds[reservation_id]
+        return sum(r.seats for r in self._holds.values() if r.department == department)
+
+    def _info(self, department: str, group: dict, members: List[dict]) -> DepartmentInfo:
+        return DepartmentInfo(
+            name=department,
+            max_users=self.capacities[department],
+            current_users=sum(user["siteRole"] != UNLICENSED for user in members),
+            license_type=group["minimumSiteRole"],
+            reserved_users=self._held_seats(department),
+        )
+
+    def _department_lock(self, department: str) -> asyncio.Lock:
+        return self._department_locks.setdefault(department, asyncio.Lock())
+
+    # -- TableauBackend ------------------------------------------------------
+
+    async def get_department(self, name: str) -> Optional[DepartmentInfo]:
+        group = await self._group(name)
+        if group is None:
+            return None
+        return self._info(name, group, await self._members(group))
+
+    async def check_capacity(self, department: str, requested_users: int) -> ProvisionResult:
+        return capacity_check(await self.get_department(department), requested_users)
+
+    async def reserve_licenses(self, department: str, seats: int) -> ProvisionResult:
+        if seats < 1:
+            return ProvisionResult(success=False, reason="At least one license must be requested")
+        async with self._department_lock(department):
+            info = await self.get_department(department)
+            result = capacity_check(info, seats)
+            if result.success:
+                result.available_licenses -= seats
+                result.reservation = Reservation(
+                    id=str(uuid.uuid4()), department=department, seats=seats, license_type=info.license_type,
+                    expires_at=utcnow() + timedelta(minutes=config.LICENSE_RESERVATION_TTL_MINUTES),
+                )
+                self._holds[result.reservation.id] = result.reservation
+        return result
+
+    async def commit_reservation(self, reservation_id: str, emails: List[str]) -> bool:
+        emails = list(dict.fromkeys(emails))
+        hold = self._holds.get(reservation_id)
+        if hold is None or hold.expires_at <= utcnow() or len(emails) > hold.seats:
+            return False
+        async with self._department_lock(hold.department):
+            if self._holds.pop(reservation_id, None) is not hold:
+                return False  # released while we waited for the lock
+            try:
+                await self._activate(hold.department, emails)
+            except Exception:
+                self._holds[reservation_id] = hold
+                raise
+        return True
+
+    async def release_reservation(self, reservation_id: str) -> bool:
+        return self._holds.pop(reservation_id, None) is not None
+
+    async def provision_user(self, email: str, department: str) -> bool:
+        """Provision one user unconditionally — no capacity check, as in
+        SimulatedTableauBackend."""
+        async with self._department_lock(department):
+            return await self._activate(department, [email]) is not None
+
+    async def provision_users(self, emails: List[str], department: str) -> ProvisionResult:
+        """Make every one of `emails` an active user of `department`, if the ones
+        who'd newly take a seat there fit its capacity; otherwise change nothing."""
+        emails = list(dict.fromkeys(emails))
+        if not emails:
+            return ProvisionResult(success=False, reason="No email addresses given")
+        async with self._department_lock(department):
+            group = await self._group(department)
+            if group is None:
+                return ProvisionResult(success=False, reason="Department not found")
+            members, users = await asyncio.gather(self._members(group), self._users(emails))
+            plan = self._activation_plan(members, users, emails)
+            info = self._info(department, group, members)
+            needed = sum(outcome != "unchanged" for outcome, _, _ in plan.values())
+            available = info.max_users - info.current_users - info.reserved_users
+            if needed > available:
+                return ProvisionResult(
+                    success=False,
+                    reason=f"Insufficient licenses. Requested: {needed}, Available: {available}",
+                    requires_approval=True,
+                )
+            await self._apply(group, plan)
+        return ProvisionResult(
+            success=True,
+            license_type=info.license_type,
+            available_licenses=available - needed,
+            outcomes={email: outcome for email, (outcome, _, _) in plan.items()},
+        )
+
+    async def _activate(self, department: str, emails: List[str]) -> Optional[Dict[str, tuple]]:
+        # Called with the department's lock held; None if there's no such department.
+        group = await self._group(department)
+        if group is None:
+            return None
+        members, users = await asyncio.gather(self._members(group), self._users(emails))
+        plan = self._activation_plan(members, users, emails)
+        await self._apply(group, plan)
+        return plan
+
+    @staticmethod
+    def _activation_plan(members: List[dict], users: Dict[str, dict], emails: List[str]) -> Dict[str, tuple]:
+        """email -> (outcome, user or None if new, whether already a group member),
+        with the outcomes `SimulatedTableauBackend` reports."""
+        member_ids = {member["id"] for member in members}
+        plan = {}
+        for email in emails:
+            user = users.get(email)
+            if user is None:
+                plan[email] = ("created", None, False)
+            elif user["siteRole"] == UNLICENSED:
+                plan[email] = ("reactivated", user, user["id"] in member_ids)
+            elif user["id"] not in member_ids:
+                plan[email] = ("moved", user, False)
+            else:
+                plan[email] = ("unchanged", user, True)
+        return plan
+
+    async def _apply(self, group: dict, plan: Dict[str, tuple]) -> None:
+        await asyncio.gather(*(
+            self._apply_one(group, email, outcome, user, member)
+            for email, (outcome, user, member) in plan.items() if outcome != "unchanged"
+        ))
+
+    async def _apply_one(self, group: dict, email: str, outcome: str, user: Optional[dict], member: bool) -> None:
+        role = {"siteRole": group["minimumSiteRole"]}
+        if user is None:
+            response = await self._request("POST", "/users", json={"user": {"name": email, **role}})
+            user = response.json()["user"]
+        else:
+            await self._request("PUT", f"/users/{user['id']}", json={"user": role})
+            await self._leave_other_departments(user, group)
+        if not member:
+            # 409: already a member — someone else got there first, which is fine.
+            await self._request("POST", f"/groups/{group['id']}/users", ok=(409,), json={"user": {"id": user["id"]}})
+
+    async def _leave_other_departments(self, user: dict, group: dict) -> None:
+        groups = await self._all(f"/users/{user['id']}/groups", "group")
+        await asyncio.gather(*(
+            self._request("DELETE", f"/groups/{other['id']}/users/{user['id']}", ok=(404,))
+            for other in groups if other["id"] != group["id"] and other["name"] in self.capacities
+        ))
+
+    async def deactivate_user(self, email: str) -> bool:
+        return (await self.deactivate_users([email]))[email]
+
+    async def deactivate_users(self, emails: List[str]) -> Dict[str, bool]:
+        """Unlicense every active user among `emails`; returns email -> whether it
+        was deactivated (False: no active user with it)."""
+        emails = list(dict.fromkeys(emails))
+        users = await self._users(emails)
+        active = {email: user for email, user in users.items() if user["siteRole"] != UNLICENSED}
+        await asyncio.gather(*(
+            self._request("PUT", f"/users/{user['id']}", json={"user": {"siteRole": UNLICENSED}})
+            for user in active.values()
+        ))
+        return {email: email in active for email in emails}
+
+    async def get_site_status(self) -> SiteStatus:
+        departments = await asyncio.gather(*(self.get_department(name) for name in self.capacities))
+        departments = [info for info in departments if info is not None]
+        return SiteStatus(
+            total_departments=len(departments),
+            total_active_users=sum(info.current_users for info in departments),
+            total_capacity=sum(info.max_users for info in departments),
+        )
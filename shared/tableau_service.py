@@ -1,9 +1,37 @@
-from dataclasses import dataclass
-from typing import Optional, Protocol
+"""The Tableau site, as the agents see it — see `TableauBackend`.
 
-from sqlalchemy.orm import Session
+`SimulatedTableauBackend` keeps each department's active-user count in
+`department_user_counts` (moved in the same transaction as the user row it counts)
+rather than counting `users` per request, and serves department and site-wide
+numbers from a short-TTL per-process cache (DEPARTMENT_CACHE_TTL_SECONDS) that its
+own writes invalidate. Another process's writes show up once the TTL lapses, so a
+cached `check_capacity` is advisory — a quick answer for the ticket reply, not a
+guarantee a provision will fit. `reconcile_department_user_counts` checks the
+counters against a real count and repairs drift.
 
-from shared.db.models import Department, User
+Because of that, anything that must not overshoot `max_users` goes through
+`reserve_licenses`: it takes the department's lock, checks capacity against the
+live counter and the seats other requests already hold, and records a hold of its
+own, all in one transaction. A reservation is then committed (its seats provisioned)
+or released; one that's neither stops counting at `expires_at`
+(LICENSE_RESERVATION_TTL_MINUTES).
+"""
+import threading
+import time
+import uuid
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Protocol
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, joinedload
+
+from shared import config
+from shared.db.models import Department, DepartmentUserCount, LicenseReservation, User, utcnow
 
 
 @dataclass
@@ -12,6 +40,16 @@ class DepartmentInfo:
     max_users: int
     current_users: int
     license_type: str
+    reserved_users: int = 0  # seats held by pending, unexpired reservations
+
+
+@dataclass
+class Reservation:
+    id: str
+    department: str
+    seats: int
+    license_type: str
+    expires_at: datetime
 
 
 @dataclass
@@ -21,6 +59,10 @@ class ProvisionResult:
     available_licenses: Optional[int] = None
     reason: Optional[str] = None
     requires_approval: bool = False
+    reservation: Optional[Reservation] = None  # set by a successful reserve_licenses
+    # provision_users: what happened to each email — "created", "reactivated",
+    # "moved" (from another department) or "unchanged" (already active there).
+    outcomes: Dict[str, str] = field(default_factory=dict)
 
 
 @dataclass
@@ -30,87 +72,513 @@ class SiteStatus:
     total_capacity: int
 
 
+@dataclass
+class UserCountDrift:
+    department: str
+    counted: Optional[int]  # None: the department had no counter row
+    actual: int
+
+
 class TableauBackend(Protocol):
     """Everything an agent needs from the Tableau site.
 
-    `SimulatedTableauBackend` (below) is the only implementation today. A future
-    `TableauCloudBackend` talking to the real Tableau REST API can implement the
-    same interface without any agent code changing.
+    `SimulatedTableauBackend` (below) implements it against the support database.
+    `TableauCloudBackend` (shared/tableau_cloud.py) implements the same operations
+    against a real site's REST API as coroutines; `AccountManager.respond` takes
+    either.
     """
 
     def get_department(self, name: str) -> Optional[DepartmentInfo]: ...
     def check_capacity(self, department: str, requested_users: int) -> ProvisionResult: ...
+    def reserve_licenses(self, department: str, seats: int) -> ProvisionResult: ...
+    def commit_reservation(self, reservation_id: str, emails: List[str]) -> bool: ...
+    def release_reservation(self, reservation_id: str) -> bool: ...
     def provision_user(self, email: str, department: str) -> bool: ...
+    def provision_users(self, emails: List[str], department: str) -> ProvisionResult: ...
     def deactivate_user(self, email: str) -> bool: ...
+    def deactivate_users(self, emails: List[str]) -> Dict[str, bool]: ...
     def get_site_status(self) -> SiteStatus: ...
 
 
+def capacity_check(dept_info: Optional[DepartmentInfo], requested_users: int) -> ProvisionResult:
+    """`check_capacity`'s answer from a department's (possibly cached) numbers."""
+    if dept_info is None:
+        return ProvisionResult(success=False, reason="Department not found")
+
+    available = dept_info.max_users - dept_info.current_users - dept_info.reserved_users
+    if requested_users <= available:
+        return ProvisionResult(
+            success=True,
+            license_type=dept_info.license_type,
+            available_licenses=available,
+        )
+    return ProvisionResult(
+        success=False,
+        reason=f"Insufficient licenses. Requested: {requested_users}, Available: {available}",
+        requires_approval=True,
+    )
+
+
+class _TTLCache:
+    def __init__(self) -> None:
+        self._entries: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, load: Callable[[], object]):
+        ttl = config.DEPARTMENT_CACHE_TTL_SECONDS
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and now - entry[0] < ttl:
+            return entry[1]
+        value = load()
+        if ttl > 0:
+            with self._lock:
+                self._entries[key] = (now, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# One cache per database (engine), so two databases in one process — the test
+# suite's per-test SQLite DBs, say — never see each other's numbers.
+_caches: "weakref.WeakKeyDictionary[object, _TTLCache]" = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def _cache_for(db: Session) -> _TTLCache:
+    engine = db.get_bind()
+    with _caches_lock:
+        cache = _caches.get(engine)
+        if cache is None:
+            cache = _caches[engine] = _TTLCache()
+        return cache
+
+
+def _active_user_counts(db: Session, department_ids: Iterable[int]) -> Dict[int, int]:
+    """Real active-user counts for `department_ids` — one grouped query on
+    ix_users_department_id_status. Departments with no active users are omitted."""
+    rows = (
+        db.query(User.department_id, func.count())
+        .filter(User.department_id.in_(list(department_ids)), User.status == "active")
+        .group_by(User.department_id)
+    )
+    return dict(rows.all())
+
+
+def _create_missing_counts(db: Session, department_ids: List[int]) -> Dict[int, int]:
+    """Count and store counters for departments that don't have one yet; returns
+    the counts. Stored in the caller's transaction: it's persisted when they commit.
+    Another process creating the same row concurrently wins, not errors."""
+    db.flush()  # the count must include this session's own pending user changes
+    counts = _active_user_counts(db, department_ids)
+    rows = [{"department_id": dept_id, "active_users": counts.get(dept_id, 0)} for dept_id in department_ids]
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        dialect_insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        db.execute(dialect_insert(DepartmentUserCount).values(rows).on_conflict_do_nothing())
+    else:
+        for row in rows:
+            db.merge(DepartmentUserCount(**row))
+    return {row["department_id"]: row["active_users"] for row in rows}
+
+
+# Emails per IN (...) list in the bulk operations — well under SQLite's and
+# Postgres's bound-parameter limits, however many users a request names.
+BULK_CHUNK_SIZE = 500
+
+
+def _normalized_emails(emails: Iterable[str]) -> List[str]:
+    """`emails` lowercased and deduplicated, in order. Users are stored by lowercase
+    email — the unique index, the lookups here and user_directory's prefix search all
+    compare it exactly — whatever case a ticket spelled it in."""
+    return list(dict.fromkeys(email.strip().lower() for email in emails))
+
+
+def _chunks(items: List, size: int = BULK_CHUNK_SIZE) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _held_seats_query(department_id):
+    """Seats held against `department_id` by pending reservations that haven't
+    expired — served by ix_license_reservations_department_id_status_expires_at."""
+    return select(func.coalesce(func.sum(LicenseReservation.seats), 0)).where(
+        LicenseReservation.department_id == department_id,
+        LicenseReservation.status == "pending",
+        LicenseReservation.expires_at > utcnow(),
+    )
+
+
+# SQLite has no row locks, only a database-wide write lock, and a transaction that
+# reads before it writes can't upgrade to it without risking "database is locked".
+# So the serialized path takes the write lock up front; this per-database mutex
+# queues this process's threads for it rather than leaving them to spin on
+# SQLite's busy timeout.
+_sqlite_write_locks: "weakref.WeakKeyDictionary[object, threading.Lock]" = weakref.WeakKeyDictionary()
+
+
+@contextmanager
+def _locked_department(db: Session, name: str) -> Iterator[Optional[tuple]]:
+    """Yield department `name` with its license, active-user count and held seats
+    — `(department, active_users, held_seats)`, read fresh in one query; None if
+    there's no such department — locked against other capacity changes until the
+    block's writes are committed, which this does on the way out (rolling back
+    instead if the block raises). `active_users` is None if the department has no
+    counter row yet.
+
+    Postgres (and anything else with row locks): SELECT ... FOR UPDATE OF the
+    department row, so only requests for the same department wait on each other.
+    SQLite: a no-op UPDATE of the row takes the database write lock first.
+    """
+    engine = db.get_bind()
+    serialized = engine.dialect.name == "sqlite"
+    process_lock = None
+    if serialized:
+        with _caches_lock:
+            process_lock = _sqlite_write_locks.setdefault(engine, threading.Lock())
+        process_lock.acquire()
+    try:
+        query = (
+            db.query(Department, DepartmentUserCount.active_users, _held_seats_query(Department.id).scalar_subquery())
+            .options(joinedload(Department.license))
+            .outerjoin(DepartmentUserCount, DepartmentUserCount.department_id == Department.id)
+            .filter(Department.name == name)
+            .populate_existing()
+        )
+        if serialized:
+            db.execute(update(Department).where(Department.name == name).values(max_users=Department.max_users))
+        else:
+            query = query.with_for_update(of=Department)
+        try:
+            yield query.first()
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+    finally:
+        if process_lock is not None:
+            process_lock.release()
+
+
 class SimulatedTableauBackend:
     def __init__(self, db: Session):
         self.db = db
 
     def get_department(self, name: str) -> Optional[DepartmentInfo]:
-        dept = self.db.query(Department).filter(Department.name == name).first()
-        if dept is None:
-            return None
-        current_users = (
-            self.db.query(User)
-            .filter(User.department_id == dept.id, User.status == "active")
-            .count()
+        return _cache_for(self.db).get(f"department:{name}", lambda: self._load_department(name))
+
+    def _load_department(self, name: str) -> Optional[DepartmentInfo]:
+        row = (
+            self.db.query(
+                Department,
+                DepartmentUserCount.active_users,
+                _held_seats_query(Department.id).scalar_subquery(),
+            )
+            .options(joinedload(Department.license))
+            .outerjoin(DepartmentUserCount, DepartmentUserCount.department_id == Department.id)
+            .filter(Department.name == name)
+            .first()
         )
+        if row is None:
+            return None
+        dept, current_users, reserved_users = row
+        if current_users is None:
+            current_users = _create_missing_counts(self.db, [dept.id])[dept.id]
         return DepartmentInfo(
             name=dept.name,
             max_users=dept.max_users,
             current_users=current_users,
             license_type=dept.license.name,
+            reserved_users=reserved_users,
         )
 
     def check_capacity(self, department: str, requested_users: int) -> ProvisionResult:
-        dept_info = self.get_department(department)
-        if dept_info is None:
-            return ProvisionResult(success=False, reason="Department not found")
-
-        available = dept_info.max_users - dept_info.current_users
-        if requested_users <= available:
-            return ProvisionResult(
-                success=True,
-                license_type=dept_info.license_type,
-                available_licenses=available,
-            )
-        return ProvisionResult(
-            success=False,
-            reason=f"Insufficient licenses. Requested: {requested_users}, Available: {available}",
-            requires_approval=True,
+        return capacity_check(self.get_department(department), requested_users)
+
+    def reserve_licenses(self, department: str, seats: int) -> ProvisionResult:
+        """Atomically check capacity and hold `seats` licenses in `department`.
+
+        Same answers as `check_capacity`, but decided under the department's lock
+        against the live counter and the other pending holds, so concurrent requests
+        can't both take the last seats. On success the hold is already committed and
+        `result.reservation` says which one to commit or release.
+        """
+        if seats < 1:
+            return ProvisionResult(success=False, reason="At least one license must be requested")
+
+        with _locked_department(self.db, department) as row:
+            if row is None:
+                result = ProvisionResult(success=False, reason="Department not found")
+            else:
+                dept, active_users, held_seats = row
+                if active_users is None:
+                    active_users = _create_missing_counts(self.db, [dept.id])[dept.id]
+                available = dept.max_users - active_users - held_seats
+                if seats > available:
+                    result = ProvisionResult(
+                        success=False,
+                        reason=f"Insufficient licenses. Requested: {seats}, Available: {available}",
+                        requires_approval=True,
+                    )
+                else:
+                    expires_at = utcnow() + timedelta(minutes=config.LICENSE_RESERVATION_TTL_MINUTES)
+                    reservation_id = str(uuid.uuid4())
+                    self.db.add(LicenseReservation(
+                        id=reservation_id, department_id=dept.id, seats=seats, expires_at=expires_at,
+                    ))
+                    license_type = dept.license.name
+                    result = ProvisionResult(
+                        success=True,
+                        license_type=license_type,
+                        available_licenses=available - seats,
+                        reservation=Reservation(
+                            id=reservation_id, department=dept.name, seats=seats, license_type=license_type,
+                            expires_at=expires_at,
+                        ),
+                    )
+        _cache_for(self.db).clear()
+        return result
+
+    def commit_reservation(self, reservation_id: str, emails: List[str]) -> bool:
+        """Provision `emails` (no more than the reservation's seats) into its
+        department and mark it committed. False, with nothing changed, if the
+        reservation is unknown, already committed or released, or expired."""
+        department = (
+            self.db.query(Department.name)
+            .join(LicenseReservation, LicenseReservation.department_id == Department.id)
+            .filter(LicenseReservation.id == reservation_id)
+            .scalar()
+        )
+        if department is None:
+            return False
+
+        emails = _normalized_emails(emails)
+        with _locked_department(self.db, department) as (dept, _, _):
+            row = self.db.query(LicenseReservation).filter(LicenseReservation.id == reservation_id).populate_existing().one()
+            committed = row.status == "pending" and row.expires_at > utcnow() and len(emails) <= row.seats
+            if committed:
+                self._activate(dept, self._activation_plan(dept.id, emails))
+                row.status = "committed"
+        _cache_for(self.db).clear()
+        return committed
+
+    def release_reservation(self, reservation_id: str) -> bool:
+        """Give a pending reservation's seats back. Only ever frees capacity, so it
+        needs no department lock — just a conditional update."""
+        released = self.db.execute(
+            update(LicenseReservation)
+            .where(LicenseReservation.id == reservation_id, LicenseReservation.status == "pending")
+            .values(status="released")
+        ).rowcount
+        self.db.commit()
+        _cache_for(self.db).clear()
+        return released == 1
+
+    def _adjust_count(self, department_id: int, delta: int) -> None:
+        # An atomic in-database increment, not read-modify-write: concurrent
+        # provisions in other processes each add their own delta. No counter row yet
+        # means nothing to adjust — it'll be counted, this change included, on first read.
+        self.db.execute(
+            update(DepartmentUserCount)
+            .where(DepartmentUserCount.department_id == department_id)
+            .values(active_users=DepartmentUserCount.active_users + delta)
         )
 
     def provision_user(self, email: str, department: str) -> bool:
+        """Provision one user unconditionally — no capacity check; callers that
+        need one use `provision_users` or a reservation."""
         dept = self.db.query(Department).filter(Department.name == department).first()
         if dept is None:
             return False
-
-        user = self.db.query(User).filter(User.email == email).first()
-        if user is not None:
-            user.status = "active"
-            user.department_id = dept.id
-            user.license_id = dept.license_id
-        else:
-            self.db.add(User(email=email, department_id=dept.id, license_id=dept.license_id))
+        self._activate(dept, self._activation_plan(dept.id, _normalized_emails([email])))
         self.db.commit()
+        _cache_for(self.db).clear()
         return True
 
+    def provision_users(self, emails: List[str], department: str) -> ProvisionResult:
+        """Make every one of `emails` an active user of `department` in one
+        transaction, or none of them.
+
+        The whole batch is checked against capacity under the department's lock
+        (like `reserve_licenses`); only users who'd newly take a seat there count.
+        On success `result.outcomes` says what happened to each (lowercased) email.
+        """
+        emails = _normalized_emails(emails)
+        if not emails:
+            return ProvisionResult(success=False, reason="No email addresses given")
+
+        with _locked_department(self.db, department) as row:
+            if row is None:
+                result = ProvisionResult(success=False, reason="Department not found")
+            else:
+                dept, active_users, held_seats = row
+                if active_users is None:
+                    active_users = _create_missing_counts(self.db, [dept.id])[dept.id]
+                plan = self._activation_plan(dept.id, emails)
+                needed = sum(outcome != "unchanged" for outcome, _, _ in plan.values())
+                available = dept.max_users - active_users - held_seats
+                if needed > available:
+                    result = ProvisionResult(
+                        success=False,
+                        reason=f"Insufficient licenses. Requested: {needed}, Available: {available}",
+                        requires_approval=True,
+                    )
+                else:
+                    self._activate(dept, plan)
+                    result = ProvisionResult(
+                        success=True,
+                        license_type=dept.license.name,
+                        available_licenses=available - needed,
+                        outcomes={email: outcome for email, (outcome, _, _) in plan.items()},
+                    )
+        _cache_for(self.db).clear()
+        return result
+
+    def _activation_plan(self, department_id: int, emails: List[str]) -> Dict[str, tuple]:
+        """What making each of `emails` an active user of the department involves:
+        email -> (outcome, user id or None if new, department moved from or None)."""
+        existing = {}
+        for chunk in _chunks(emails):
+            rows = self.db.execute(
+                select(User.email, User.id, User.department_id, User.status).where(User.email.in_(chunk))
+            )
+            existing.update((email, (user_id, dept_id, status)) for email, user_id, dept_id, status in rows)
+
+        plan = {}
+        for email in emails:
+            if email not in existing:
+                plan[email] = ("created", None, None)
+                continue
+            user_id, dept_id, status = existing[email]
+            if status != "active":
+                plan[email] = ("reactivated", user_id, None)
+            elif dept_id != department_id:
+                plan[email] = ("moved", user_id, dept_id)
+            else:
+                plan[email] = ("unchanged", user_id, None)
+        return plan
+
+    def _activate(self, dept: Department, plan: Dict[str, tuple]) -> None:
+        """Apply an `_activation_plan` — one multi-row insert for new users, one
+        update per chunk of existing ones — and adjust the counters to match, in
+        the caller's transaction."""
+        new_users = [
+            {"email": email, "department_id": dept.id, "license_id": dept.license_id}
+            for email, (outcome, _, _) in plan.items() if outcome == "created"
+        ]
+        if new_users:
+            self.db.execute(insert(User), new_users)
+        user_ids = [user_id for _, user_id, _ in plan.values() if user_id is not None]
+        for chunk in _chunks(user_ids):
+            self.db.execute(
+                update(User)
+                .where(User.id.in_(chunk))
+                .values(status="active", department_id=dept.id, license_id=dept.license_id)
+            )
+
+        for moved_from, count in Counter(prev for _, _, prev in plan.values() if prev is not None).items():
+            self._adjust_count(moved_from, -count)
+        gained = sum(outcome != "unchanged" for outcome, _, _ in plan.values())
+        if gained:
+            self._adjust_count(dept.id, gained)
+
     def deactivate_user(self, email: str) -> bool:
-        user = self.db.query(User).filter(User.email == email, User.status == "active").first()
-        if user is None:
-            return False
-        user.status = "removed"
-        self.db.commit()
-        return True
+        return any(self.deactivate_users([email]).values())
+
+    def deactivate_users(self, emails: List[str]) -> Dict[str, bool]:
+        """Deactivate every active user among `emails` in one transaction; returns
+        lowercased email -> whether it was deactivated (False: no active user with it).
+
+        Frees capacity only, so like `release_reservation` it takes no department
+        lock. Each department's counter moves by the rows its conditional update
+        actually changed, so a concurrent deactivation of the same user can't
+        decrement it twice.
+        """
+        emails = _normalized_emails(emails)
+        by_department: Dict[int, List[int]] = {}
+        found = set()
+        for chunk in _chunks(emails):
+            rows = self.db.execute(
+                select(User.email, User.id, User.department_id).where(User.email.in_(chunk), User.status == "active")
+            )
+            for email, user_id, dept_id in rows:
+                found.add(email)
+                by_department.setdefault(dept_id, []).append(user_id)
+
+        for dept_id, user_ids in by_department.items():
+            removed = 0
+            for chunk in _chunks(user_ids):
+                removed += self.db.execute(
+                    update(User)
+                    .where(User.id.in_(chunk), User.status == "active")
+                    .values(status="removed")
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+            if removed:
+                self._adjust_count(dept_id, -removed)
+        if found:
+            self.db.commit()
+            _cache_for(self.db).clear()
+        return {email: email in found for email in emails}
 
     def get_site_status(self) -> SiteStatus:
-        departments = self.db.query(Department).all()
-        total_active_users = self.db.query(User).filter(User.status == "active").count()
+        return _cache_for(self.db).get("site", self._load_site_status)
+
+    def _load_site_status(self) -> SiteStatus:
+        rows = (
+            self.db.query(Department.id, Department.max_users, DepartmentUserCount.active_users)
+            .outerjoin(DepartmentUserCount, DepartmentUserCount.department_id == Department.id)
+            .all()
+        )
+        missing = [dept_id for dept_id, _, active in rows if active is None]
+        created = _create_missing_counts(self.db, missing) if missing else {}
         return SiteStatus(
-            total_departments=len(departments),
-            total_active_users=total_active_users,
-            total_capacity=sum(d.max_users for d in departments),
+            total_departments=len(rows),
+            total_active_users=sum(created[dept_id] if active is None else active for dept_id, _, active in rows),
+            total_capacity=sum(max_users for _, max_users, _ in rows),
         )
+
+
+def reconcile_department_user_counts(db: Session) -> List[UserCountDrift]:
+    """Compare every department's counter with a real count of its active users,
+    correct the ones that differ (creating any that are missing), and return what
+    was wrong. Each department is checked and corrected in its own transaction,
+    under `_locked_department`.
+
+    No concurrent increment can land between the recount and the overwrite. On
+    SQLite the department lock is the database write lock, so no other writer
+    commits until the correction has. On Postgres the department lock doesn't stop
+    `provision_user`, which only touches the counter row, so that row is locked
+    too, before counting: a provision that already adjusted it has committed (its
+    user is in the count), and one that hasn't waits for the lock and adds its
+    delta on top of the corrected value. A department with no counter row is
+    counted the way its first read would, with the same window: a user committed
+    after the count but before the new row is never added to it.
+    """
+    names = [name for (name,) in db.query(Department.name).order_by(Department.name)]
+    drift = []
+    for name in names:
+        with _locked_department(db, name) as locked:
+            if locked is None:  # deleted since the name was listed
+                continue
+            dept_id = locked[0].id
+            counted = db.execute(
+                select(DepartmentUserCount.active_users)
+                .where(DepartmentUserCount.department_id == dept_id)
+                .with_for_update()
+            ).scalar()
+            real = _active_user_counts(db, [dept_id]).get(dept_id, 0)
+            if counted == real:
+                continue
+            drift.append(UserCountDrift(department=name, counted=counted, actual=real))
+            if counted is None:
+                db.add(DepartmentUserCount(department_id=dept_id, active_users=real))
+            else:
+                db.execute(
+                    update(DepartmentUserCount).where(DepartmentUserCount.department_id == dept_id).values(active_users=real)
+                )
+    _cache_for(db).clear()
+    return drift
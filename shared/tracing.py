@@ -0,0 +1,255 @@
+"""Minimal distributed tracing: spans, W3C `traceparent` propagation between the
+orchestrator and the agents, and an OTLP/JSON file exporter.
+
+`span("name")` (or the `@traced("name")` decorator) times a block as a child of
+whatever span is current in this context. The orchestrator opens the root span and
+sends its context along with each agent call as a `traceparent` header, next to
+`X-Internal-Token`; `trace_requests(app)` picks it up on the agent side, so one
+ticket's spans across all four processes share a trace id. That trace id (and the
+current span id) is also stamped on every JSON log line — see logging_config.py.
+
+With TRACE_EXPORT_PATH set, each process appends its finished spans to that file as
+one OTLP/JSON `ExportTraceServiceRequest` per request handled — the format an
+OpenTelemetry Collector's file receiver, Jaeger, or `otel-desktop-viewer` import.
+Encoding and writing happen on a background thread behind a bounded queue, the way
+queued logging does it, so ending a span never waits on the disk from inside a
+request handler (or the event loop running it). Unset, spans are still created and
+propagated (logs stay correlated) but nothing is written. Kept in-house rather than
+pulling in the OpenTelemetry SDK: this is a handful of call sites, and a span is a
+contextvar and two clock reads.
+"""
+import atexit
+import functools
+import json
+import logging
+import queue
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, MutableMapping, Optional, Tuple
+
+from fastapi import FastAPI, Request
+
+from shared import config
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = "traceparent"
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+# OTLP span kinds / status codes.
+SPAN_KIND_INTERNAL, SPAN_KIND_SERVER, SPAN_KIND_CLIENT = 1, 2, 3
+_STATUS_OK, _STATUS_ERROR = 1, 2
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str]
+    kind: int
+    start_ns: int
+    # True for the first span this process opened for a trace — ending it flushes
+    # everything this process recorded for that trace.
+    local_root: bool
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    end_ns: Optional[int] = None
+    error: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_remote_parent: ContextVar[Optional[tuple]] = ContextVar("remote_parent", default=None)
+
+_service_name = "unknown_service"
+_buffer: Dict[str, List[Span]] = {}
+_buffer_lock = threading.Lock()
+
+EXPORT_QUEUE_MAX_TRACES = 10_000
+# (export path, a finished trace's spans), written by the exporter thread.
+_export_queue: "queue.Queue[Tuple[str, List[Span]]]" = queue.Queue(maxsize=EXPORT_QUEUE_MAX_TRACES)
+_exporter: Optional[threading.Thread] = None
+_dropped_traces = 0
+
+
+def configure_tracing(service_name: str) -> None:
+    """Name the spans this process exports (OTLP's `service.name`)."""
+    global _service_name
+    _service_name = service_name
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def inject(headers: MutableMapping[str, str]) -> MutableMapping[str, str]:
+    """Add the current span's `traceparent` to outgoing request headers."""
+    span = _current_span.get()
+    if span is not None:
+        headers[TRACEPARENT_HEADER] = span.traceparent
+    return headers
+
+
+@contextmanager
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes: Any) -> Iterator[Span]:
+    parent = _current_span.get()
+    remote = _remote_parent.get() if parent is None else None
+    if parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    elif remote is not None:
+        trace_id, parent_id = remote
+    else:
+        trace_id, parent_id = secrets.token_hex(16), None
+
+    current = Span(
+        name=name,
+        trace_id=trace_id,
+        span_id=secrets.token_hex(8),
+        parent_span_id=parent_id,
+        kind=kind,
+        start_ns=time.time_ns(),
+        local_root=parent is None,
+        attributes=dict(attributes),
+    )
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        _finish(current)
+
+
+def traced(name: str):
+    """Decorator form of `span` for a whole function."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def trace_requests(app: FastAPI) -> None:
+    """Run every request to `app` inside a server span, continuing the caller's trace
+    when it sent a valid `traceparent` header."""
+    @app.middleware("http")
+    async def _trace_request(request: Request, call_next):
+        match = _TRACEPARENT_RE.match(request.headers.get(TRACEPARENT_HEADER, ""))
+        token = _remote_parent.set(match.groups() if match else None)
+        try:
+            with span(f"{request.method} {request.url.path}", kind=SPAN_KIND_SERVER) as server_span:
+                response = await call_next(request)
+                server_span.set_attribute("http.status_code", response.status_code)
+                return response
+        finally:
+            _remote_parent.reset(token)
+
+
+def _finish(finished: Span) -> None:
+    global _exporter, _dropped_traces
+    path = config.TRACE_EXPORT_PATH
+    if not path:
+        return
+    with _buffer_lock:
+        spans = _buffer.setdefault(finished.trace_id, [])
+        spans.append(finished)
+        if not finished.local_root:
+            return
+        del _buffer[finished.trace_id]
+        if _exporter is None:
+            _exporter = threading.Thread(target=_export_spans, name="trace-exporter", daemon=True)
+            _exporter.start()
+        # A full queue means the disk can't keep up; dropping a trace beats
+        # stalling the request that finished it.
+        try:
+            _export_queue.put_nowait((path, spans))
+        except queue.Full:
+            _dropped_traces += 1
+
+
+def _export_spans() -> None:
+    """The exporter thread: writes each finished trace as one line — a complete
+    OTLP/JSON export request — taking whatever has queued up in one write."""
+    while True:
+        batch = [_export_queue.get()]
+        while True:
+            try:
+                batch.append(_export_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            lines: Dict[str, List[str]] = {}
+            for path, spans in batch:
+                lines.setdefault(path, []).append(json.dumps(_otlp_request(spans)) + "\n")
+            for path, path_lines in lines.items():
+                with open(path, "a", encoding="utf-8") as f:
+                    f.writelines(path_lines)
+        except Exception as e:  # the thread must outlive one bad batch
+            logger.warning("Exporting %d trace(s) failed: %s", len(batch), e)
+        finally:
+            for _ in batch:
+                _export_queue.task_done()
+
+
+@atexit.register
+def flush_traces() -> None:
+    """Wait until every trace finished so far has been written to its export file.
+    Runs at exit, so a process doesn't lose its last requests' spans."""
+    _export_queue.join()
+
+
+def dropped_traces() -> int:
+    """Traces not exported because the export queue was full; exported as
+    `traces_dropped_total` on each agent's /metrics."""
+    return _dropped_traces
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_request(spans: List[Span]) -> Dict[str, Any]:
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": _service_name}}]},
+        "scopeSpans": [{
+            "scope": {"name": "shared.tracing"},
+            "spans": [
+                {
+                    "traceId": s.trace_id,
+                    "spanId": s.span_id,
+                    **({"parentSpanId": s.parent_span_id} if s.parent_span_id else {}),
+                    "name": s.name,
+                    "kind": s.kind,
+                    "startTimeUnixNano": str(s.start_ns),
+                    "endTimeUnixNano": str(s.end_ns),
+                    "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                    "status": (
+                        {"code": _STATUS_ERROR, "message": s.error} if s.error else {"code": _STATUS_OK}
+                    ),
+                }
+                for s in spans
+            ],
+        }],
+    }]}
@@ -0,0 +1,49 @@
+from dataclasses import dataclass
+from typing import List
+
+from sqlalchemy.orm import Session
+
+from shared.db.models import Department, User
+
+
+@dataclass(frozen=True)
+class DirectoryUser:
+    email: str
+    department: str
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+    """The smallest string greater than every string starting with `prefix`, in
+    bytewise order."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def search_users(db: Session, prefix: str = "", limit: int = 20) -> List[DirectoryUser]:
+    """Up to `limit` active users whose email starts with `prefix` (case-insensitive:
+    shared/tableau_service.py lowercases every email it writes, so the prefix is
+    lowercased to match), in email order, each with their department name.
+
+    One query, joined to the department, and reading only the matching slice of an
+    email index rather than every user. That makes it fast enough to run on every
+    keystroke of a typeahead, however many users there are. An empty prefix returns
+    the first `limit` users.
+    """
+    prefix = prefix.strip().lower()
+    query = (
+        db.query(User.email, Department.name)
+        .join(Department, Department.id == User.department_id)
+        .filter(User.status == "active")
+    )
+    if prefix:
+        if db.get_bind().dialect.name == "postgresql":
+            # Postgres compares emails in the database's collation, which its unique
+            # index on `email` is ordered by and which can't serve a LIKE prefix; the
+            # text_pattern_ops index on users.email can.
+            pattern = prefix.replace("/", "//").replace("%", "/%").replace("_", "/_") + "%"
+            query = query.filter(User.email.like(pattern, escape="/"))
+        else:
+            # SQLite compares (and indexes) text bytewise, so a prefix is a contiguous
+            # range of the unique index on `email`.
+            query = query.filter(User.email >= prefix, User.email < _prefix_upper_bound(prefix))
+    rows = query.order_by(User.email).limit(limit).all()
+    return [DirectoryUser(email=email, department=department) for email, department in rows]
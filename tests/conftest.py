@@ -1,8 +1,11 @@
+from contextlib import contextmanager
+
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
+from shared import memo
 from shared.db.base import Base
 from shared.db.models import Department, KBArticle, License, User
 
@@ -41,6 +44,15 @@ DEPARTMENTS = {
 }
 
 
+@pytest.fixture(autouse=True)
+def _fresh_memos():
+    """Memoized intents/classifications (shared/memo.py) outlive a test otherwise,
+    and a later test's LLM stub would never be asked."""
+    memo.clear_all()
+    yield
+    memo.clear_all()
+
+
 @pytest.fixture()
 def db_session():
     """A fresh, empty, in-memory SQLite database with the full schema applied.
@@ -64,6 +76,47 @@ def db_session():
         session.close()
 
 
+class SQLRecorder:
+    """Captures every statement the engine sends to the database while `recording()`
+    is active, as (sql, parameters) pairs — lets tests inspect what a repository
+    function actually ran rather than a hand-copied version of its query.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    @contextmanager
+    def recording(self):
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        try:
+            yield self.statements
+        finally:
+            event.remove(self.engine, "before_cursor_execute", self._record)
+
+    @contextmanager
+    def assert_max_queries(self, limit):
+        """Fails if the block sends more than `limit` statements to the database —
+        pins a code path's round-trip budget so a stray extra lookup shows up as a
+        test failure rather than as latency in production.
+        """
+        with self.recording() as statements:
+            yield statements
+        assert len(statements) <= limit, (
+            f"expected at most {limit} queries, got {len(statements)}:\n"
+            + "\n".join(sql for sql, _ in statements)
+        )
+
+
+@pytest.fixture()
+def sql_recorder(db_session):
+    return SQLRecorder(db_session.get_bind())
+
+
 @pytest.fixture()
 def seeded_db(db_session):
     """db_session, populated with the departments/users/KB articles tests rely on."""
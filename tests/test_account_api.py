@@ -5,14 +5,15 @@ from fastapi.testclient import TestClient
 
 from agents.account_agent.main import app
 from shared import config
-from shared.db.models import TicketEvent
+from shared.db.models import Escalation, LicenseReservation, TicketEvent
 from shared.db.session import get_db
+from shared.tableau_service import reconcile_department_user_counts
 
 
-def _ticket_payload(subject, description, department="Trading"):
+def _ticket_payload(subject, description, department="Trading", ticket_id="T001"):
     return {
         "ticket": {
-            "ticket_id": "T001",
+            "ticket_id": ticket_id,
             "user_email": "user@fintechanalytics.com",
             "department": department,
             "subject": subject,
@@ -47,6 +48,26 @@ def test_handle_ticket_approves_when_capacity_available(client):
     assert body["escalated"] is False
 
 
+def test_approved_request_then_named_users_are_provisioned(client, seeded_db):
+    # Trading has 50 free seats. Asking for 30 must not hold them against the
+    # follow-up ticket that names the 30 users.
+    first = client.post(
+        "/handle_ticket", json=_ticket_payload("Add users", "Please add 30 new users to Trading."),
+    ).json()
+    assert "Access Request Approved" in first["response"]["content"]
+    assert seeded_db.query(LicenseReservation).count() == 0
+
+    emails = " ".join(f"new.analyst{i}@fintechanalytics.com" for i in range(30))
+    second = client.post(
+        "/handle_ticket",
+        json=_ticket_payload("Add users", f"Please add these users to Trading: {emails}", ticket_id="T002"),
+    ).json()
+
+    assert "Users Provisioned" in second["response"]["content"]
+    assert second["escalated"] is False
+    assert seeded_db.query(Escalation).count() == 0
+
+
 def test_handle_ticket_requires_approval_over_capacity(client):
     response = client.post(
         "/handle_ticket",
@@ -73,6 +94,21 @@ def test_handle_ticket_records_method_and_intent(client, seeded_db):
     assert event.payload["intent"] == "add_users"
 
 
+def test_handle_ticket_query_budget(client, seeded_db, sql_recorder):
+    # Steady state: the department's user counter already exists (seed_db creates
+    # them; otherwise the first read counts and stores it).
+    reconcile_department_user_counts(seeded_db)
+    # Ticket lookup + insert, department (with its license, active-user counter and
+    # held seats), event, resolution update — record_resolution reuses the
+    # already-loaded ticket — plus the ticket and handling-time rollup upserts at commit.
+    with sql_recorder.assert_max_queries(7):
+        response = client.post(
+            "/handle_ticket",
+            json=_ticket_payload("Add user", "Please add 2 new users to Trading."),
+        )
+    assert response.status_code == 200
+
+
 def test_handle_ticket_requires_token_when_configured(client, monkeypatch):
     monkeypatch.setattr(config, "INTERNAL_API_TOKEN", "secret123")
     response = client.post(
@@ -1,6 +1,15 @@
+import json
+from pathlib import Path
+
+import pytest
+
 from agents.account_agent.account_manager import AccountManager
-from agents.account_agent.intent import AccountIntent, extract_intent
-from shared.tableau_service import SimulatedTableauBackend
+from agents.account_agent.intent import AccountIntent, extract_intent, extract_intents_batch, match_rules
+from shared import config
+from shared.db.models import Department, DepartmentUserCount, User
+from shared.tableau_service import SimulatedTableauBackend, UserCountDrift, reconcile_department_user_counts
+
+LABELED_INTENTS = Path(__file__).resolve().parent.parent / "data" / "account_intents_labeled.json"
 
 
 def test_check_capacity_success(seeded_db):
@@ -39,6 +48,60 @@ def test_extract_intent_remove_user_with_email():
     assert intent.target_emails == ["jane.doe@fintechanalytics.com"]
 
 
+@pytest.mark.parametrize("text, action, count", [
+    ("Please update my email address", None, 1),
+    ("We need twenty-five additional Creator seats", "add_users", 25),
+    ("Disable five accounts in Marketing", "remove_user", 5),
+    ("Set up two NEW USERS", "add_users", 2),
+    ("Please add trading12@fintechanalytics.com", "add_users", 1),
+    ("Remove a.1@fintechanalytics.com and b.2@fintechanalytics.com", "remove_user", 2),
+    ("The accessory dock is broken", None, 1),
+])
+def test_rules_match_whole_words_and_number_words(text, action, count):
+    matched_action, matched_count, _ = match_rules(text)
+    assert (matched_action, matched_count) == (action, count)
+
+
+def _wrong_actions(path):
+    # A ticket the rules can't place goes on to the LLM; one they place wrongly
+    # gets the wrong reply (or a needless escalation).
+    labeled = json.loads(path.read_text())
+    return [row["text"] for row in labeled if match_rules(row["text"])[0] not in (row["action"], None)]
+
+
+def test_rules_still_place_the_labeled_set_they_were_written_against():
+    # A regression check only: the rules were tuned on this set, so passing it says
+    # nothing about accuracy on tickets they haven't seen (benchmarks/intents.py
+    # reports that, on the held-out set).
+    assert _wrong_actions(LABELED_INTENTS) == []
+
+
+@pytest.mark.parametrize("text, action, count", [
+    ("Please add the 2024 Q3 report to our workspace", None, 1),
+    ("Please add a filter for region to the sales dashboard", None, 1),
+    ("Can you remove the duplicate rows from the extract?", None, 1),
+    ("Please disable the email subscription for the daily report", None, 1),
+    ("Re ticket 4521: please add 3 users to Risk", "add_users", 3),
+    ("Please add zero users", "add_users", 1),
+    ("Please add 0 users", "add_users", 1),
+    ("The account for omar.3@fintechanalytics.com should be disabled", "remove_user", 1),
+])
+def test_account_keywords_need_an_account_noun_and_counts_sit_next_to_one(text, action, count):
+    # A keyword that isn't about an account goes to the LLM rather than being
+    # guessed; years and ticket numbers are never a count, and neither is zero.
+    matched_action, matched_count, _ = match_rules(text)
+    assert (matched_action, matched_count) == (action, count)
+
+
+def test_extract_intents_batch_matches_single_extraction():
+    texts = ["Please add 2 new users", "Remove x@fintechanalytics.com", "Please add 2 new users"]
+
+    results = extract_intents_batch(texts)
+
+    assert [(intent, method) for intent, method in results] == [extract_intent(text) for text in texts]
+    assert results[0][0] is results[2][0]
+
+
 def test_extract_intent_unclear_falls_back_to_rules_when_llm_unavailable():
     # No OPENROUTER_API_KEY is configured in the test environment.
     intent, method = extract_intent("Something strange is happening with my account setup.")
@@ -119,3 +182,188 @@ def test_deactivate_user_frees_capacity(seeded_db):
 def test_deactivate_unknown_user_returns_false(seeded_db):
     backend = SimulatedTableauBackend(seeded_db)
     assert backend.deactivate_user("nobody@fintechanalytics.com") is False
+
+
+def _counter(db, department):
+    dept = db.query(Department).filter(Department.name == department).one()
+    row = db.get(DepartmentUserCount, dept.id)
+    return None if row is None else row.active_users
+
+
+def test_user_counters_follow_provisioning_moves_and_deactivation(seeded_db):
+    backend = SimulatedTableauBackend(seeded_db)
+    reconcile_department_user_counts(seeded_db)
+
+    backend.provision_user("mover@fintechanalytics.com", "Trading")
+    assert (_counter(seeded_db, "Trading"), _counter(seeded_db, "Finance")) == (851, 650)
+
+    backend.provision_user("mover@fintechanalytics.com", "Finance")  # moves departments
+    assert (_counter(seeded_db, "Trading"), _counter(seeded_db, "Finance")) == (850, 651)
+
+    backend.provision_user("mover@fintechanalytics.com", "Finance")  # already active there
+    assert _counter(seeded_db, "Finance") == 651
+
+    backend.deactivate_user("mover@fintechanalytics.com")
+    backend.provision_user("mover@fintechanalytics.com", "Finance")  # reactivated
+    assert _counter(seeded_db, "Finance") == 651
+    assert reconcile_department_user_counts(seeded_db) == []
+
+
+def test_missing_counter_is_counted_on_first_read(seeded_db):
+    assert _counter(seeded_db, "Trading") is None
+    assert SimulatedTableauBackend(seeded_db).get_department("Trading").current_users == 850
+    assert _counter(seeded_db, "Trading") == 850
+
+
+def test_department_reads_are_cached_until_a_write(seeded_db, sql_recorder):
+    backend = SimulatedTableauBackend(seeded_db)
+    backend.get_department("Trading")
+    backend.get_site_status()
+
+    with sql_recorder.assert_max_queries(0):
+        assert backend.get_department("Trading").current_users == 850
+        assert backend.check_capacity("Trading", 10).success is True
+        assert backend.get_site_status().total_active_users == 1500
+
+    backend.provision_user("new.hire@fintechanalytics.com", "Trading")
+    assert backend.get_department("Trading").current_users == 851
+    assert backend.get_site_status().total_active_users == 1501
+
+
+def test_department_cache_can_be_disabled(seeded_db, sql_recorder, monkeypatch):
+    monkeypatch.setattr(config, "DEPARTMENT_CACHE_TTL_SECONDS", 0)
+    backend = SimulatedTableauBackend(seeded_db)
+    backend.get_department("Trading")
+
+    with sql_recorder.recording() as statements:
+        backend.get_department("Trading")
+    assert len(statements) == 1
+
+
+def test_site_status_sums_department_counters(seeded_db):
+    status = SimulatedTableauBackend(seeded_db).get_site_status()
+    assert (status.total_departments, status.total_active_users, status.total_capacity) == (2, 1500, 1600)
+
+
+def test_reconcile_reports_and_repairs_drift(seeded_db):
+    reconcile_department_user_counts(seeded_db)
+    trading = seeded_db.query(Department).filter(Department.name == "Trading").one()
+    seeded_db.get(DepartmentUserCount, trading.id).active_users = 900  # out-of-band edit
+    seeded_db.query(User).filter(User.email == "finance0@fintechanalytics.com").update({"status": "removed"})
+    seeded_db.commit()
+
+    assert reconcile_department_user_counts(seeded_db) == [
+        UserCountDrift(department="Finance", counted=650, actual=649),
+        UserCountDrift(department="Trading", counted=900, actual=850),
+    ]
+    assert (_counter(seeded_db, "Trading"), _counter(seeded_db, "Finance")) == (850, 649)
+    assert SimulatedTableauBackend(seeded_db).get_department("Finance").current_users == 649
+    assert reconcile_department_user_counts(seeded_db) == []
+
+
+def test_provision_users_applies_a_mixed_batch(seeded_db):
+    backend = SimulatedTableauBackend(seeded_db)
+    reconcile_department_user_counts(seeded_db)
+    backend.deactivate_user("trading1@fintechanalytics.com")
+
+    result = backend.provision_users([
+        "new.hire@fintechanalytics.com",
+        "trading1@fintechanalytics.com",
+        "finance0@fintechanalytics.com",
+        "trading0@fintechanalytics.com",
+        "new.hire@fintechanalytics.com",
+    ], "Trading")
+
+    assert result.success is True
+    assert result.outcomes == {
+        "new.hire@fintechanalytics.com": "created",
+        "trading1@fintechanalytics.com": "reactivated",
+        "finance0@fintechanalytics.com": "moved",
+        "trading0@fintechanalytics.com": "unchanged",
+    }
+    assert result.available_licenses == 48
+    assert (_counter(seeded_db, "Trading"), _counter(seeded_db, "Finance")) == (852, 649)
+    assert reconcile_department_user_counts(seeded_db) == []
+
+
+def test_provision_users_over_capacity_changes_nothing(seeded_db):
+    backend = SimulatedTableauBackend(seeded_db)
+    emails = [f"desk{i}@fintechanalytics.com" for i in range(51)]
+
+    result = backend.provision_users(emails, "Trading")
+
+    assert result.success is False
+    assert result.requires_approval is True
+    assert "Requested: 51, Available: 50" in result.reason
+    assert seeded_db.query(User).filter(User.email.in_(emails)).count() == 0
+    assert backend.provision_users(emails[:50], "Trading").success is True
+    assert backend.get_department("Trading").current_users == 900
+
+
+def test_provision_users_is_a_fixed_number_of_queries(seeded_db, sql_recorder):
+    reconcile_department_user_counts(seeded_db)
+    backend = SimulatedTableauBackend(seeded_db)
+    emails = [f"desk{i}@fintechanalytics.com" for i in range(40)] + [f"finance{i}@fintechanalytics.com" for i in range(5)]
+
+    # Lock, department, user lookup, user insert, user update, two counter updates.
+    with sql_recorder.assert_max_queries(7):
+        assert backend.provision_users(emails, "Trading").success is True
+
+
+def test_deactivate_users_reports_each_email(seeded_db):
+    backend = SimulatedTableauBackend(seeded_db)
+    reconcile_department_user_counts(seeded_db)
+
+    removed = backend.deactivate_users([
+        "trading0@fintechanalytics.com", "finance0@fintechanalytics.com", "nobody@fintechanalytics.com",
+    ])
+
+    assert removed == {
+        "trading0@fintechanalytics.com": True,
+        "finance0@fintechanalytics.com": True,
+        "nobody@fintechanalytics.com": False,
+    }
+    assert (_counter(seeded_db, "Trading"), _counter(seeded_db, "Finance")) == (849, 649)
+    assert backend.deactivate_users(["trading0@fintechanalytics.com"]) == {"trading0@fintechanalytics.com": False}
+
+
+def test_bulk_operations_store_and_match_emails_in_lowercase(seeded_db):
+    backend = SimulatedTableauBackend(seeded_db)
+
+    result = backend.provision_users(["Jane.Doe@FinTechAnalytics.com", "TRADING0@fintechanalytics.com"], "Trading")
+
+    assert result.outcomes == {
+        "jane.doe@fintechanalytics.com": "created", "trading0@fintechanalytics.com": "unchanged",
+    }
+    assert seeded_db.query(User.email).filter(User.email.ilike("jane.doe%")).scalar() == "jane.doe@fintechanalytics.com"
+    assert backend.provision_users(["jane.doe@fintechanalytics.com"], "Trading").outcomes == {
+        "jane.doe@fintechanalytics.com": "unchanged",
+    }
+    assert backend.deactivate_users(["JANE.DOE@fintechanalytics.com"]) == {"jane.doe@fintechanalytics.com": True}
+    assert backend.deactivate_user("Trading1@FinTechAnalytics.com") is True
+
+
+def test_add_users_request_naming_emails_provisions_them(seeded_db):
+    manager = AccountManager(SimulatedTableauBackend(seeded_db))
+    intent, _ = extract_intent(
+        "Please add jane.doe@fintechanalytics.com and trading3@fintechanalytics.com to Trading"
+    )
+
+    response = manager.build_response(intent, "Trading")
+
+    assert "Users Provisioned" in response
+    assert "- jane.doe@fintechanalytics.com: account created" in response
+    assert "- trading3@fintechanalytics.com: already active" in response
+
+
+def test_remove_request_deactivates_every_email(seeded_db):
+    manager = AccountManager(SimulatedTableauBackend(seeded_db))
+    intent, _ = extract_intent(
+        "Please remove trading0@fintechanalytics.com, trading1@fintechanalytics.com and gone@fintechanalytics.com"
+    )
+
+    response = manager.build_response(intent, "Trading")
+
+    assert "Users Removed" in response
+    assert "2 user(s) deactivated" in response
+    assert "- gone@fintechanalytics.com: no active user found" in response
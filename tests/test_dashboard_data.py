@@ -0,0 +1,77 @@
+import threading
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from demo import dashboard_data as dashboard_data_module
+from demo.dashboard_data import DashboardData, PeriodicSnapshot
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for a background refresh"
+        time.sleep(0.005)
+
+
+def test_snapshot_reloads_in_the_background_and_on_request():
+    loads = []
+    snapshot = PeriodicSnapshot("test", lambda: loads.append(1) or len(loads), interval=60)
+    assert snapshot.latest is None
+
+    snapshot.start()
+    try:
+        _wait_for(lambda: snapshot.latest is not None)
+        assert snapshot.latest.value == 1
+        assert snapshot.latest.age_seconds() < 5
+
+        snapshot.refresh()  # long before the 60 s interval
+        _wait_for(lambda: snapshot.latest.value == 2)
+    finally:
+        snapshot.stop()
+
+
+def test_a_failed_reload_keeps_the_last_snapshot():
+    fail = threading.Event()
+    loads = []
+
+    def load():
+        loads.append(1)
+        if fail.is_set():
+            raise ConnectionError("database is down")
+        return "ok"
+
+    snapshot = PeriodicSnapshot("test", load, interval=60)
+    snapshot.start()
+    try:
+        _wait_for(lambda: snapshot.latest is not None)
+        fail.set()
+        snapshot.refresh()
+        _wait_for(lambda: snapshot.error is not None)
+
+        assert snapshot.latest.value == "ok"
+        assert snapshot.error == "database is down"
+
+        fail.clear()
+        snapshot.refresh()
+        _wait_for(lambda: snapshot.error is None)
+        assert len(loads) == 3
+    finally:
+        snapshot.stop()
+
+
+def test_dashboard_data_snapshots_metrics_and_agent_health(seeded_db, monkeypatch):
+    monkeypatch.setattr(dashboard_data_module, "_agent_is_online", lambda url: url.endswith(":8001"))
+    data = DashboardData(
+        session_factory=sessionmaker(bind=seeded_db.get_bind()),
+        endpoints={"router": "http://localhost:8001", "account": "http://localhost:8003"},
+    ).start()
+    try:
+        _wait_for(lambda: data.metrics.latest is not None and data.health.latest is not None)
+    finally:
+        data.stop()
+
+    metrics = data.metrics.latest.value
+    assert (metrics.site.total_departments, metrics.site.total_active_users) == (2, 1500)
+    assert metrics.tickets.total_tickets == 0
+    assert data.health.latest.value == {"Router Agent": True, "Account Agent": False}
@@ -0,0 +1,129 @@
+from datetime import datetime
+
+import pytest
+
+from agents.technical_agent.resolution_cache import find_cached_resolution
+from shared.db.metrics import compute_llm_availability_windows
+from shared.db.models import Escalation, LLMCallLog, Ticket
+from shared.db.repository import get_or_create_ticket, record_escalation, record_event, record_resolution
+from shared.escalation_review import approve_escalation, count_pending_escalations, list_pending_escalations
+from shared.models import SupportTicket
+from shared.tableau_service import SimulatedTableauBackend
+from shared.user_directory import search_users
+
+# Query-plan audit for the hot paths: every statement a repository function actually
+# runs is re-run under EXPLAIN QUERY PLAN, and the test fails if any of them reads a
+# table front to back. SQLite's planner has no table statistics until ANALYZE runs, so
+# its index choice doesn't depend on row counts — a plan checked against the small
+# seeded database here is the plan a large one would get.
+
+
+def _full_scans(db, statements):
+    scans = []
+    for sql, parameters in statements:
+        rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parameters).all()
+        for row in rows:
+            detail = row[-1]
+            # "SCAN users USING COVERING INDEX ..." still walks an index, not the table;
+            # "SCAN n CONSTANT ROWS" is a multi-row VALUES list (the rollup upserts).
+            if detail.startswith("SCAN ") and " USING " not in detail and not detail.endswith(" CONSTANT ROWS"):
+                scans.append(f"{detail}  <-  {sql}")
+    return scans
+
+
+def _seed_escalated_ticket(db, ticket_id="T001"):
+    ticket = SupportTicket(
+        ticket_id=ticket_id,
+        user_email="trading0@fintechanalytics.com",
+        department="Trading",
+        subject="Dashboard timeout",
+        description="The dashboard keeps timing out.",
+        created_at=datetime.now(),
+    )
+    get_or_create_ticket(db, ticket, assigned_agent="technical_agent")
+    record_event(db, ticket_id, "technical_agent", "response", {"content": "draft"})
+    record_resolution(db, ticket_id, "Draft response.", escalated=True)
+    record_escalation(db, ticket_id, "technical_agent", "Needs review", "escalation_queue")
+    db.commit()
+    return ticket
+
+
+@pytest.fixture()
+def escalated_db(seeded_db):
+    _seed_escalated_ticket(seeded_db)
+    return seeded_db
+
+
+def test_ticket_lookups_use_primary_key(escalated_db, sql_recorder):
+    ticket = SupportTicket(
+        ticket_id="T001", user_email="x@fintechanalytics.com", department="Trading",
+        subject="s", description="d", created_at=datetime.now(),
+    )
+    with sql_recorder.recording() as statements:
+        get_or_create_ticket(escalated_db, ticket)
+        record_resolution(escalated_db, "T001", "done", escalated=False)
+        escalated_db.flush()
+    assert statements
+    assert _full_scans(escalated_db, statements) == []
+
+
+def test_resolution_cache_uses_subject_index(escalated_db, sql_recorder):
+    with sql_recorder.recording() as statements:
+        find_cached_resolution(escalated_db, "Dashboard timeout")
+    assert _full_scans(escalated_db, statements) == []
+
+
+def test_ticket_events_lookup_uses_ticket_id_index(escalated_db, sql_recorder):
+    escalated_db.expire_all()
+    ticket = escalated_db.get(Ticket, "T001")
+    with sql_recorder.recording() as statements:
+        assert len(ticket.events) == 1
+    assert _full_scans(escalated_db, statements) == []
+
+
+def test_department_capacity_count_uses_index(seeded_db, sql_recorder):
+    backend = SimulatedTableauBackend(seeded_db)
+    with sql_recorder.recording() as statements:
+        backend.get_department("Trading")
+        backend.check_capacity("Finance", 5)
+    assert _full_scans(seeded_db, statements) == []
+
+
+def test_user_provisioning_uses_email_index(seeded_db, sql_recorder):
+    backend = SimulatedTableauBackend(seeded_db)
+    with sql_recorder.recording() as statements:
+        backend.provision_user("new.hire@fintechanalytics.com", "Trading")
+        backend.deactivate_user("trading1@fintechanalytics.com")
+    assert _full_scans(seeded_db, statements) == []
+
+
+def test_user_search_reads_a_range_of_the_email_index(seeded_db, sql_recorder):
+    with sql_recorder.recording() as statements:
+        search_users(seeded_db, "trading1")
+        search_users(seeded_db)
+    assert _full_scans(seeded_db, statements) == []
+
+
+def test_escalation_review_uses_resolved_created_at_index(escalated_db, sql_recorder):
+    with sql_recorder.recording() as statements:
+        pending = list_pending_escalations(escalated_db)
+        list_pending_escalations(escalated_db, limit=50, after_id=pending[0].escalation_id)
+        list_pending_escalations(escalated_db, limit=50, created_before=datetime.now())
+        count_pending_escalations(escalated_db)
+        count_pending_escalations(escalated_db, created_before=datetime.now())
+    assert _full_scans(escalated_db, statements) == []
+
+    escalation_id = pending[0].escalation_id
+    with sql_recorder.recording() as statements:
+        approve_escalation(escalated_db, escalation_id, "Final response.")
+    assert _full_scans(escalated_db, statements) == []
+    assert escalated_db.get(Escalation, escalation_id).resolved is True
+
+
+def test_llm_availability_windows_use_created_at_index(db_session, sql_recorder):
+    db_session.add_all([LLMCallLog(model="m1", success=i % 2 == 0, reason="success") for i in range(20)])
+    db_session.commit()
+    with sql_recorder.recording() as statements:
+        compute_llm_availability_windows(db_session)
+    assert statements
+    assert _full_scans(db_session, statements) == []
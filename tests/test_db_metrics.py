@@ -1,11 +1,35 @@
-from datetime import timedelta
+from datetime import datetime, timedelta
 
-from shared.db.metrics import compute_llm_availability, compute_ticket_metrics
-from shared.db.models import LLMCallLog, Ticket, utcnow
+import pytest
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, create_engine, inspect
 
+from shared import config
 
-def _ticket(ticket_id, department, priority, status, escalated, resolved_after_seconds=None):
-    created_at = utcnow()
+from shared.db.metrics import (
+    compute_llm_availability,
+    compute_llm_availability_windows,
+    compute_ticket_metrics,
+    handling_time_percentiles,
+)
+from shared.db.models import HandlingTimeRollup, LLMCallLog, LLMCallRollup, Ticket, TicketRollup, utcnow
+from shared.db.repository import get_or_create_ticket, record_escalation, record_resolution
+from shared.db.rollups import (
+    ALL_TIME,
+    compact_llm_call_log,
+    compact_ticket_rollups,
+    day_bucket,
+    drop_outdated_rollup_tables,
+    hour_bucket,
+    month_bucket,
+    rebuild_rollups,
+)
+from shared.escalation_review import approve_escalation, list_pending_escalations
+from shared.llm_client import complete_json
+from shared.models import Priority, SupportTicket
+
+
+def _ticket(ticket_id, department, priority, status, escalated, resolved_after_seconds=None, age=timedelta(0)):
+    created_at = utcnow() - age
     resolved_at = (
         created_at + timedelta(seconds=resolved_after_seconds)
         if resolved_after_seconds is not None
@@ -40,6 +64,7 @@ def test_compute_ticket_metrics_aggregates_correctly(db_session):
         _ticket("T3", "Finance", "medium", "open", False),
     ])
     db_session.commit()
+    rebuild_rollups(db_session)
 
     metrics = compute_ticket_metrics(db_session)
 
@@ -49,7 +74,8 @@ def test_compute_ticket_metrics_aggregates_correctly(db_session):
     assert metrics.open == 1
     assert metrics.resolution_rate == 1 / 3
     assert metrics.escalation_rate == 1 / 3
-    assert metrics.median_handling_seconds == 20.0
+    # Read back from the rollups' log-scale histogram — approximate by design.
+    assert metrics.median_handling_seconds == pytest.approx(20.0, rel=0.01)
     assert metrics.tickets_by_department == {"Trading": 2, "Finance": 1}
     assert metrics.tickets_by_priority == {"critical": 1, "high": 1, "medium": 1}
 
@@ -70,6 +96,7 @@ def test_compute_llm_availability_aggregates_correctly(db_session):
         LLMCallLog(model="m1", success=False, reason="no_api_key"),
     ])
     db_session.commit()
+    rebuild_rollups(db_session)
 
     availability = compute_llm_availability(db_session)
 
@@ -77,3 +104,253 @@ def test_compute_llm_availability_aggregates_correctly(db_session):
     assert availability.successful == 2
     assert availability.availability_rate == 2 / 5
     assert availability.failures_by_reason == {"rate_limited": 2, "no_api_key": 1}
+
+
+def test_compute_ticket_metrics_median_with_odd_count(db_session):
+    db_session.add_all([
+        _ticket("T1", "Trading", "low", "resolved", False, resolved_after_seconds=50),
+        _ticket("T2", "Trading", "low", "resolved", False, resolved_after_seconds=5),
+        _ticket("T3", "Trading", "low", "resolved", False, resolved_after_seconds=12.5),
+    ])
+    db_session.commit()
+    rebuild_rollups(db_session)
+
+    assert compute_ticket_metrics(db_session).median_handling_seconds == pytest.approx(12.5, rel=0.01)
+
+
+def test_compute_ticket_metrics_never_reads_tickets_table(db_session, sql_recorder):
+    db_session.add_all([
+        _ticket(f"T{i}", "Trading", "high", "resolved", False, resolved_after_seconds=i) for i in range(50)
+    ])
+    db_session.commit()
+    rebuild_rollups(db_session)
+
+    # Totals, per-department, per-priority and the handling-time histogram — a fixed
+    # number of small grouped queries over the rollups, however many tickets exist.
+    with sql_recorder.assert_max_queries(4) as statements:
+        compute_ticket_metrics(db_session)
+    assert not any("FROM tickets" in sql for sql, _ in statements)
+
+
+def test_handling_time_percentiles_per_group(db_session):
+    db_session.add_all(
+        [_ticket(f"A{i}", "Trading", "high", "resolved", False, resolved_after_seconds=i + 1) for i in range(100)]
+        + [_ticket(f"B{i}", "Finance", "low", "resolved", False, resolved_after_seconds=1000 * (i + 1)) for i in range(10)]
+        + [_ticket("C0", "Finance", "low", "open", False)]
+    )
+    db_session.commit()
+    rebuild_rollups(db_session)
+
+    by_department = handling_time_percentiles(db_session)
+    assert set(by_department) == {"Finance", "Trading"}
+    trading = by_department["Trading"]
+    assert trading.count == 100
+    assert trading.p50 == pytest.approx(50.5, rel=0.01)
+    assert trading.p90 == pytest.approx(90.1, rel=0.01)
+    assert trading.p99 == pytest.approx(99.01, rel=0.01)
+    assert by_department["Finance"].count == 10
+    assert by_department["Finance"].p90 == pytest.approx(9100, rel=0.01)
+
+    assert set(handling_time_percentiles(db_session, window=timedelta(hours=1))) == {"Finance", "Trading"}
+    overall = handling_time_percentiles(db_session, group_by=None)
+    assert list(overall) == ["all"] and overall["all"].count == 110
+    with pytest.raises(ValueError):
+        handling_time_percentiles(db_session, group_by="priority")
+
+
+def test_handling_time_bins_are_kept_per_bucket_and_department_only(db_session):
+    priorities = ["critical", "high", "medium", "low"]
+    db_session.add_all([
+        _ticket(f"T{i}", "Trading", priorities[i % 4], "resolved", False, resolved_after_seconds=[10, 60][i % 2])
+        for i in range(40)
+    ])
+    db_session.commit()
+    rebuild_rollups(db_session)
+
+    # Two handling times, in one department: two bins per bucket, whatever the priorities.
+    buckets = {row.bucket_start for row in db_session.query(HandlingTimeRollup)}
+    assert db_session.query(HandlingTimeRollup).count() == 2 * len(buckets)
+    assert handling_time_percentiles(db_session)["Trading"].count == 40
+
+
+def _support_ticket(ticket_id, department="Trading", priority=Priority.HIGH):
+    return SupportTicket(
+        ticket_id=ticket_id, user_email="user@fintechanalytics.com", department=department,
+        subject="subject", description="description", priority=priority, created_at=datetime.now(),
+    )
+
+
+def test_rollups_maintained_incrementally_match_a_full_rebuild(db_session):
+    for i, department in enumerate(["Trading", "Trading", "Finance", "Finance"]):
+        get_or_create_ticket(db_session, _support_ticket(f"T{i}", department), assigned_agent="technical_agent")
+    record_resolution(db_session, "T0", "fixed", escalated=False)
+    record_resolution(db_session, "T1", "draft", escalated=True)
+    record_escalation(db_session, "T1", "technical_agent", "needs review", "escalation_queue")
+    record_resolution(db_session, "T2", "fixed", escalated=False)
+    db_session.commit()
+    approve_escalation(db_session, list_pending_escalations(db_session)[0].escalation_id, "approved")
+    complete_json("fake-model", "system", "user", LLMCallLog, db=db_session)  # no API key: logs a failure
+    db_session.commit()
+
+    incremental = compute_ticket_metrics(db_session)
+    incremental_llm = compute_llm_availability(db_session)
+    assert incremental.total_tickets == 4
+    assert incremental.resolved == 3
+    assert incremental.escalated == 1
+    assert incremental.open == 1
+    assert incremental.tickets_by_department == {"Trading": 2, "Finance": 2}
+    assert incremental_llm.failures_by_reason == {"no_api_key": 1}
+
+    rebuild_rollups(db_session)
+    assert compute_ticket_metrics(db_session) == incremental
+    assert compute_llm_availability(db_session) == incremental_llm
+
+
+def test_rolled_back_changes_never_reach_the_rollups(db_session):
+    get_or_create_ticket(db_session, _support_ticket("T1"))
+    db_session.rollback()
+    db_session.commit()
+
+    assert db_session.query(TicketRollup).count() == 0
+    assert compute_ticket_metrics(db_session).total_tickets == 0
+
+
+def test_compute_ticket_metrics_respects_window(db_session):
+    db_session.add_all([
+        _ticket("T1", "Trading", "high", "resolved", False, resolved_after_seconds=10),
+        _ticket("T2", "Finance", "low", "resolved", False, resolved_after_seconds=500, age=timedelta(days=3)),
+    ])
+    db_session.commit()
+    rebuild_rollups(db_session)
+
+    recent = compute_ticket_metrics(db_session, window=timedelta(hours=24))
+    assert recent.total_tickets == 1
+    assert recent.tickets_by_department == {"Trading": 1}
+    assert recent.median_handling_seconds == pytest.approx(10.0, rel=0.01)
+
+    assert compute_ticket_metrics(db_session).total_tickets == 2
+
+
+def _llm_calls(db, *calls):
+    now = utcnow()
+    db.add_all([
+        LLMCallLog(model="m1", success=success, reason=reason, created_at=now - age) for age, success, reason in calls
+    ])
+    db.commit()
+    rebuild_rollups(db)
+
+
+def test_llm_availability_windows_are_exact(db_session):
+    _llm_calls(
+        db_session,
+        (timedelta(minutes=1), True, "success"),
+        (timedelta(minutes=2), False, "rate_limited"),
+        (timedelta(minutes=30), True, "success"),
+        (timedelta(hours=3), False, "api_error"),
+        (timedelta(days=3), False, "api_error"),
+    )
+
+    windows = compute_llm_availability_windows(db_session)
+    five_minutes, hour, day = windows.values()
+    assert (five_minutes.total_calls, five_minutes.successful) == (2, 1)
+    assert five_minutes.failures_by_reason == {"rate_limited": 1}
+    assert (hour.total_calls, hour.successful) == (3, 2)
+    assert day.total_calls == 4
+    assert day.failures_by_reason == {"rate_limited": 1, "api_error": 1}
+
+    # Sub-hour windows come from the raw log, not the hourly rollups.
+    assert compute_llm_availability(db_session, window=timedelta(minutes=5)) == five_minutes
+    assert compute_llm_availability(db_session).total_calls == 5
+
+
+def test_compact_llm_call_log_keeps_history_in_rollups(db_session):
+    _llm_calls(
+        db_session,
+        (timedelta(minutes=1), True, "success"),
+        (timedelta(days=10), False, "rate_limited"),
+        (timedelta(days=20), True, "success"),
+    )
+    before = compute_llm_availability(db_session)
+
+    assert compact_llm_call_log(db_session, timedelta(days=7), batch_size=1) == 2
+    assert db_session.query(LLMCallLog).count() == 1
+    assert compute_llm_availability(db_session) == before
+    assert compute_llm_availability(db_session, window=timedelta(days=30)) == before
+    assert compute_llm_availability(db_session, window=timedelta(hours=1)).total_calls == 1
+
+    # A rebuild only recounts what the raw log still covers.
+    rebuild_rollups(db_session)
+    assert compute_llm_availability(db_session) == before
+    assert compact_llm_call_log(db_session, timedelta(days=7)) == 0
+    assert db_session.query(LLMCallRollup).count() == 3
+
+
+def _aged_tickets(db):
+    ages = [timedelta(minutes=5), timedelta(hours=3), timedelta(days=3), timedelta(days=3, hours=2),
+            timedelta(days=60), timedelta(days=61), timedelta(days=62)]
+    db.add_all([
+        _ticket(f"T{i}", "Trading", "high", "resolved", False, resolved_after_seconds=10 * (i + 1), age=age)
+        for i, age in enumerate(ages)
+    ])
+    db.commit()
+    return [utcnow() - age for age in ages]
+
+
+def test_ticket_rollups_coarsen_with_age(db_session):
+    created = _aged_tickets(db_session)
+    rebuild_rollups(db_session)
+
+    buckets = {row.bucket_start for row in db_session.query(TicketRollup)}
+    # The last day hourly, the week before daily, then monthly; and all time.
+    assert buckets == {hour_bucket(created[0]), hour_bucket(created[1])} | {
+        day_bucket(moment) for moment in created[2:4]
+    } | {month_bucket(moment) for moment in created[4:]} | {ALL_TIME}
+    assert {row.bucket_start for row in db_session.query(HandlingTimeRollup)} == buckets
+
+    assert compute_ticket_metrics(db_session, window=timedelta(hours=12)).total_tickets == 2
+    # Rounded out to the whole day the window starts in.
+    since = day_bucket(utcnow() - timedelta(days=3, hours=1))
+    assert compute_ticket_metrics(db_session, window=timedelta(days=3, hours=1)).total_tickets == sum(
+        moment >= since for moment in created
+    )
+    assert compute_ticket_metrics(db_session).total_tickets == 7
+    # The all-time bucket agrees with summing every dated one.
+    assert compute_ticket_metrics(db_session, window=timedelta(days=3650)) == compute_ticket_metrics(db_session)
+
+
+def test_compact_ticket_rollups_folds_aged_buckets(db_session, monkeypatch):
+    _aged_tickets(db_session)
+    monkeypatch.setattr(config, "ROLLUP_HOURLY_DAYS", 365)  # as if written back then: all hourly
+    rebuild_rollups(db_session)
+    ten_years = timedelta(days=3650)
+    hourly = compute_ticket_metrics(db_session, window=ten_years)
+    assert db_session.query(TicketRollup).count() == 7 + 1
+    monkeypatch.setattr(config, "ROLLUP_HOURLY_DAYS", 1)
+
+    assert compact_ticket_rollups(db_session) > 0
+    assert db_session.query(TicketRollup).count() < 7 + 1
+    assert compute_ticket_metrics(db_session, window=ten_years) == hourly
+    compacted = {row.bucket_start for row in db_session.query(TicketRollup)}
+    assert compact_ticket_rollups(db_session) == 0
+
+    rebuild_rollups(db_session)
+    assert {row.bucket_start for row in db_session.query(TicketRollup)} == compacted
+    assert compute_ticket_metrics(db_session, window=ten_years) == hourly
+
+
+def test_outdated_rollup_tables_are_dropped_for_a_rebuild(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    old = MetaData()
+    Table(
+        "ticket_rollups", old,
+        *(Column(name, String(50), primary_key=True) for name in ("department", "priority", "agent")),
+        Column("bucket_start", DateTime, primary_key=True), Column("created", Integer),
+    )
+    old.create_all(engine)
+
+    drop_outdated_rollup_tables(engine)
+    assert not inspect(engine).has_table("ticket_rollups")
+
+    TicketRollup.__table__.create(engine)
+    drop_outdated_rollup_tables(engine)
+    assert inspect(engine).has_table("ticket_rollups")
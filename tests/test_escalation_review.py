@@ -1,25 +1,32 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import pytest
 
-from shared.db.models import Escalation, Ticket, TicketEvent
+from shared.db.models import Escalation, Ticket, TicketEvent, utcnow
 from shared.db.repository import get_or_create_ticket, record_escalation, record_resolution
-from shared.escalation_review import approve_escalation, list_pending_escalations, reject_escalation
+from shared.escalation_review import (
+    approve_escalation,
+    approve_escalations,
+    count_pending_escalations,
+    list_pending_escalations,
+    reject_escalation,
+    reject_escalations,
+)
 from shared.models import SupportTicket
 
 
-def _seed_escalated_ticket(db_session, ticket_id="T001"):
+def _seed_escalated_ticket(db_session, ticket_id="T001", department="Trading", queue_name="escalation_queue"):
     ticket = SupportTicket(
         ticket_id=ticket_id,
         user_email="user@fintechanalytics.com",
-        department="Trading",
+        department=department,
         subject="Dashboard timeout",
         description="The dashboard keeps timing out.",
         created_at=datetime.now(),
     )
     get_or_create_ticket(db_session, ticket, assigned_agent="technical_agent")
     record_resolution(db_session, ticket_id, "Draft response from the agent.", escalated=True)
-    record_escalation(db_session, ticket_id, "technical_agent", "Needs specialist review", "escalation_queue")
+    record_escalation(db_session, ticket_id, "technical_agent", "Needs specialist review", queue_name)
     db_session.commit()
     return ticket_id
 
@@ -44,6 +51,64 @@ def test_list_pending_escalations_excludes_resolved(db_session):
     assert list_pending_escalations(db_session) == []
 
 
+def test_list_pending_escalations_is_a_single_query(db_session, sql_recorder):
+    for i in range(5):
+        _seed_escalated_ticket(db_session, ticket_id=f"T{i:03d}")
+    db_session.expire_all()
+
+    with sql_recorder.assert_max_queries(1):
+        pending = list_pending_escalations(db_session)
+        assert [p.subject for p in pending] == ["Dashboard timeout"] * 5
+
+
+def test_list_pending_escalations_pages_by_keyset(db_session):
+    for i in range(5):
+        _seed_escalated_ticket(db_session, ticket_id=f"T{i:03d}")
+
+    first = list_pending_escalations(db_session, limit=2)
+    second = list_pending_escalations(db_session, limit=2, after_id=first[-1].escalation_id)
+    rest = list_pending_escalations(db_session, after_id=second[-1].escalation_id)
+
+    assert [p.ticket_id for p in first + second + rest] == ["T000", "T001", "T002", "T003", "T004"]
+
+
+def test_list_and_count_pending_escalations_filter_by_queue_and_department(db_session):
+    _seed_escalated_ticket(db_session, ticket_id="T001", department="Trading")
+    _seed_escalated_ticket(db_session, ticket_id="T002", department="Finance")
+    _seed_escalated_ticket(
+        db_session, ticket_id="T003", department="Finance", queue_name="manager_approval_queue"
+    )
+
+    finance = list_pending_escalations(db_session, department="Finance")
+    assert [p.ticket_id for p in finance] == ["T002", "T003"]
+    approvals = list_pending_escalations(db_session, queue_name="manager_approval_queue")
+    assert [p.ticket_id for p in approvals] == ["T003"]
+
+    assert count_pending_escalations(db_session) == 3
+    assert count_pending_escalations(db_session, department="Finance") == 2
+    assert count_pending_escalations(db_session, queue_name="manager_approval_queue") == 1
+    assert count_pending_escalations(db_session, queue_name="escalation_queue", department="Trading") == 1
+
+
+def test_list_and_count_pending_escalations_filter_by_age(db_session):
+    for i in range(3):
+        _seed_escalated_ticket(db_session, ticket_id=f"T{i:03d}")
+    old, new = (
+        db_session.query(Escalation).filter(Escalation.ticket_id == ticket_id).one() for ticket_id in ("T000", "T002")
+    )
+    old.created_at -= timedelta(days=2)
+    new.created_at += timedelta(hours=1)
+    db_session.commit()
+    day_ago = utcnow() - timedelta(days=1)
+
+    assert [p.ticket_id for p in list_pending_escalations(db_session, created_before=day_ago)] == ["T000"]
+    assert [p.ticket_id for p in list_pending_escalations(db_session, created_before=new.created_at)] == [
+        "T000", "T001",
+    ]
+    assert count_pending_escalations(db_session, created_before=day_ago) == 1
+    assert count_pending_escalations(db_session, created_before=new.created_at, department="Trading") == 2
+
+
 def test_approve_escalation_resolves_ticket_with_given_text(db_session):
     ticket_id = _seed_escalated_ticket(db_session)
     escalation = db_session.query(Escalation).filter(Escalation.ticket_id == ticket_id).first()
@@ -103,3 +168,75 @@ def test_approve_unknown_escalation_raises(db_session):
 def test_reject_unknown_escalation_raises(db_session):
     with pytest.raises(ValueError):
         reject_escalation(db_session, 9999, "note")
+
+
+def test_approve_escalation_query_budget(db_session, sql_recorder):
+    ticket_id = _seed_escalated_ticket(db_session)
+    escalation_id = db_session.query(Escalation).filter(Escalation.ticket_id == ticket_id).first().id
+    db_session.expire_all()
+
+    # One SELECT for the escalation and its ticket's state, then writes only: the
+    # ticket is updated by primary key, and the dashboard rollups (state counters and
+    # the handling-time bin) move with it.
+    with sql_recorder.assert_max_queries(6):
+        approve_escalation(db_session, escalation_id, "Final approved response.")
+
+
+def test_approve_escalations_applies_whole_batch(db_session):
+    for i in range(3):
+        _seed_escalated_ticket(db_session, ticket_id=f"T{i:03d}")
+    pending = list_pending_escalations(db_session)
+
+    approve_escalations(
+        db_session,
+        [(p.escalation_id, f"Outage resolved ({p.ticket_id}).") for p in pending],
+        reviewer="manager@fintechanalytics.com",
+    )
+
+    assert list_pending_escalations(db_session) == []
+    for i in range(3):
+        ticket = db_session.get(Ticket, f"T{i:03d}")
+        assert ticket.status == "resolved"
+        assert ticket.resolution == f"Outage resolved (T{i:03d})."
+        assert ticket.escalated is True
+
+    events = db_session.query(TicketEvent).filter(TicketEvent.action == "human_review").all()
+    assert len(events) == 3
+    assert {e.agent for e in events} == {"manager@fintechanalytics.com"}
+    assert all(e.payload["decision"] == "approved" for e in events)
+
+
+def test_reject_escalations_applies_whole_batch(db_session):
+    for i in range(3):
+        _seed_escalated_ticket(db_session, ticket_id=f"T{i:03d}")
+    ids = [p.escalation_id for p in list_pending_escalations(db_session)]
+
+    reject_escalations(db_session, ids, "Handled manually.")
+
+    assert list_pending_escalations(db_session) == []
+    assert all(db_session.get(Ticket, f"T{i:03d}").status == "escalated" for i in range(3))
+    events = db_session.query(TicketEvent).filter(TicketEvent.action == "human_review").all()
+    assert [e.payload for e in events] == [{"decision": "rejected", "note": "Handled manually."}] * 3
+
+
+def test_bulk_review_with_unknown_id_writes_nothing(db_session):
+    _seed_escalated_ticket(db_session)
+    escalation_id = list_pending_escalations(db_session)[0].escalation_id
+
+    with pytest.raises(ValueError):
+        approve_escalations(db_session, [(escalation_id, "text"), (9999, "text")])
+    with pytest.raises(ValueError):
+        reject_escalations(db_session, [escalation_id, 9999], "note")
+
+    assert count_pending_escalations(db_session) == 1
+
+
+def test_bulk_review_query_count_does_not_grow_with_batch(db_session, sql_recorder):
+    for i in range(20):
+        _seed_escalated_ticket(db_session, ticket_id=f"T{i:03d}")
+    ids = [p.escalation_id for p in list_pending_escalations(db_session)]
+
+    with sql_recorder.assert_max_queries(6):
+        approve_escalations(db_session, [(escalation_id, "Fixed.") for escalation_id in ids[:10]])
+    with sql_recorder.assert_max_queries(3):
+        reject_escalations(db_session, ids[10:], "Handled manually.")
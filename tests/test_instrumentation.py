@@ -0,0 +1,80 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from agents.router_agent.main import app
+from shared.db.session import get_db
+from shared.instrumentation import _LiveCollector
+from shared.message_queue import MessageQueueError
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.fixture()
+def client(db_session):
+    app.dependency_overrides[get_db] = lambda: db_session
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_metrics_endpoint_exposes_request_and_decision_histograms(client):
+    requests_before = _sample(
+        "agent_request_duration_seconds_count", agent="router_agent", route="/route_ticket", status="200"
+    )
+    decisions_before = _sample("agent_decision_duration_seconds_count", agent="router_agent", method="rules")
+
+    response = client.post("/route_ticket", json={
+        "ticket_id": "T001",
+        "user_email": "trader@fintechanalytics.com",
+        "department": "Trading",
+        "subject": "Trading dashboard down",
+        "description": "Dashboard is not loading and showing a connection timeout.",
+        "created_at": datetime.now().isoformat(),
+        "messages": [],
+    })
+    assert response.status_code == 200
+
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert "# TYPE agent_request_duration_seconds histogram" in metrics.text
+    assert "# TYPE message_queue_length gauge" in metrics.text
+    assert _sample(
+        "agent_request_duration_seconds_count", agent="router_agent", route="/route_ticket", status="200"
+    ) == requests_before + 1
+    assert _sample("agent_decision_duration_seconds_count", agent="router_agent", method="rules") == decisions_before + 1
+
+
+def test_unknown_paths_share_one_route_label(client):
+    before = _sample("agent_request_duration_seconds_count", agent="router_agent", route="unmatched", status="404")
+    client.get("/no/such/path/123")
+    client.get("/no/such/path/456")
+    assert _sample(
+        "agent_request_duration_seconds_count", agent="router_agent", route="unmatched", status="404"
+    ) == before + 2
+
+
+class _FakeQueue:
+    def __init__(self, lengths):
+        self.lengths = lengths
+
+    def queue_length(self, queue_name):
+        if queue_name not in self.lengths:
+            raise MessageQueueError("Redis unreachable")
+        return self.lengths[queue_name]
+
+
+def test_live_collector_reports_queue_depth_at_scrape_time():
+    queue = _FakeQueue({"escalation_queue": 3})
+    collector = _LiveCollector(queue, ["escalation_queue", "manager_approval_queue"])
+
+    depth = next(metric for metric in collector.collect() if metric.name == "message_queue_length")
+    assert [(sample.labels, sample.value) for sample in depth.samples] == [({"queue": "escalation_queue"}, 3)]
+
+    queue.lengths["escalation_queue"] = 7
+    depth = next(metric for metric in collector.collect() if metric.name == "message_queue_length")
+    assert depth.samples[0].value == 7
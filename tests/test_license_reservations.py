@@ -0,0 +1,130 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from shared import config
+from shared.db.base import Base
+from shared.db.models import Department, DepartmentUserCount, License, LicenseReservation, User
+from shared.tableau_service import SimulatedTableauBackend
+
+
+def test_reservation_holds_seats_against_capacity(seeded_db):
+    backend = SimulatedTableauBackend(seeded_db)
+
+    result = backend.reserve_licenses("Trading", 30)
+
+    assert result.success is True
+    assert result.available_licenses == 20
+    assert (result.reservation.department, result.reservation.seats) == ("Trading", 30)
+    assert backend.get_department("Trading").reserved_users == 30
+    assert backend.check_capacity("Trading", 21).success is False
+    over = backend.reserve_licenses("Trading", 21)
+    assert over.success is False
+    assert over.requires_approval is True
+    assert "Available: 20" in over.reason
+
+
+def test_reserve_unknown_department_or_no_seats(seeded_db):
+    backend = SimulatedTableauBackend(seeded_db)
+    assert "not found" in backend.reserve_licenses("Unknown Dept", 1).reason.lower()
+    assert backend.reserve_licenses("Trading", 0).success is False
+
+
+def test_committing_a_reservation_provisions_its_users(seeded_db):
+    backend = SimulatedTableauBackend(seeded_db)
+    reservation = backend.reserve_licenses("Trading", 2).reservation
+    emails = ["new.one@fintechanalytics.com", "new.two@fintechanalytics.com"]
+
+    assert backend.commit_reservation(reservation.id, emails) is True
+
+    dept = backend.get_department("Trading")
+    assert (dept.current_users, dept.reserved_users) == (852, 0)
+    assert seeded_db.query(User).filter(User.email.in_(emails), User.status == "active").count() == 2
+    assert backend.commit_reservation(reservation.id, emails) is False  # already committed
+    assert backend.release_reservation(reservation.id) is False
+
+
+def test_commit_rejects_more_users_than_reserved(seeded_db):
+    backend = SimulatedTableauBackend(seeded_db)
+    reservation = backend.reserve_licenses("Trading", 1).reservation
+
+    assert backend.commit_reservation(reservation.id, ["a@fintechanalytics.com", "b@fintechanalytics.com"]) is False
+    assert backend.get_department("Trading").current_users == 850
+    assert backend.commit_reservation("no-such-reservation", ["a@fintechanalytics.com"]) is False
+
+
+def test_released_reservation_frees_its_seats(seeded_db):
+    backend = SimulatedTableauBackend(seeded_db)
+    reservation = backend.reserve_licenses("Trading", 50).reservation
+    assert backend.check_capacity("Trading", 1).success is False
+
+    assert backend.release_reservation(reservation.id) is True
+
+    assert backend.check_capacity("Trading", 50).success is True
+    assert backend.release_reservation(reservation.id) is False
+    assert backend.commit_reservation(reservation.id, ["late@fintechanalytics.com"]) is False
+
+
+def test_expired_reservation_stops_holding_seats(seeded_db, monkeypatch):
+    backend = SimulatedTableauBackend(seeded_db)
+    monkeypatch.setattr(config, "LICENSE_RESERVATION_TTL_MINUTES", -1)
+    reservation = backend.reserve_licenses("Trading", 50).reservation
+
+    assert backend.get_department("Trading").reserved_users == 0
+    assert backend.reserve_licenses("Trading", 50).success is True
+    assert backend.commit_reservation(reservation.id, ["late@fintechanalytics.com"]) is False
+
+
+def test_sqlite_reservation_takes_the_write_lock_before_reading(seeded_db, sql_recorder):
+    with sql_recorder.recording() as statements:
+        SimulatedTableauBackend(seeded_db).reserve_licenses("Trading", 1)
+    assert statements[0][0].startswith("UPDATE departments SET max_users=departments.max_users")
+
+
+def _file_database(path, max_users, active_users):
+    """A file-backed SQLite database with one department, opened by two engines with
+    ordinary connection pools — two "processes" contending for the same rows."""
+    engines = [create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False}) for _ in range(2)]
+    Base.metadata.create_all(bind=engines[0])
+    with sessionmaker(bind=engines[0])() as db:
+        lic = License(name="Creator")
+        db.add(lic)
+        db.flush()
+        dept = Department(name="Quant", max_users=max_users, license_id=lic.id)
+        db.add(dept)
+        db.flush()
+        db.add_all(
+            User(email=f"quant{i}@fintechanalytics.com", department_id=dept.id, license_id=lic.id)
+            for i in range(active_users)
+        )
+        db.add(DepartmentUserCount(department_id=dept.id, active_users=active_users))
+        db.commit()
+    return engines
+
+
+def test_concurrent_reservations_never_overshoot_capacity(tmp_path):
+    engines = _file_database(tmp_path / "reservations.db", max_users=150, active_users=50)
+    sessions = [sessionmaker(bind=engine) for engine in engines]
+    local = threading.local()
+
+    def reserve(i):
+        if not hasattr(local, "backend"):
+            local.backend = SimulatedTableauBackend(sessions[i % 2]())
+        return local.backend.reserve_licenses("Quant", 1)
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(reserve, range(2000)))
+
+    granted = [r for r in results if r.success]
+    assert len(granted) == 100
+    assert all(r.requires_approval for r in results if not r.success)
+    with sessions[0]() as db:
+        assert db.query(func.sum(LicenseReservation.seats)).scalar() == 100
+        backend = SimulatedTableauBackend(db)
+        # Committing every hold fills the department exactly.
+        for n, result in enumerate(granted):
+            assert backend.commit_reservation(result.reservation.id, [f"hire{n}@fintechanalytics.com"])
+        assert db.query(User).filter(User.status == "active").count() == 150
+        assert backend.reserve_licenses("Quant", 1).success is False
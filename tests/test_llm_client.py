@@ -1,8 +1,10 @@
 import httpx
 from openai import APIConnectionError, RateLimitError
+from prometheus_client import REGISTRY
 from pydantic import BaseModel
 
 from shared.db.models import LLMCallLog
+from shared import llm_client
 from shared.llm_client import complete_json
 
 
@@ -141,3 +143,28 @@ def test_complete_json_without_db_does_not_raise():
     client = _FakeClient(['{"value": "hello"}'])
     result = complete_json("fake-model", "system", "user", _Schema, client=client)
     assert result == _Schema(value="hello")
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_complete_json_exports_latency_and_failure_metrics():
+    latency_before = _sample("llm_request_duration_seconds_count", model="metrics-model", outcome="rate_limited")
+    failures_before = _sample("llm_failures_total", model="metrics-model", reason="rate_limited")
+
+    complete_json("metrics-model", "system", "user", _Schema, client=_FakeClient([_rate_limit_error()]))
+    complete_json("metrics-model", "system", "user", _Schema, client=_FakeClient(['{"value": "ok"}']))
+
+    assert _sample("llm_request_duration_seconds_count", model="metrics-model", outcome="rate_limited") == latency_before + 1
+    assert _sample("llm_failures_total", model="metrics-model", reason="rate_limited") == failures_before + 1
+    assert _sample("llm_failures_total", model="metrics-model", reason="success") == 0
+    assert _sample("llm_request_duration_seconds_count", model="metrics-model", outcome="success") >= 1
+
+
+def test_default_client_uses_the_configured_base_url(monkeypatch):
+    monkeypatch.setattr(llm_client, "OPENROUTER_API_KEY", "stub")
+    monkeypatch.setattr(llm_client, "OPENROUTER_BASE_URL", "http://localhost:8090")
+    monkeypatch.setattr(llm_client, "_client", None)
+
+    assert str(llm_client._default_client().base_url).rstrip("/") == "http://localhost:8090"
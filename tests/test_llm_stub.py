@@ -0,0 +1,83 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from openai import OpenAI
+
+from agents.account_agent.intent import ACCOUNT_INTENT_SYSTEM_PROMPT, AccountIntent
+from agents.router_agent.router_logic import CLASSIFIER_SYSTEM_PROMPT, LLMClassification
+from agents.technical_agent.rag import TECH_AGENT_SYSTEM_PROMPT, AgentResponse
+from benchmarks.llm_stub import StubConfig, create_app
+from shared.db.models import LLMCallLog
+from shared.llm_client import complete_json
+
+
+def _stub(**config):
+    app = create_app(StubConfig(latency_ms=0, latency_distribution="fixed", **config))
+    http = TestClient(app)
+    # The real SDK against the stub, as shared/llm_client.py would use it via
+    # OPENROUTER_BASE_URL; no SDK-level retries, so each call is one request.
+    return http, OpenAI(base_url="http://testserver", api_key="stub", http_client=http, max_retries=0)
+
+
+@pytest.mark.parametrize("system, schema", [
+    (CLASSIFIER_SYSTEM_PROMPT, LLMClassification),
+    (ACCOUNT_INTENT_SYSTEM_PROMPT, AccountIntent),
+    (TECH_AGENT_SYSTEM_PROMPT, AgentResponse),
+])
+def test_canned_responses_validate_against_each_agents_schema(system, schema):
+    _, client = _stub()
+    assert isinstance(complete_json("stub-model", system, "ticket text", schema, client=client), schema)
+
+
+def test_injected_rate_limit_is_a_rate_limited_fallback(db_session):
+    http, client = _stub(rate_limit_rate=1)
+
+    assert complete_json("stub-model", CLASSIFIER_SYSTEM_PROMPT, "t", LLMClassification,
+                         client=client, db=db_session) is None
+    db_session.flush()
+    assert [row.reason for row in db_session.query(LLMCallLog)] == ["rate_limited"]
+    assert http.get("/stub/stats").json() == {"requests": 1, "rate_limited": 1}
+
+
+def test_injected_malformed_json_fails_validation_on_every_attempt(db_session):
+    http, client = _stub(malformed_rate=1)
+
+    assert complete_json("stub-model", CLASSIFIER_SYSTEM_PROMPT, "t", LLMClassification,
+                         client=client, db=db_session) is None
+    db_session.flush()
+    assert [row.reason for row in db_session.query(LLMCallLog)] == ["invalid_response"]
+    assert http.get("/stub/stats").json()["malformed"] == 2  # the first attempt and its retry
+
+
+def test_streamed_chunks_reassemble_into_the_canned_response():
+    _, client = _stub()
+    stream = client.chat.completions.create(
+        model="stub-model",
+        messages=[{"role": "system", "content": ACCOUNT_INTENT_SYSTEM_PROMPT}, {"role": "user", "content": "t"}],
+        stream=True,
+    )
+    chunks = list(stream)
+
+    content = "".join(chunk.choices[0].delta.content or "" for chunk in chunks)
+    assert AccountIntent.model_validate(json.loads(content)).action == "review_permissions"
+    assert chunks[-1].choices[0].finish_reason == "stop"
+
+
+def test_config_can_change_while_running():
+    http, _ = _stub()
+
+    assert http.put("/stub/config", json={"rate_limit_rate": 0.5}).json()["rate_limit_rate"] == 0.5
+    assert http.put("/stub/config", json={"rate_limit_rate": 2}).status_code == 422
+    assert http.put("/stub/config", json={"latency_distribution": "bimodal"}).status_code == 422
+
+
+def test_same_seed_gives_the_same_latency_and_failure_sequence():
+    def outcomes():
+        http, _ = _stub(rate_limit_rate=0.5, seed=7)
+        body = {"model": "m", "messages": [{"role": "user", "content": "t"}]}
+        return [http.post("/chat/completions", json=body).status_code for _ in range(20)]
+
+    first = outcomes()
+    assert first == outcomes()
+    assert {200, 429} == set(first)
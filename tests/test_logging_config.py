@@ -1,7 +1,23 @@
 import json
 import logging
+from datetime import datetime, timezone
 
-from shared.logging_config import JSONFormatter, set_ticket_id
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client.parser import text_string_to_metric_families
+
+from shared import logging_config
+from shared.instrumentation import instrument
+from shared.logging_config import (
+    InfoSampler,
+    JSONFormatter,
+    _log_context_var,
+    bind_log_context,
+    configure_logging,
+    set_agent,
+    set_ticket_id,
+)
+from shared.message_queue import MessageQueue
 
 
 def _make_record(message="hello"):
@@ -51,3 +67,104 @@ def test_json_formatter_supports_message_args():
     )
     payload = json.loads(formatter.format(record))
     assert payload["message"] == "failed for T1: boom"
+
+
+def test_json_formatter_timestamp_matches_isoformat_of_record_time():
+    formatter = JSONFormatter()
+    for created in (1_700_000_000.123456, 1_700_000_000.9, 1_700_000_001.000001):
+        record = _make_record()
+        record.created = created
+        expected = datetime.fromtimestamp(created, timezone.utc).isoformat(timespec="microseconds")
+        assert json.loads(formatter.format(record))["timestamp"] == expected
+
+
+def test_bound_context_fields_are_logged():
+    token = _log_context_var.set(None)
+    try:
+        bind_log_context(method="rules")
+        bind_log_context(latency_ms=12.5)
+        payload = json.loads(JSONFormatter().format(_make_record()))
+    finally:
+        _log_context_var.reset(token)
+    assert payload["method"] == "rules"
+    assert payload["latency_ms"] == 12.5
+
+
+def test_queued_logging_formats_off_thread_with_the_callers_context(capsys):
+    configure_logging(agent="test_agent", queued=True)
+    try:
+        set_ticket_id("T777")
+        logging.getLogger("test.queued").info("handled %s", "T777")
+        set_ticket_id(None)
+    finally:
+        logging_config._stop_listener()  # flushes the queue
+        configure_logging(queued=False)
+
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines() if "test.queued" in line]
+    assert len(lines) == 1
+    assert lines[0]["message"] == "handled T777"
+    assert lines[0]["ticket_id"] == "T777"
+    assert lines[0]["agent"] == "test_agent"
+
+
+def test_info_sampler_keeps_whole_tickets_and_every_warning():
+    sampler = InfoSampler(0.5)
+    warning = _make_record()
+    warning.levelno = logging.WARNING
+
+    kept = set()
+    for i in range(200):
+        set_ticket_id(f"T{i}")
+        decisions = {sampler.filter(_make_record()) for _ in range(3)}
+        assert len(decisions) == 1  # every line of one ticket gets the same decision
+        assert sampler.filter(warning)
+        if decisions == {True}:
+            kept.add(i)
+    set_ticket_id(None)
+    assert 60 < len(kept) < 140
+
+
+def _agent_app(agent):
+    app = FastAPI()
+    instrument(app, agent, MessageQueue())
+
+    @app.get("/work")
+    def work():
+        logging.getLogger("test.agents").info("working")
+        return {}
+
+    return app
+
+
+def test_each_agent_app_labels_its_own_lines_in_a_shared_process(capsys):
+    configure_logging(agent="imported_last", queued=False)
+    try:
+        for agent in ("alpha_agent", "beta_agent", "alpha_agent"):
+            TestClient(_agent_app(agent)).get("/work")
+        set_agent(None)
+        logging.getLogger("test.agents").info("outside any request")
+    finally:
+        configure_logging(queued=False)
+
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines() if "test.agents" in line]
+    assert [line["agent"] for line in lines] == ["alpha_agent", "beta_agent", "alpha_agent", "imported_last"]
+
+
+def test_dropped_log_lines_are_exported_as_a_metric(monkeypatch, capsys):
+    monkeypatch.setattr(logging_config, "QUEUE_MAX_RECORDS", 2)
+    configure_logging(queued=True)
+    try:
+        logging_config._stop_listener()  # nothing drains the queue now
+        for i in range(5):
+            logging.getLogger("test.dropped").warning("line %d", i)
+        assert logging_config.dropped_log_records() == 3
+        metrics = TestClient(_agent_app("gamma_agent")).get("/metrics").text
+    finally:
+        configure_logging(queued=False)
+
+    samples = {
+        sample.name: sample.value
+        for family in text_string_to_metric_families(metrics)
+        for sample in family.samples
+    }
+    assert samples["log_records_dropped_total"] >= 3  # the test client logs too
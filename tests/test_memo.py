@@ -0,0 +1,147 @@
+from datetime import datetime
+
+import pytest
+import redis
+from prometheus_client import REGISTRY
+
+from agents.account_agent import intent as intent_module
+from agents.account_agent.intent import AccountIntent, extract_intent
+from agents.router_agent import router_logic as router_logic_module
+from agents.router_agent.router_logic import LLMClassification, RouterLogic
+from shared import config
+from shared.memo import Memo
+from shared.models import SupportTicket
+
+
+def _lookups(memo, result):
+    return REGISTRY.get_sample_value("memo_lookups_total", {"memo": memo, "result": result}) or 0.0
+
+
+class FakeRedis:
+    """The get/set subset of redis.Redis the memo's shared tier uses."""
+
+    def __init__(self, fail=False):
+        self.values = {}
+        self.fail = fail
+        self.calls = 0
+
+    def get(self, key):
+        self.calls += 1
+        if self.fail:
+            raise redis.ConnectionError("Connection refused")
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.calls += 1
+        if self.fail:
+            raise redis.ConnectionError("Connection refused")
+        self.values[key] = value
+
+
+def _memoize(memo, key, value, cacheable=True):
+    return memo.get_or_compute(key, lambda: (value, cacheable), dump=lambda v: v, load=lambda v: v)
+
+
+def test_memo_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(config, "MEMO_SIZE", 2)
+    memo = Memo("test_lru")
+    _memoize(memo, "a", 1)
+    _memoize(memo, "b", 2)
+    _memoize(memo, "a", None)  # a hit: "a" is now the most recently used
+    _memoize(memo, "c", 3)
+
+    assert len(memo) == 2
+    assert _memoize(memo, "a", "recomputed") == 1
+    assert _memoize(memo, "b", "recomputed") == "recomputed"
+
+
+def test_uncacheable_results_are_returned_but_not_stored():
+    memo = Memo("test_uncacheable")
+    assert _memoize(memo, "a", "fallback", cacheable=False) == "fallback"
+    assert _memoize(memo, "a", "real") == "real"
+
+
+def test_memo_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(config, "MEMO_SIZE", 0)
+    memo = Memo("test_disabled")
+    _memoize(memo, "a", 1)
+    assert _memoize(memo, "a", 2) == 2
+    assert len(memo) == 0
+
+
+def test_redis_tier_shares_results_between_processes():
+    shared = FakeRedis()
+    first, second = Memo("test_shared", redis_client=shared), Memo("test_shared", redis_client=shared)
+    before = _lookups("test_shared", "redis_hit")
+
+    _memoize(first, "a", {"answer": 42})
+
+    assert _memoize(second, "a", "recomputed") == {"answer": 42}
+    assert _lookups("test_shared", "redis_hit") == before + 1
+    assert _memoize(second, "a", "recomputed") == {"answer": 42}  # now in its local tier
+    assert Memo("test_shared", version=2, redis_client=shared).get_or_compute(
+        "a", lambda: ("new code", True), dump=lambda v: v, load=lambda v: v
+    ) == "new code"
+
+
+def test_unreachable_redis_is_a_miss_and_is_not_retried_per_lookup():
+    down = FakeRedis(fail=True)
+    memo = Memo("test_redis_down", redis_client=down)
+
+    assert _memoize(memo, "a", 1) == 1
+    assert _memoize(memo, "b", 2) == 2
+    assert down.calls == 1
+
+
+def test_duplicate_account_tickets_ask_the_llm_once(monkeypatch):
+    calls = []
+
+    def fake_complete_json(model, system, user, schema, **kwargs):
+        calls.append(user)
+        return AccountIntent(action="review_permissions", reasoning="asked about their setup")
+
+    monkeypatch.setattr(intent_module, "complete_json", fake_complete_json)
+    hits_before = _lookups("extract_intent", "hit")
+
+    first, method = extract_intent("Something is odd with my Tableau setup")
+    first.target_emails.append("mutated@fintechanalytics.com")
+    second, _ = extract_intent("Something is odd with   my Tableau setup\n")
+
+    assert method == "llm"
+    assert len(calls) == 1
+    assert second.action == "review_permissions"
+    assert second.target_emails == []  # a fresh object, not the one the first caller changed
+    assert _lookups("extract_intent", "hit") == hits_before + 1
+
+
+def test_llm_unavailable_fallback_is_not_memoized(monkeypatch):
+    calls = []
+    monkeypatch.setattr(intent_module, "complete_json", lambda *args, **kwargs: calls.append(1))
+
+    assert extract_intent("Something is odd with my Tableau setup")[0].action == "unclear"
+    extract_intent("Something is odd with my Tableau setup")
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("department, calls_expected", [("Marketing", 1), ("Trading", 2)])
+def test_duplicate_tickets_are_classified_once_per_department(monkeypatch, department, calls_expected):
+    calls = []
+
+    def fake_complete_json(model, system, user, schema, **kwargs):
+        calls.append(user)
+        return LLMClassification(category="training", priority="low", confidence=0.9)
+
+    monkeypatch.setattr(router_logic_module, "complete_json", fake_complete_json)
+    router = RouterLogic()
+
+    def ticket(dept):
+        return SupportTicket(
+            ticket_id="T001", user_email="user@fintechanalytics.com", department=dept,
+            subject="Weird phrasing", description="Something is off with my setup.", created_at=datetime.now(),
+        )
+
+    first = router.classify(ticket("Marketing"))
+    second = router.classify(ticket(department))
+
+    assert (first.method, second.method) == ("llm", "llm")
+    assert len(calls) == calls_expected
@@ -44,6 +44,7 @@ def test_route_ticket_classifies_and_routes(client, db_session):
     assert body["assigned_agent"] == "technical_agent"
     assert body["category"] == "technical"
     assert body["priority"] == "critical"
+    assert body["method"] == "rules"
 
     db_ticket = db_session.query(Ticket).filter(Ticket.ticket_id == "T001").first()
     assert db_ticket is not None
@@ -55,6 +56,13 @@ def test_route_ticket_classifies_and_routes(client, db_session):
     assert events[0].action == "classification"
 
 
+def test_route_ticket_query_budget(client, sql_recorder):
+    # Ticket lookup, ticket insert, classification event insert, dashboard rollup upsert.
+    with sql_recorder.assert_max_queries(4):
+        response = client.post("/route_ticket", json=_ticket())
+    assert response.status_code == 200
+
+
 def test_route_ticket_requires_token_when_configured(client, monkeypatch):
     monkeypatch.setattr(config, "INTERNAL_API_TOKEN", "secret123")
     response = client.post("/route_ticket", json=_ticket())
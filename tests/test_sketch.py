@@ -0,0 +1,64 @@
+import random
+import statistics
+
+import pytest
+
+from shared.db.sketch import DDSketch
+
+
+def _exact_quantile(values, q):
+    ordered = sorted(values)
+    rank = q * (len(ordered) - 1)
+    lower = ordered[int(rank)]
+    upper = ordered[min(int(rank) + 1, len(ordered) - 1)]
+    return lower + (upper - lower) * (rank - int(rank))
+
+
+def test_empty_sketch_has_no_quantiles():
+    sketch = DDSketch()
+    assert sketch.count == 0
+    assert sketch.quantile(0.5) is None
+
+
+@pytest.mark.parametrize("q", [0.0, 0.5, 0.9, 0.99, 1.0])
+def test_quantiles_within_relative_accuracy(q):
+    rng = random.Random(7)
+    values = [rng.lognormvariate(3, 2) for _ in range(5000)]
+    sketch = DDSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+
+    assert sketch.count == len(values)
+    assert sketch.quantile(q) == pytest.approx(_exact_quantile(values, q), rel=0.02)
+
+
+def test_median_interpolates_like_statistics_median():
+    sketch = DDSketch()
+    for value in (10, 30):
+        sketch.add(value)
+    assert sketch.quantile(0.5) == pytest.approx(statistics.median([10, 30]), rel=0.01)
+
+
+def test_merge_equals_sketching_everything_at_once():
+    rng = random.Random(3)
+    values = [rng.expovariate(1 / 30) for _ in range(2000)]
+    combined, left, right = DDSketch(), DDSketch(), DDSketch()
+    for i, value in enumerate(values):
+        combined.add(value)
+        (left if i % 2 else right).add(value)
+
+    left.merge(right)
+
+    assert left.bins == combined.bins
+
+
+def test_merge_rejects_a_different_accuracy():
+    with pytest.raises(ValueError):
+        DDSketch(0.01).merge(DDSketch(0.05))
+
+
+def test_values_below_min_value_share_its_bin():
+    sketch = DDSketch(min_value=0.001)
+    sketch.add(0)
+    sketch.add(0.0001)
+    assert list(sketch.bins.values()) == [2]
@@ -0,0 +1,50 @@
+import time
+
+from shared.orchestrator import aggregate_timings
+from shared.stage_timing import _Breakdown, _breakdown, _queue_wait_seconds, stage, stage_timings
+
+
+def test_nested_stages_are_exclusive():
+    token = _breakdown.set(_Breakdown())
+    try:
+        with stage("classification"):
+            time.sleep(0.01)
+            with stage("llm"):
+                time.sleep(0.02)
+        timings = stage_timings()
+    finally:
+        _breakdown.reset(token)
+
+    assert 10 <= timings["classification"] < 20
+    assert timings["llm"] >= 20
+    assert timings["classification"] + timings["llm"] <= timings["total"]
+
+
+def test_stage_is_a_no_op_outside_a_request():
+    with stage("llm"):
+        pass
+    assert stage_timings() == {}
+
+
+def test_queue_wait_header_parsing():
+    now_us = time.time_ns() // 1000
+    assert 0.4 < _queue_wait_seconds(f"t={now_us - 500_000}") < 1
+    # A sender whose clock runs ahead never yields a negative wait.
+    assert _queue_wait_seconds(f"t={now_us + 5_000_000}") == 0
+    assert _queue_wait_seconds(None) is None
+    assert _queue_wait_seconds("t=soon") is None
+
+
+def test_aggregate_timings_sums_stages_across_agents():
+    timings = aggregate_timings(
+        [
+            ("router_agent", 30.0, {"queue_wait": 1.0, "classification": 5.0, "db_write": 4.0, "total": 20.0}),
+            ("technical_agent", 50.0, {"retrieval": 6.0, "llm": 10.0, "db_write": 3.0, "total": 45.0}),
+        ],
+        total_ms=90.0,
+    )
+
+    assert timings["total"] == 90.0
+    assert timings["stages"] == {"queue_wait": 1.0, "classification": 5.0, "db_write": 7.0, "retrieval": 6.0, "llm": 10.0}
+    assert timings["network"] == 15.0
+    assert timings["by_agent"]["technical_agent"]["round_trip"] == 50.0
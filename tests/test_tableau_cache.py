@@ -0,0 +1,171 @@
+import threading
+from collections import Counter
+
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.tableau_stub import StubConfig, TableauSite, create_app
+from shared.tableau_cache import CachingTableauBackend
+from shared.tableau_service import DepartmentInfo, ProvisionResult, SiteStatus
+
+
+class FakeBackend:
+    """A remote backend stand-in: counts reads, and can hold a read until released."""
+
+    def __init__(self):
+        self.departments = {"Finance": DepartmentInfo("Finance", 700, 650, "Explorer")}
+        self.calls = Counter()
+        self.release = threading.Event()
+        self.release.set()
+        self.fail = False
+
+    def get_department(self, name):
+        self.calls["get_department"] += 1
+        self.release.wait(5)
+        if self.fail:
+            raise ConnectionError("Tableau unreachable")
+        info = self.departments.get(name)
+        return None if info is None else DepartmentInfo(**vars(info))
+
+    def get_site_status(self):
+        self.calls["get_site_status"] += 1
+        return SiteStatus(len(self.departments), sum(d.current_users for d in self.departments.values()), 700)
+
+    def provision_user(self, email, department):
+        self.departments[department].current_users += 1
+        return True
+
+    def reserve_licenses(self, department, seats):
+        self.departments[department].reserved_users += seats
+        return ProvisionResult(success=True)
+
+
+@pytest.fixture
+def backend():
+    return FakeBackend()
+
+
+def _cache(backend, ttl=60, stale=0):
+    return CachingTableauBackend(backend, ttl_seconds=ttl, stale_seconds=stale)
+
+
+def test_reads_within_the_ttl_are_served_from_memory(backend):
+    with _cache(backend) as cache:
+        assert cache.get_department("Finance").current_users == 650
+        assert cache.check_capacity("Finance", 50).available_licenses == 50
+        assert cache.get_department("Nope") is None
+        assert cache.get_department("Nope") is None
+        cache.get_site_status()
+        cache.get_site_status()
+
+    assert backend.calls == {"get_department": 2, "get_site_status": 1}
+    assert cache.stats["hit"] == 3
+
+
+def test_writes_invalidate_what_they_change(backend):
+    with _cache(backend) as cache:
+        cache.get_department("Finance")
+        cache.get_site_status()
+
+        cache.provision_user("new@fintechanalytics.com", "Finance")
+        assert cache.get_department("Finance").current_users == 651
+        assert cache.get_site_status().total_active_users == 651
+
+        cache.reserve_licenses("Finance", 10)
+        assert cache.check_capacity("Finance", 39).success
+        assert not cache.check_capacity("Finance", 40).success
+
+    assert backend.calls == {"get_department": 3, "get_site_status": 2}
+
+
+def test_stale_entries_are_served_while_one_refresh_runs(backend):
+    with _cache(backend, ttl=0.1, stale=60) as cache:
+        assert cache.get_department("Finance").current_users == 650
+        backend.departments["Finance"].current_users = 660
+        backend.release.clear()
+        threading.Event().wait(0.15)
+
+        # Stale: answered from memory at once, with a single refresh started behind it.
+        assert cache.get_department("Finance").current_users == 650
+        assert cache.get_department("Finance").current_users == 650
+        backend.release.set()
+        while cache.get_department("Finance").current_users != 660:
+            threading.Event().wait(0.001)
+
+    assert backend.calls["get_department"] == 2
+    assert cache.stats["refresh"] == 1
+
+
+def test_concurrent_misses_share_one_load(backend):
+    backend.release.clear()
+    results = []
+    with _cache(backend) as cache:
+        readers = [threading.Thread(target=lambda: results.append(cache.get_department("Finance"))) for _ in range(8)]
+        for reader in readers:
+            reader.start()
+        while cache.stats["miss"] + cache.stats["joined"] < 8:
+            threading.Event().wait(0.001)
+        backend.release.set()
+        for reader in readers:
+            reader.join()
+
+    assert backend.calls["get_department"] == 1
+    assert [info.current_users for info in results] == [650] * 8
+
+
+def test_a_load_overtaken_by_a_write_is_not_stored(backend):
+    backend.release.clear()
+    with _cache(backend) as cache:
+        reader = threading.Thread(target=cache.get_department, args=("Finance",))
+        reader.start()
+        while not cache.stats["miss"]:
+            threading.Event().wait(0.001)
+        cache.provision_user("new@fintechanalytics.com", "Finance")
+        backend.release.set()
+        reader.join()
+
+        assert cache.get_department("Finance").current_users == 651
+    assert backend.calls["get_department"] == 2
+
+
+def test_failed_loads_raise_and_are_not_cached(backend):
+    backend.fail = True
+    with _cache(backend) as cache:
+        with pytest.raises(ConnectionError):
+            cache.get_department("Finance")
+        backend.fail = False
+        assert cache.get_department("Finance").current_users == 650
+
+
+def _signed_in(client):
+    credentials = client.post("/api/3.22/auth/signin", json={"credentials": {
+        "personalAccessTokenName": "test", "personalAccessTokenSecret": "secret",
+        "site": {"contentUrl": "fintechanalytics"},
+    }}).json()["credentials"]
+    client.headers["X-Tableau-Auth"] = credentials["token"]
+    return f"/api/3.22/sites/{credentials['site']['id']}"
+
+
+def test_tableau_stub_pages_group_members():
+    site = TableauSite.seeded({"Finance": {"current_users": 250, "license": "Explorer"}})
+    client = TestClient(create_app(StubConfig(latency_ms=0), site))
+    base = _signed_in(client)
+
+    groups = client.get(f"{base}/groups", params={"filter": "name:eq:Finance"}).json()
+    group = groups["groups"]["group"][0]
+    assert group["minimumSiteRole"] == "Explorer"
+
+    page = client.get(f"{base}/groups/{group['id']}/users", params={"pageSize": 100, "pageNumber": 3}).json()
+    assert page["pagination"] == {"pageNumber": "3", "pageSize": "100", "totalAvailable": "250"}
+    assert len(page["users"]["user"]) == 50
+
+
+def test_tableau_stub_requires_a_live_token():
+    client = TestClient(create_app(StubConfig(latency_ms=0, token_ttl_seconds=0.001)))
+    base = _signed_in(client)
+    threading.Event().wait(0.01)
+
+    response = client.get(f"{base}/groups")
+    assert response.status_code == 401
+    assert response.json()["error"]["code"] == "401002"
+    assert client.get("/stub/stats").json() == {"signin": 1, "unauthorized": 1}
@@ -0,0 +1,281 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from agents.account_agent import main as account_main
+from agents.account_agent.account_manager import AccountManager
+from agents.account_agent.intent import AccountIntent
+from benchmarks.tableau_stub import StubConfig, TableauSite, create_app
+from shared.db.session import get_db
+from shared.tableau_cache import AsyncCachingTableauBackend
+from shared.tableau_cloud import TableauCloudBackend
+
+DEPARTMENTS = {
+    "Finance": {"current_users": 650, "license": "Explorer"},
+    "Trading": {"current_users": 850, "license": "Creator"},
+}
+CAPACITIES = {"Finance": 700, "Trading": 900}
+
+
+@pytest.fixture
+def stub():
+    return create_app(StubConfig(latency_ms=0), TableauSite.seeded(DEPARTMENTS))
+
+
+def _backend(stub, **options):
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=stub), base_url="http://tableau")
+    return TableauCloudBackend(
+        "http://tableau", "fintechanalytics", "agents", "secret", CAPACITIES, client=client, **options,
+    )
+
+
+def test_department_reads_fetch_remaining_pages_concurrently(stub):
+    backend = _backend(stub, page_size=100)
+
+    async def scenario():
+        trading, missing, site = await asyncio.gather(
+            backend.get_department("Trading"), backend.get_department("Marketing"), backend.get_site_status(),
+        )
+        await backend.aclose()
+        return trading, missing, site
+
+    trading, missing, site = asyncio.run(scenario())
+
+    assert (trading.current_users, trading.max_users, trading.license_type) == (850, 900, "Creator")
+    assert missing is None
+    assert (site.total_departments, site.total_active_users, site.total_capacity) == (2, 1500, 1600)
+    stats = stub.state.stats
+    assert stats["signin"] == 1 and stats["signout"] == 1
+    assert stats["group_users"] == 2 * 9 + 7  # Trading twice, Finance once, 100 per page
+
+
+def test_a_refused_token_signs_in_again_and_retries(stub):
+    backend = _backend(stub)
+
+    async def scenario():
+        await backend.get_department("Finance")
+        stub.state.tokens.clear()  # revoked server-side, well before its estimated expiry
+        return await asyncio.gather(*(backend.get_department("Finance") for _ in range(5)))
+
+    results = asyncio.run(scenario())
+
+    assert [info.current_users for info in results] == [650] * 5
+    assert stub.state.stats["signin"] == 2
+
+
+def test_provision_users_reports_each_outcome_and_moves_users(stub):
+    backend = _backend(stub)
+    emails = [
+        "new.analyst@fintechanalytics.com",
+        "trading.user0000@fintechanalytics.com",
+        "finance.user0000@fintechanalytics.com",
+        "finance.user0001@fintechanalytics.com",
+    ]
+
+    async def scenario():
+        await backend.deactivate_users(["finance.user0001@fintechanalytics.com"])
+        result = await backend.provision_users(emails, "Finance")
+        finance, trading = await asyncio.gather(backend.get_department("Finance"), backend.get_department("Trading"))
+        return result, finance, trading
+
+    result, finance, trading = asyncio.run(scenario())
+
+    assert result.success
+    assert result.outcomes == dict(zip(emails, ["created", "moved", "unchanged", "reactivated"]))
+    assert result.available_licenses == 700 - 649 - 3
+    assert (finance.current_users, trading.current_users) == (652, 849)
+
+
+def test_provision_users_over_capacity_changes_nothing(stub):
+    backend = _backend(stub)
+    emails = [f"new{i}@fintechanalytics.com" for i in range(51)]
+
+    result = asyncio.run(backend.provision_users(emails, "Finance"))
+
+    assert result.requires_approval
+    assert result.reason == "Insufficient licenses. Requested: 51, Available: 50"
+    assert "create_user" not in stub.state.stats
+
+
+def test_reservations_hold_seats_until_committed_or_released(stub):
+    backend = _backend(stub)
+
+    async def scenario():
+        reservation = (await backend.reserve_licenses("Finance", 40)).reservation
+        held = await backend.check_capacity("Finance", 11)
+        committed = await backend.commit_reservation(reservation.id, ["a@fintechanalytics.com"])
+        again = await backend.commit_reservation(reservation.id, ["b@fintechanalytics.com"])
+        released = await backend.release_reservation((await backend.reserve_licenses("Finance", 1)).reservation.id)
+        return held, committed, again, released, await backend.get_department("Finance")
+
+    held, committed, again, released, finance = asyncio.run(scenario())
+
+    assert not held.success
+    assert (committed, again, released) == (True, False, True)
+    assert (finance.current_users, finance.reserved_users) == (651, 0)
+
+
+def test_concurrent_reservations_cannot_overshoot(stub):
+    backend = _backend(stub)
+
+    async def scenario():
+        return await asyncio.gather(*(backend.reserve_licenses("Finance", 10) for _ in range(8)))
+
+    results = asyncio.run(scenario())
+    assert sum(result.success for result in results) == 5
+
+
+def test_deactivate_users_unlicenses_only_active_users(stub):
+    backend = _backend(stub)
+    emails = ["finance.user0002@fintechanalytics.com", "nobody@fintechanalytics.com"]
+
+    async def scenario():
+        return await backend.deactivate_users(emails), await backend.deactivate_user(emails[0])
+
+    removed, again = asyncio.run(scenario())
+
+    assert removed == {emails[0]: True, emails[1]: False}
+    assert again is False
+
+
+def test_requests_run_concurrently_on_one_event_loop():
+    stub = create_app(StubConfig(latency_ms=50, latency_spread=0), TableauSite.seeded(DEPARTMENTS))
+    backend = _backend(stub)
+
+    async def scenario():
+        await backend.get_department("Finance")  # sign in first
+        started = time.perf_counter()
+        await asyncio.gather(*(backend.get_department("Finance") for _ in range(8)))
+        return time.perf_counter() - started
+
+    # Two calls each (group filter is cached after the first; members), 50 ms apiece:
+    # one after another would take 0.8 s.
+    assert asyncio.run(scenario()) < 0.4
+
+
+def test_cached_cloud_reads_share_one_fetch_until_a_write(stub):
+    cache = AsyncCachingTableauBackend(_backend(stub), ttl_seconds=60, stale_seconds=0)
+
+    async def scenario():
+        first = await asyncio.gather(*(cache.check_capacity("Finance", 10) for _ in range(5)))
+        again = await cache.get_department("Finance")
+        await cache.provision_users(["new.analyst@fintechanalytics.com"], "Finance")
+        after = await cache.get_department("Finance")
+        await cache.aclose()
+        return first, again, after
+
+    first, again, after = asyncio.run(scenario())
+
+    assert [result.available_licenses for result in first] == [50] * 5
+    assert (again.current_users, after.current_users) == (650, 651)
+    assert (cache.stats["miss"], cache.stats["joined"], cache.stats["hit"]) == (2, 4, 1)
+    # One read before the write (shared by six readers), one inside provision_users,
+    # one after.
+    assert stub.state.stats["group_users"] == 3
+
+
+def test_a_stale_cloud_read_is_served_while_a_task_refreshes_it(stub):
+    cache = AsyncCachingTableauBackend(_backend(stub), ttl_seconds=0, stale_seconds=60)
+
+    async def scenario():
+        await cache.get_department("Trading")
+        stub.state.stats.clear()
+        stale = await cache.get_department("Trading")  # returns before the refresh runs
+        fetched_before_returning = stub.state.stats["group_users"]
+        await asyncio.gather(*cache._refreshes)
+        await cache.aclose()
+        return stale, fetched_before_returning
+
+    stale, fetched_before_returning = asyncio.run(scenario())
+
+    assert stale.current_users == 850
+    assert fetched_before_returning == 0
+    assert cache.stats["refresh"] == 1
+    assert stub.state.stats["group_users"] == 1
+
+
+def test_a_failed_cloud_read_reaches_every_waiting_reader(stub):
+    cache = AsyncCachingTableauBackend(_backend(stub), ttl_seconds=60, stale_seconds=0)
+
+    async def scenario():
+        async def failing_read(name):
+            raise httpx.ConnectError("Tableau unreachable")
+
+        cache.backend.get_department = failing_read
+        results = await asyncio.gather(*(cache.get_department("Finance") for _ in range(3)), return_exceptions=True)
+        await cache.aclose()
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(result, httpx.ConnectError) for result in results)
+    assert "department:Finance" not in cache._inflight
+
+
+def test_cancelling_the_reader_that_started_a_load_leaves_the_others_waiting(stub):
+    cache = AsyncCachingTableauBackend(_backend(stub), ttl_seconds=60, stale_seconds=0)
+
+    async def scenario():
+        release = asyncio.Event()
+        real_read = cache.backend.get_department
+
+        async def slow_read(name):
+            await release.wait()
+            return await real_read(name)
+
+        cache.backend.get_department = slow_read
+        owner = asyncio.create_task(cache.get_department("Trading"))
+        await asyncio.sleep(0)  # the owner starts the load
+        joiner = asyncio.create_task(cache.get_department("Trading"))
+        await asyncio.sleep(0)
+        owner.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        result = await joiner
+        await cache.aclose()
+        return owner, result
+
+    owner, result = asyncio.run(scenario())
+
+    assert owner.cancelled()
+    assert result.current_users == 850
+    assert (cache.stats["miss"], cache.stats["joined"]) == (1, 1)
+    assert "department:Trading" in cache._entries
+
+
+def test_account_agent_acts_on_a_cloud_site(stub, seeded_db, monkeypatch):
+    monkeypatch.setattr(account_main, "tableau_cloud", AsyncCachingTableauBackend(_backend(stub)))
+    account_main.app.dependency_overrides[get_db] = lambda: seeded_db
+
+    def ticket(ticket_id, subject, description):
+        return {"ticket": {
+            "ticket_id": ticket_id, "user_email": "user@fintechanalytics.com", "department": "Finance",
+            "subject": subject, "description": description, "created_at": "2026-10-19T09:00:00", "messages": [],
+        }}
+
+    try:
+        with TestClient(account_main.app) as client:
+            reviews = [
+                client.post("/handle_ticket", json=ticket(f"T00{i}", "Permissions", "Please review permissions"))
+                for i in range(3)
+            ]
+            response = client.post("/handle_ticket", json=ticket(
+                "T004", "Remove user", "Please remove finance.user0003@fintechanalytics.com",
+            ))
+    finally:
+        account_main.app.dependency_overrides.clear()
+
+    assert all("Active Users: 650" in review.json()["response"]["content"] for review in reviews)
+    assert stub.state.stats["group_users"] == 1  # the three reviews shared one read
+    assert response.status_code == 200
+    assert "User Removed" in response.json()["response"]["content"]
+    assert stub.state.stats["update_user"] == 1
+
+
+def test_account_manager_awaits_a_cloud_backend(stub):
+    intent = AccountIntent(action="review_permissions", reasoning="test")
+    response = asyncio.run(AccountManager(_backend(stub)).respond(intent, "Trading"))
+    assert "Active Users: 850" in response
@@ -2,11 +2,14 @@ from datetime import datetime
 
 import pytest
 from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
 
 from agents.technical_agent.main import app
 from shared import config
+from shared.db.metrics import slowest_ticket_stages
 from shared.db.models import TicketEvent
 from shared.db.session import get_db
+from shared.stage_timing import request_start_header
 
 
 def _ticket_payload(subject, description):
@@ -93,6 +96,21 @@ def test_second_ticket_with_same_subject_uses_cache(client, seeded_db):
     assert event.payload["method"] == "cache"
 
 
+def test_handle_ticket_query_budget(client, sql_recorder):
+    payload = _ticket_payload("Dashboard slow", "The dashboard is slow and keeps loading.")
+
+    # Cache miss: ticket lookup + insert, cache probe, KB fetch, LLM call log, event,
+    # resolution update — record_resolution reuses the already-loaded ticket — plus
+    # one upsert each for the ticket, handling-time and LLM rollups at commit.
+    with sql_recorder.assert_max_queries(10):
+        assert client.post("/handle_ticket", json=payload).status_code == 200
+
+    # Cache hit skips the KB fetch and the LLM call (and its rollup) entirely.
+    payload["ticket"]["ticket_id"] = "T002"
+    with sql_recorder.assert_max_queries(7):
+        assert client.post("/handle_ticket", json=payload).status_code == 200
+
+
 def test_handle_ticket_requires_token_when_configured(client, monkeypatch):
     monkeypatch.setattr(config, "INTERNAL_API_TOKEN", "secret123")
     response = client.post(
@@ -110,3 +128,37 @@ def test_handle_ticket_accepts_correct_token(client, monkeypatch):
         headers={"X-Internal-Token": "secret123"},
     )
     assert response.status_code == 200
+
+
+def test_handle_ticket_counts_escalations_and_cache_lookups(client):
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0.0
+
+    escalations = sample("escalations_total", agent="technical_agent", queue="escalation_queue")
+    misses = sample("resolution_cache_lookups_total", result="miss")
+    hits = sample("resolution_cache_lookups_total", result="hit")
+
+    payload = _ticket_payload("Random request", "Something completely unrelated to Tableau.")
+    client.post("/handle_ticket", json=payload)
+    payload["ticket"]["ticket_id"] = "T002"
+    client.post("/handle_ticket", json=payload)  # same subject: served from the resolution cache
+
+    assert sample("resolution_cache_lookups_total", result="miss") == misses + 1
+    assert sample("resolution_cache_lookups_total", result="hit") == hits + 1
+    assert sample("escalations_total", agent="technical_agent", queue="escalation_queue") == escalations + 2
+
+
+def test_handle_ticket_reports_stage_timings(client, seeded_db):
+    response = client.post(
+        "/handle_ticket",
+        json=_ticket_payload("Dashboard slow", "The dashboard is slow and keeps loading."),
+        headers=request_start_header(),
+    )
+    timings = response.json()["timings"]
+    assert {"queue_wait", "retrieval", "llm", "db_write", "total"} <= set(timings)
+    assert sum(ms for name, ms in timings.items() if name != "total") <= timings["total"]
+
+    event = seeded_db.query(TicketEvent).filter(TicketEvent.action == "response").one()
+    # Recorded before the commit that persists it, so everything but db_write.
+    assert {"queue_wait", "retrieval", "llm"} <= set(event.payload["timings"])
+    assert slowest_ticket_stages(seeded_db, "retrieval")[0].ticket_id == "T001"
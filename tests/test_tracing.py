@@ -0,0 +1,158 @@
+import json
+import logging
+import threading
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from agents.router_agent.main import app
+from shared import config, orchestrator, tracing
+from shared.db.session import get_db
+from shared.logging_config import JSONFormatter
+from shared.models import SupportTicket
+from shared.tracing import TRACEPARENT_HEADER, flush_traces, inject, span
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_SPAN_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture()
+def trace_file(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(config, "TRACE_EXPORT_PATH", str(path))
+    return path
+
+
+def _exported_spans(path):
+    flush_traces()
+    spans = []
+    for line in path.read_text().splitlines():
+        for resource in json.loads(line)["resourceSpans"]:
+            for scope in resource["scopeSpans"]:
+                spans.extend(scope["spans"])
+    return spans
+
+
+def test_nested_spans_share_a_trace_and_export_once_the_root_ends(trace_file):
+    with span("outer") as outer:
+        with span("inner") as inner:
+            assert inner.trace_id == outer.trace_id
+            assert inner.parent_span_id == outer.span_id
+        flush_traces()
+        assert not trace_file.exists()
+
+    exported = {s["name"]: s for s in _exported_spans(trace_file)}
+    assert set(exported) == {"outer", "inner"}
+    assert exported["inner"]["parentSpanId"] == exported["outer"]["spanId"]
+    assert "parentSpanId" not in exported["outer"]
+
+
+def test_failed_span_is_exported_with_error_status(trace_file):
+    with pytest.raises(ValueError):
+        with span("boom"):
+            raise ValueError("bad input")
+
+    (exported,) = _exported_spans(trace_file)
+    assert exported["status"] == {"code": 2, "message": "ValueError: bad input"}
+
+
+def test_ending_a_span_never_waits_on_the_export(trace_file, monkeypatch):
+    writing, release = threading.Event(), threading.Event()
+    encode = tracing._otlp_request
+
+    def slow_encode(spans):
+        writing.set()
+        release.wait(5)
+        return encode(spans)
+
+    monkeypatch.setattr(tracing, "_otlp_request", slow_encode)
+    with span("first"):
+        pass
+    assert writing.wait(5)
+    with span("second"):  # returns while the exporter is still stuck on "first"
+        pass
+    assert not trace_file.exists()
+
+    release.set()
+    assert {s["name"] for s in _exported_spans(trace_file)} == {"first", "second"}
+
+
+def test_agent_continues_the_callers_trace(db_session, trace_file):
+    app.dependency_overrides[get_db] = lambda: db_session
+    try:
+        response = TestClient(app).post(
+            "/route_ticket",
+            json={
+                "ticket_id": "T001",
+                "user_email": "trader@fintechanalytics.com",
+                "department": "Trading",
+                "subject": "Trading dashboard down",
+                "description": "Dashboard is not loading and showing a connection timeout.",
+                "created_at": datetime.now().isoformat(),
+                "messages": [],
+            },
+            headers={TRACEPARENT_HEADER: f"00-{TRACE_ID}-{PARENT_SPAN_ID}-01"},
+        )
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+
+    spans = {s["name"]: s for s in _exported_spans(trace_file)}
+    assert {"POST /route_ticket", "RouterLogic.classify", "db.commit"} <= set(spans)
+    assert {s["traceId"] for s in spans.values()} == {TRACE_ID}
+    assert spans["POST /route_ticket"]["parentSpanId"] == PARENT_SPAN_ID
+    assert spans["RouterLogic.classify"]["parentSpanId"] == spans["POST /route_ticket"]["spanId"]
+
+
+def test_orchestrator_propagates_trace_context(monkeypatch, trace_file):
+    sent_headers = []
+
+    class _Response:
+        status_code = 200
+
+        def __init__(self, body):
+            self._body = body
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self._body
+
+    def fake_post(url, json, headers, timeout):
+        sent_headers.append(headers)
+        if url.endswith("/route_ticket"):
+            return _Response({"assigned_agent": "technical_agent"})
+        return _Response({"response": {"content": "Fixed."}, "escalated": False})
+
+    monkeypatch.setattr(orchestrator.requests, "post", fake_post)
+    ticket = SupportTicket(
+        ticket_id="T001", user_email="u@fintechanalytics.com", department="Trading",
+        subject="s", description="d", created_at=datetime.now(),
+    )
+    assert orchestrator.AgentOrchestrator().process_support_ticket(ticket)["status"] == "completed"
+
+    spans = {s["name"]: s for s in _exported_spans(trace_file)}
+    root = spans["process_support_ticket"]
+    assert len(sent_headers) == 2
+    for headers, client_span in zip(sent_headers, (spans["POST router_agent"], spans["POST technical_agent"])):
+        assert headers[TRACEPARENT_HEADER] == f"00-{root['traceId']}-{client_span['spanId']}-01"
+        assert client_span["parentSpanId"] == root["spanId"]
+
+
+def test_inject_is_a_no_op_outside_a_span():
+    assert inject({}) == {}
+
+
+def test_log_lines_carry_the_trace_id():
+    def record():
+        return logging.LogRecord(
+            name="test.logger", level=logging.INFO, pathname=__file__, lineno=1, msg="hello", args=(), exc_info=None,
+        )
+
+    with span("request") as current:
+        payload = json.loads(JSONFormatter().format(record()))
+    assert payload["trace_id"] == current.trace_id
+    assert payload["span_id"] == current.span_id
+    assert "trace_id" not in json.loads(JSONFormatter().format(record()))
@@ -0,0 +1,38 @@
+from shared.db.models import User
+from shared.tableau_service import SimulatedTableauBackend
+from shared.user_directory import DirectoryUser, search_users
+
+
+def test_search_users_matches_an_email_prefix_in_order(seeded_db, sql_recorder):
+    with sql_recorder.assert_max_queries(1):
+        found = search_users(seeded_db, " Trading12", limit=20)
+
+    # Bytewise: digits sort before "@".
+    assert found == [
+        DirectoryUser(f"trading12{suffix}@fintechanalytics.com", "Trading") for suffix in [*"0123456789", ""]
+    ]
+
+
+def test_search_users_without_a_prefix_lists_the_first_users(seeded_db):
+    assert [user.email for user in search_users(seeded_db, limit=2)] == [
+        "finance0@fintechanalytics.com", "finance100@fintechanalytics.com",
+    ]
+    assert search_users(seeded_db, "marketing") == []
+
+
+def test_search_users_skips_removed_users(seeded_db):
+    seeded_db.query(User).filter(User.email == "finance10@fintechanalytics.com").one().status = "removed"
+    seeded_db.commit()
+
+    assert [user.email for user in search_users(seeded_db, "finance10")] == [
+        f"finance10{i}@fintechanalytics.com" for i in range(10)
+    ]
+
+
+def test_search_users_finds_a_user_provisioned_with_a_mixed_case_email(seeded_db):
+    SimulatedTableauBackend(seeded_db).provision_users(["Jane.Doe@FintechAnalytics.com"], "Finance")
+
+    expected = [DirectoryUser("jane.doe@fintechanalytics.com", "Finance")]
+    assert search_users(seeded_db, "jane") == expected
+    assert search_users(seeded_db, "Jane.D") == expected
+    assert search_users(seeded_db, "JANE.DOE@FINTECHANALYTICS.COM") == expected